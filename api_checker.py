@@ -1,8 +1,11 @@
 import time
 import requests
-from typing import Tuple, Dict, Optional
+from typing import Tuple, Dict, List, Optional
 from data_manager import DataManager
 from config import Config
+from check_engine import AsyncCheckEngine
+from check_history import CheckHistoryStore, classify_error
+from services.http_client import get_http_client
 import config as config_module
 
 class APIChecker:
@@ -10,6 +13,9 @@ class APIChecker:
         self.data_manager = data_manager
         self.timeout = getattr(config_module, 'REQUEST_TIMEOUT', 10)
         self.max_error_count = getattr(config_module, 'MAX_ERROR_COUNT', 3)
+        self.check_engine = AsyncCheckEngine(timeout=self.timeout)
+        self.http_client = get_http_client()
+        self.check_history = CheckHistoryStore()
     
     def check_single_api(self, api: dict) -> Tuple[str, float, str, str]:
         """
@@ -23,6 +29,13 @@ class APIChecker:
         發送 HTTP 請求並返回結果
         返回: (status, response_time, error_message, response_data)
         """
+        return self.make_request_with_status_code(api)[:4]
+    
+    def make_request_with_status_code(self, api: dict) -> Tuple[str, float, str, str, Optional[int]]:
+        """
+        發送 HTTP 請求並返回結果（含 HTTP 狀態碼，未收到回應時為 None）
+        返回: (status, response_time, error_message, response_data, status_code)
+        """
         try:
             start_time = time.time()
             method = api.get('method', 'GET').upper()
@@ -35,8 +48,8 @@ class APIChecker:
                 current_timestamp = str(int(time.time()))
                 data = data.replace('{{timestamp}}', current_timestamp)
             
-            # 使用統一的 requests.request 方法
-            response = requests.request(
+            # 使用共用連線池（keep-alive）發送請求
+            response = self.http_client.request(
                 method=method,
                 url=url,
                 headers=headers,
@@ -54,14 +67,14 @@ class APIChecker:
                 status = 'unhealthy'
                 error_message = f'HTTP {response.status_code}'
             
-            return status, response_time, error_message, response.text[:1000]
+            return status, response_time, error_message, response.text[:1000], response.status_code
             
         except requests.exceptions.Timeout:
-            return 'unhealthy', self.timeout, '請求超時', ''
+            return 'unhealthy', self.timeout, '請求超時', '', None
         except requests.exceptions.ConnectionError:
-            return 'unhealthy', 0.0, '連接錯誤', ''
+            return 'unhealthy', 0.0, '連接錯誤', '', None
         except Exception as e:
-            return 'unhealthy', 0.0, str(e), ''
+            return 'unhealthy', 0.0, str(e), '', None
     
     def validate_api_config(self, api_config: dict) -> bool:
         """
@@ -100,30 +113,71 @@ class APIChecker:
             return
             
         apis = self.data_manager.load_apis()
+        self.check_apis(apis)
+    
+    def check_apis(self, apis: List[Dict]):
+        """併發檢查指定的 API 並更新狀態"""
+        if not self.data_manager or not apis:
+            return
+        
+        # aiohttp 不可用時退回逐一的同步檢查
+        if self.check_engine.is_available():
+            results = self.check_engine.check_apis(apis)
+        else:
+            results = [(api, self.make_request_with_status_code(api)) for api in apis]
         
-        for api in apis:
+        checked_at = time.time()
+        status_updates = []
+        history_records = []
+        notify_apis = []
+        for api, (status, response_time, error_msg, response_data, status_code) in results:
             print(f"檢查 API: {api['name']} ({api['url']})")
             
-            status, response_time, error_msg, response_data = self.check_single_api(api)
+            status_updates.append({
+                'id': api['id'],
+                'status': status,
+                'response_time': response_time,
+                'error_msg': error_msg,
+                'response_data': response_data
+            })
             
-            # 更新 API 狀態
-            self.data_manager.update_api_status(
-                api['id'], 
-                status, 
-                response_time, 
-                error_msg,
-                response_data
-            )
+            history_records.append({
+                'api_id': api['id'],
+                'ts': checked_at,
+                'latency_ms': response_time * 1000,
+                'status_code': status_code,
+                'error_class': classify_error(status, status_code, error_msg)
+            })
             
-            # 檢查是否需要發送通知
+            # 在記憶體中累計連續錯誤次數（與資料庫中的 error_count + 1 一致），
+            # 直接更新傳入的 API 字典，讓排程器快取的設定保持最新
             if status == "unhealthy":
-                updated_api = self.data_manager.get_api_by_id(api['id'])
-                if updated_api and updated_api['error_count'] >= self.max_error_count:
-                    self.send_notification(updated_api)
+                api['error_count'] = (api.get('error_count') or 0) + 1
+                api['last_error'] = error_msg
+                if api['error_count'] >= self.max_error_count:
+                    notify_apis.append(api)
+            else:
+                api['error_count'] = 0
+                api['last_error'] = None
+            api['status'] = status
+            api['response_time'] = response_time
             
             print(f"  狀態: {status}, 回應時間: {response_time:.3f}s")
             if error_msg:
                 print(f"  錯誤: {error_msg}")
+        
+        # 整批結果在同一個交易中寫入
+        self.data_manager.update_api_statuses(status_updates)
+        
+        # 追加寫入檢查歷史（失敗不影響狀態更新）
+        try:
+            self.check_history.record_results(history_records)
+        except Exception as e:
+            print(f"寫入檢查歷史失敗: {e}")
+        
+        # 檢查是否需要發送通知
+        for api in notify_apis:
+            self.send_notification(api)
     
     def send_notification(self, api: dict):
         """發送通知"""
@@ -148,7 +202,7 @@ class APIChecker:
                 data = data.replace('{{timestamp}}', current_timestamp)
             
             # 發送請求
-            response = requests.request(
+            response = self.http_client.request(
                 method=method,
                 url=url,
                 headers=headers,
@@ -1,5 +1,6 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from data_manager import DataManager
+from status_snapshot import status_snapshot
 from scheduler import APIScheduler
 from config import Config
 import os
@@ -15,17 +16,8 @@ scheduler = APIScheduler()
 @app.route('/')
 def index():
     """主監控頁面"""
-    apis = data_manager.load_apis()
-    
-    # 計算統計資料
-    stats = {
-        'total': len(apis),
-        'healthy': len([api for api in apis if api.get('status') == 'healthy']),
-        'unhealthy': len([api for api in apis if api.get('status') == 'unhealthy']),
-        'unknown': len([api for api in apis if api.get('status') == 'unknown'])
-    }
-    
-    return render_template('index.html', apis=apis, stats=stats)
+    snapshot = status_snapshot.get()
+    return render_template('index.html', apis=snapshot.apis, stats=snapshot.stats)
 
 @app.route('/admin')
 def admin():
@@ -89,17 +81,10 @@ def check_now():
 @app.route('/api/status')
 def api_status():
     """提供 JSON 格式的 API 狀態資料"""
-    apis = data_manager.load_apis()
-    stats = {
-        'total': len(apis),
-        'healthy': len([api for api in apis if api.get('status') == 'healthy']),
-        'unhealthy': len([api for api in apis if api.get('status') == 'unhealthy']),
-        'unknown': len([api for api in apis if api.get('status') == 'unknown'])
-    }
-    
+    snapshot = status_snapshot.get()
     return jsonify({
-        'apis': apis,
-        'stats': stats,
+        'apis': snapshot.apis,
+        'stats': snapshot.stats,
         'scheduler': scheduler.get_scheduler_status()
     })
 
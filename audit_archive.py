@@ -0,0 +1,325 @@
+"""
+審計日誌的月分區封存
+audit_logs 只保留最近 AUDIT_HOT_MONTHS 個月的熱資料；更早的月份整月匯出為
+gzip 壓縮的欄式 JSON 檔（每個欄位一個陣列），登記在 audit_log_archives 後自熱表刪除。
+統計由 audit_log_daily_counts 增量計數，封存與過期刪除都不影響統計數字。
+封存在專屬的背景執行緒執行，不佔用審計寫入器的執行緒（升級後第一次封存可能要數秒）；
+同一行程內以鎖、各 worker 之間以 audit_archive_lease 租約確保同時只有一個封存在執行
+"""
+import atexit
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from database.db_manager import db_manager
+import config as config_module
+
+ARCHIVE_FORMAT_VERSION = 1
+LEASE_SECONDS = 600  # 封存租約的有效時間；每封存一個月份續約一次，持有者異常結束後到期可由其他 worker 接手
+
+ARCHIVE_COLUMNS = (
+    'id', 'user_id', 'username', 'action', 'resource_type', 'resource_id', 'resource_name',
+    'old_values', 'new_values', 'ip_address', 'user_agent', 'created_at'
+)
+
+# 查詢封存檔時可用的等值篩選欄位
+FILTER_COLUMNS = ('user_id', 'username', 'action', 'resource_type')
+
+def shift_month(period: str, months: int) -> str:
+    """將 'YYYY-MM' 前後移動 months 個月"""
+    year, month = int(period[:4]), int(period[5:7])
+    index = year * 12 + (month - 1) + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def period_bounds(period: str) -> Tuple[str, str]:
+    """月份的 created_at 範圍 [start, end)"""
+    return f"{period}-01 00:00:00", f"{shift_month(period, 1)}-01 00:00:00"
+
+class AuditArchiveStore:
+    """
+    審計日誌封存：以月份為分區，超過熱資料保留期的月份封存為壓縮檔，
+    封存檔超過保留期後刪除；封存檔可依篩選條件隨選查詢
+    """
+    
+    DELETE_CHUNK_SIZE = 5000
+    
+    def __init__(self, archive_dir: str = None):
+        self.archive_dir = archive_dir or getattr(config_module, 'AUDIT_ARCHIVE_DIR', 'data/audit_archive')
+        self.hot_months = getattr(config_module, 'AUDIT_HOT_MONTHS', 3)
+        self.retention_months = getattr(config_module, 'AUDIT_ARCHIVE_RETENTION_MONTHS', 0)
+        self.archive_interval = getattr(config_module, 'AUDIT_ARCHIVE_INTERVAL', 86400)
+        self._last_run = 0.0
+        self._run_lock = threading.Lock()
+        self._archive_lock = threading.RLock()  # 序列化本行程的 run() 與 archive_period()
+        self._lease_token = uuid.uuid4().hex
+        self._thread = None
+        self._stopped = threading.Event()
+        atexit.register(self.stop)
+        self._cache: Dict = {}  # 最近讀取的一個封存檔：{'key': (period, mtime), 'data': 欄式資料}
+        self._cache_lock = threading.Lock()
+    
+    # ---------- 封存 ----------
+    
+    def ensure_started(self):
+        """啟動背景封存執行緒（每 archive_interval 秒檢查一次；已啟動時不做任何事）"""
+        if self._stopped.is_set() or (self._thread and self._thread.is_alive()):
+            return
+        with self._run_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run_loop, name='audit-archiver', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """停止背景封存執行緒（進行中的封存仍會執行完）"""
+        self._stopped.set()
+    
+    def _run_loop(self):
+        while not self._stopped.is_set():
+            self.run_if_due()
+            self._stopped.wait(max(self.archive_interval, 1))
+    
+    def run_if_due(self):
+        """距離上次執行超過 archive_interval 時執行封存與過期清理"""
+        now = time.time()
+        with self._run_lock:
+            if now - self._last_run < self.archive_interval:
+                return
+            self._last_run = now
+        try:
+            self.run()
+        except Exception as e:
+            print(f"審計日誌封存失敗: {e}")
+    
+    def run(self, current_period: str = None) -> Dict[str, List[str]]:
+        """
+        封存熱資料保留期外的月份並刪除過期的封存檔（AUDIT_HOT_MONTHS 為 0 時不封存）
+        其他 worker 正在封存時不執行，返回 skipped=True
+        """
+        current_period = current_period or datetime.now(timezone.utc).strftime('%Y-%m')
+        result = {'archived': [], 'expired': [], 'skipped': False}
+        
+        with self._archive_lock:
+            if not self._claim_lease():
+                result['skipped'] = True
+                return result
+            try:
+                self._run_claimed(current_period, result)
+            finally:
+                self._release_lease()
+        return result
+    
+    def _run_claimed(self, current_period: str, result: Dict):
+        if self.hot_months > 0:
+            cutoff, _ = period_bounds(shift_month(current_period, -(self.hot_months - 1)))
+            periods = db_manager.execute_query("""
+                SELECT DISTINCT substr(created_at, 1, 7) AS period
+                FROM audit_logs
+                WHERE created_at < ?
+                ORDER BY period
+            """, (cutoff,))
+            for row in periods:
+                # 續約；租約已被接手（例如本行程停頓超過 LEASE_SECONDS）時停止
+                if not self._claim_lease():
+                    return
+                self.archive_period(row['period'])
+                result['archived'].append(row['period'])
+        
+        if self.retention_months > 0:
+            oldest_kept = shift_month(current_period, -self.retention_months)
+            for archive in self.list_archives():
+                if archive['period'] < oldest_kept:
+                    self.delete_archive(archive['period'])
+                    result['expired'].append(archive['period'])
+    
+    @property
+    def _lease_owner(self) -> str:
+        """租約持有者（含行程 ID：gunicorn preload fork 出的 worker 各自不同）"""
+        return f"{os.getpid()}-{self._lease_token}"
+    
+    def _claim_lease(self) -> bool:
+        """取得或續約跨行程的封存租約（單一 UPSERT，在寫入交易中原子完成）"""
+        now = time.time()
+        rows = db_manager.execute_update("""
+            INSERT INTO audit_archive_lease (id, owner, expires_at) VALUES (1, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE audit_archive_lease.owner = excluded.owner OR audit_archive_lease.expires_at < ?
+        """, (self._lease_owner, now + LEASE_SECONDS, now))
+        return rows > 0
+    
+    def _release_lease(self):
+        db_manager.execute_delete(
+            "DELETE FROM audit_archive_lease WHERE id = 1 AND owner = ?", (self._lease_owner,)
+        )
+    
+    def archive_period(self, period: str) -> int:
+        """
+        將一個月份的熱資料寫入封存檔後自 audit_logs 刪除，返回封存檔總筆數
+        已有封存檔時合併（以 id 去重），中途失敗重跑也不會重複
+        """
+        with self._archive_lock:
+            return self._archive_period(period)
+    
+    def _archive_period(self, period: str) -> int:
+        start, end = period_bounds(period)
+        rows = db_manager.execute_query(f"""
+            SELECT {', '.join(ARCHIVE_COLUMNS)}
+            FROM audit_logs
+            WHERE created_at >= ? AND created_at < ?
+            ORDER BY created_at, id
+        """, (start, end))
+        
+        existing = self._read_rows(period) if self._archive_exists(period) else []
+        seen = {row['id'] for row in rows}
+        merged = [row for row in existing if row['id'] not in seen] + rows
+        merged.sort(key=lambda row: (row['created_at'], row['id']))
+        
+        path = self._archive_path(period)
+        os.makedirs(self.archive_dir, exist_ok=True)
+        # 每次寫入使用唯一的暫存檔，完成後才原子地取代正式檔
+        fd, temp_path = tempfile.mkstemp(dir=self.archive_dir, prefix=f"audit_logs_{period}.", suffix='.tmp')
+        os.close(fd)
+        try:
+            with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+                json.dump({
+                    'version': ARCHIVE_FORMAT_VERSION,
+                    'period': period,
+                    'row_count': len(merged),
+                    'columns': list(ARCHIVE_COLUMNS),
+                    'data': {column: [row[column] for row in merged] for column in ARCHIVE_COLUMNS}
+                }, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        db_manager.execute_update("""
+            INSERT INTO audit_log_archives (period, file_path, row_count, size_bytes, archived_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (period) DO UPDATE SET
+                file_path = excluded.file_path,
+                row_count = excluded.row_count,
+                size_bytes = excluded.size_bytes,
+                archived_at = excluded.archived_at
+        """, (period, path, len(merged), os.path.getsize(path)))
+        
+        # 封存檔已落地才刪除熱資料（分批刪除，避免長時間鎖住資料庫）
+        while True:
+            deleted = db_manager.execute_delete("""
+                DELETE FROM audit_logs WHERE rowid IN (
+                    SELECT rowid FROM audit_logs WHERE created_at >= ? AND created_at < ? LIMIT ?
+                )
+            """, (start, end, self.DELETE_CHUNK_SIZE))
+            if deleted < self.DELETE_CHUNK_SIZE:
+                break
+        
+        return len(merged)
+    
+    def delete_archive(self, period: str):
+        """刪除過期的封存檔與其登記"""
+        path = self._archive_path(period)
+        if os.path.exists(path):
+            os.remove(path)
+        db_manager.execute_delete("DELETE FROM audit_log_archives WHERE period = ?", (period,))
+    
+    # ---------- 查詢 ----------
+    
+    def list_archives(self) -> List[Dict]:
+        """所有封存月份（新到舊）"""
+        return db_manager.execute_query("""
+            SELECT period, row_count, size_bytes, archived_at
+            FROM audit_log_archives
+            ORDER BY period DESC
+        """)
+    
+    def is_archived(self, period: str) -> bool:
+        return bool(period) and bool(db_manager.execute_query(
+            "SELECT 1 FROM audit_log_archives WHERE period = ?", (period,)
+        ))
+    
+    def query(self, period: str, limit: int = 20, offset: int = 0, **filters) -> Dict:
+        """
+        依篩選條件查詢封存檔（由新到舊），返回 {'total', 'logs'}
+        只讀取篩選用到的欄位判斷符合的列，再組出分頁範圍內的記錄
+        """
+        data = self._read_columns(period)
+        if data is None:
+            return {'total': 0, 'logs': []}
+        
+        matched = range(len(data['id']))
+        for column in FILTER_COLUMNS:
+            value = filters.get(column)
+            if value:
+                values = data[column]
+                matched = [i for i in matched if values[i] == value]
+        created_at = data['created_at']
+        if filters.get('start_date'):
+            matched = [i for i in matched if created_at[i] >= filters['start_date']]
+        if filters.get('end_date'):
+            matched = [i for i in matched if created_at[i] <= filters['end_date']]
+        
+        # 封存檔依 (created_at, id) 遞增排序，反向即為由新到舊
+        matched = list(matched)[::-1]
+        logs = []
+        for i in matched[offset:offset + limit]:
+            log = {column: data[column][i] for column in ARCHIVE_COLUMNS}
+            log['has_changes'] = bool(log['old_values'] or log['new_values'])
+            logs.append(self._decode_values(log))
+        return {'total': len(matched), 'logs': logs}
+    
+    def get_log(self, period: str, log_id: int) -> Optional[Dict]:
+        """自封存檔取得單筆記錄"""
+        data = self._read_columns(period)
+        if data is None or log_id not in data['id']:
+            return None
+        i = data['id'].index(log_id)
+        return self._decode_values({column: data[column][i] for column in ARCHIVE_COLUMNS})
+    
+    # ---------- 檔案 ----------
+    
+    def _archive_path(self, period: str) -> str:
+        return os.path.join(self.archive_dir, f"audit_logs_{period}.json.gz")
+    
+    def _archive_exists(self, period: str) -> bool:
+        return os.path.exists(self._archive_path(period))
+    
+    def _read_columns(self, period: str) -> Optional[Dict[str, list]]:
+        """讀取封存檔的欄式資料，不存在時返回 None"""
+        if not period or not self._archive_exists(period):
+            return None
+        path = self._archive_path(period)
+        key = (period, os.path.getmtime(path))
+        with self._cache_lock:
+            if self._cache.get('key') == key:
+                return self._cache['data']
+        
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            archive = json.load(f)
+        if archive.get('version') != ARCHIVE_FORMAT_VERSION:
+            raise ValueError(f"不支援的封存檔版本: {archive.get('version')}")
+        
+        with self._cache_lock:
+            self._cache = {'key': key, 'data': archive['data']}
+        return archive['data']
+    
+    def _read_rows(self, period: str) -> List[Dict]:
+        data = self._read_columns(period) or {column: [] for column in ARCHIVE_COLUMNS}
+        return [dict(zip(ARCHIVE_COLUMNS, values)) for values in zip(*(data[c] for c in ARCHIVE_COLUMNS))]
+    
+    @staticmethod
+    def _decode_values(log: Dict) -> Dict:
+        for field in ('old_values', 'new_values'):
+            if log.get(field):
+                try:
+                    log[field] = json.loads(log[field])
+                except (TypeError, ValueError):
+                    pass
+        return log
+
+audit_archive = AuditArchiveStore()
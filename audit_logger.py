@@ -1,8 +1,9 @@
 import json
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Dict, Optional, Any
 from database.db_manager import db_manager
+from audit_writer import audit_writer
 from flask import request, session
 
 
@@ -46,14 +47,8 @@ class AuditLogger:
             if new_values:
                 new_values = AuditLogger._clean_sensitive_data(new_values)
             
-            query = """
-                INSERT INTO audit_logs (
-                    user_id, username, action, resource_type, resource_id, resource_name,
-                    old_values, new_values, ip_address, user_agent
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            db_manager.execute_insert(query, (
+            # 交給背景寫入器批次寫入；created_at 取放入佇列的時間（與 CURRENT_TIMESTAMP 相同的 UTC 格式）
+            audit_writer.submit((
                 user_id,
                 username,
                 action,
@@ -63,7 +58,8 @@ class AuditLogger:
                 json.dumps(old_values, ensure_ascii=False) if old_values else None,
                 json.dumps(new_values, ensure_ascii=False) if new_values else None,
                 ip_address,
-                user_agent
+                user_agent,
+                datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
             ))
             
         except Exception as e:
@@ -191,26 +187,29 @@ class AuditLogger:
             old_values=api_data
         )
     
+    # 查詢前等待背景寫入器寫完已送出記錄的最長時間（秒）
+    READ_FLUSH_TIMEOUT = 1.0
+    
+    # 列表頁只需要的欄位（不含 old_values/new_values 與 user_agent）
+    LIST_COLUMNS = """
+        id, user_id, username, action, resource_type, resource_id, resource_name,
+        ip_address, created_at,
+        (old_values IS NOT NULL OR new_values IS NOT NULL) AS has_changes
+    """
+    
     @staticmethod
-    def get_audit_logs(limit: int = 100, offset: int = 0, 
-                      user_id: str = None, action: str = None, 
-                      resource_type: str = None, start_date: str = None, 
-                      end_date: str = None):
-        """獲取審計日誌"""
+    def _build_filters(user_id: str = None, username: str = None, action: str = None,
+                       resource_type: str = None, start_date: str = None,
+                       end_date: str = None):
+        """組出篩選條件，返回 (條件列表, 參數列表)"""
         where_conditions = []
         params = []
         
-        if user_id:
-            where_conditions.append("user_id = ?")
-            params.append(user_id)
-        
-        if action:
-            where_conditions.append("action = ?")
-            params.append(action)
-        
-        if resource_type:
-            where_conditions.append("resource_type = ?")
-            params.append(resource_type)
+        for column, value in (('user_id', user_id), ('username', username),
+                              ('action', action), ('resource_type', resource_type)):
+            if value:
+                where_conditions.append(f"{column} = ?")
+                params.append(value)
         
         if start_date:
             where_conditions.append("created_at >= ?")
@@ -220,6 +219,29 @@ class AuditLogger:
             where_conditions.append("created_at <= ?")
             params.append(end_date)
         
+        return where_conditions, params
+    
+    @staticmethod
+    def _decode_values(log: Dict) -> Dict:
+        """解析 old_values/new_values 的 JSON"""
+        for field in ('old_values', 'new_values'):
+            if log.get(field):
+                try:
+                    log[field] = json.loads(log[field])
+                except (TypeError, ValueError):
+                    pass
+        return log
+    
+    @staticmethod
+    def get_audit_logs(limit: int = 100, offset: int = 0, 
+                      user_id: str = None, action: str = None, 
+                      resource_type: str = None, start_date: str = None, 
+                      end_date: str = None, username: str = None):
+        """獲取審計日誌（含變更內容，供匯出與 JSON API 使用）"""
+        audit_writer.flush(AuditLogger.READ_FLUSH_TIMEOUT)
+        where_conditions, params = AuditLogger._build_filters(
+            user_id, username, action, resource_type, start_date, end_date
+        )
         where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
         
         query = f"""
@@ -228,28 +250,81 @@ class AuditLogger:
                 old_values, new_values, ip_address, user_agent, created_at
             FROM audit_logs 
             {where_clause}
-            ORDER BY created_at DESC 
+            ORDER BY created_at DESC, id DESC 
             LIMIT ? OFFSET ?
         """
         
         params.extend([limit, offset])
         
         logs = db_manager.execute_query(query, tuple(params))
+        return [AuditLogger._decode_values(log) for log in logs]
+    
+    @staticmethod
+    def count_audit_logs(**filters) -> int:
+        """符合篩選條件的記錄數"""
+        audit_writer.flush(AuditLogger.READ_FLUSH_TIMEOUT)
+        where_conditions, params = AuditLogger._build_filters(**filters)
+        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+        result = db_manager.execute_query(f"SELECT COUNT(*) AS count FROM audit_logs {where_clause}", tuple(params))
+        return result[0]['count'] if result else 0
+    
+    @staticmethod
+    def get_audit_log_page(limit: int = 20, after: str = None, before: str = None, **filters) -> Dict:
+        """
+        以 (created_at, id) keyset 分頁取得列表（由新到舊），不讀取變更內容
+        after: 取得此游標之後（較舊）的記錄；before: 取得此游標之前（較新）的記錄
+        游標格式為 "created_at|id"，返回 {'logs', 'next_cursor', 'prev_cursor'}
+        """
+        audit_writer.flush(AuditLogger.READ_FLUSH_TIMEOUT)
+        where_conditions, params = AuditLogger._build_filters(**filters)
+        cursor = before or after
+        if cursor:
+            created_at, _, log_id = cursor.rpartition('|')
+            if not created_at or not log_id.isdigit():
+                raise ValueError('無效的分頁游標')
+            where_conditions.append(f"(created_at, id) {'>' if before else '<'} (?, ?)")
+            params.extend([created_at, int(log_id)])
         
-        # 解析JSON字段
-        for log in logs:
-            if log['old_values']:
-                try:
-                    log['old_values'] = json.loads(log['old_values'])
-                except:
-                    pass
-            if log['new_values']:
-                try:
-                    log['new_values'] = json.loads(log['new_values'])
-                except:
-                    pass
+        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+        order = "ASC" if before else "DESC"
+        logs = db_manager.execute_query(f"""
+            SELECT {AuditLogger.LIST_COLUMNS}
+            FROM audit_logs
+            {where_clause}
+            ORDER BY created_at {order}, id {order}
+            LIMIT ?
+        """, tuple(params) + (limit + 1,))
+        
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+        if before:
+            logs.reverse()
         
-        return logs
+        # 往前翻頁時「更新的記錄」是否存在取決於查詢結果，往後翻頁時則取決於是否帶有游標
+        has_newer = has_more if before else bool(after)
+        has_older = True if before else has_more
+        
+        def make_cursor(log):
+            return f"{log['created_at']}|{log['id']}"
+        
+        return {
+            'logs': logs,
+            'next_cursor': make_cursor(logs[-1]) if logs and has_older else None,
+            'prev_cursor': make_cursor(logs[0]) if logs and has_newer else None
+        }
+    
+    @staticmethod
+    def get_audit_log(log_id: int) -> Optional[Dict]:
+        """取得單筆記錄的完整內容（含解析後的變更內容）"""
+        audit_writer.flush(AuditLogger.READ_FLUSH_TIMEOUT)
+        logs = db_manager.execute_query("""
+            SELECT 
+                id, user_id, username, action, resource_type, resource_id, resource_name,
+                old_values, new_values, ip_address, user_agent, created_at
+            FROM audit_logs
+            WHERE id = ?
+        """, (log_id,))
+        return AuditLogger._decode_values(logs[0]) if logs else None
     
     @staticmethod
     def log_test_case_create(user_id: str, username: str, test_case_data: Dict):
@@ -334,26 +409,65 @@ class AuditLogger:
         )
     
     @staticmethod
-    def get_audit_stats():
-        """獲取審計統計"""
-        query = """
-            SELECT 
-                action,
-                resource_type,
-                COUNT(*) as count
-            FROM audit_logs 
-            GROUP BY action, resource_type
-            ORDER BY count DESC
-        """
-        
-        stats = db_manager.execute_query(query)
+    def _count_filters(resource_type: str = None, actions: tuple = None,
+                       start_day: str = None, end_day: str = None):
+        """每日計數表的篩選條件（日期為 YYYY-MM-DD，與 DATE(created_at) 相同）"""
+        audit_writer.flush(AuditLogger.READ_FLUSH_TIMEOUT)
+        audit_writer.ensure_daily_counts()
         
-        # 總計
-        total_query = "SELECT COUNT(*) as total FROM audit_logs"
-        total_result = db_manager.execute_query(total_query)
-        total = total_result[0]['total'] if total_result else 0
+        where_conditions = []
+        params = []
+        if resource_type:
+            where_conditions.append("resource_type = ?")
+            params.append(resource_type)
+        if actions:
+            where_conditions.append(f"action IN ({', '.join('?' * len(actions))})")
+            params.extend(actions)
+        if start_day:
+            where_conditions.append("day >= ?")
+            params.append(start_day)
+        if end_day:
+            where_conditions.append("day <= ?")
+            params.append(end_day)
         
+        where_clause = "WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+        return where_clause, tuple(params)
+    
+    @staticmethod
+    def count_operations(**filters) -> int:
+        """操作次數（含已封存的月份）"""
+        where_clause, params = AuditLogger._count_filters(**filters)
+        result = db_manager.execute_query(
+            f"SELECT COALESCE(SUM(count), 0) AS count FROM audit_log_daily_counts {where_clause}", params
+        )
+        return result[0]['count'] if result else 0
+    
+    @staticmethod
+    def count_active_users(**filters) -> int:
+        """有操作的不重複用戶數"""
+        where_clause, params = AuditLogger._count_filters(**filters)
+        result = db_manager.execute_query(
+            f"SELECT COUNT(DISTINCT user_id) AS count FROM audit_log_daily_counts {where_clause}", params
+        )
+        return result[0]['count'] if result else 0
+    
+    @staticmethod
+    def count_operations_by(columns: tuple = ('action',), **filters):
+        """依欄位（action、resource_type）分組的操作次數，由多到少"""
+        group_by = ', '.join(column for column in columns if column in ('action', 'resource_type'))
+        where_clause, params = AuditLogger._count_filters(**filters)
+        return db_manager.execute_query(f"""
+            SELECT {group_by}, SUM(count) AS count
+            FROM audit_log_daily_counts
+            {where_clause}
+            GROUP BY {group_by}
+            ORDER BY count DESC
+        """, params)
+    
+    @staticmethod
+    def get_audit_stats():
+        """獲取審計統計（由每日計數彙總）"""
         return {
-            'total': total,
-            'by_action_and_resource': stats
+            'total': AuditLogger.count_operations(),
+            'by_action_and_resource': AuditLogger.count_operations_by(('action', 'resource_type'))
         }
\ No newline at end of file
@@ -0,0 +1,202 @@
+"""
+非同步審計日誌寫入器
+請求中只把記錄放入有界佇列，由背景執行緒以批次交易寫入 audit_logs，
+避免每次操作都在請求內等待 SQLite 提交；同一交易內增量更新每日計數
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+from database.db_manager import db_manager
+from audit_archive import audit_archive
+import config as config_module
+
+INSERT_QUERY = """
+    INSERT INTO audit_logs (
+        user_id, username, action, resource_type, resource_id, resource_name,
+        old_values, new_values, ip_address, user_agent, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+COUNT_QUERY = """
+    INSERT INTO audit_log_daily_counts (day, user_id, action, resource_type, count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (day, user_id, action, resource_type) DO UPDATE SET
+        count = count + excluded.count
+"""
+
+# 佇列已滿時的處理方式
+POLICY_DROP = 'drop'    # 直接丟棄並計數
+POLICY_BLOCK = 'block'  # 最多等待 block_timeout 秒，仍無空間才丟棄
+
+class AuditWriter:
+    """
+    有界佇列 + 背景批次寫入
+    第一筆記錄到達後最多等待 flush_interval 秒或累積 batch_size 筆再寫入；
+    行程結束時（atexit）會寫完佇列中的記錄
+    """
+    
+    def __init__(self, max_queue: int = None, batch_size: int = None, flush_interval: float = None,
+                 policy: str = None, block_timeout: float = None):
+        self.max_queue = max_queue or getattr(config_module, 'AUDIT_QUEUE_SIZE', 10000)
+        self.batch_size = batch_size or getattr(config_module, 'AUDIT_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(config_module, 'AUDIT_FLUSH_INTERVAL', 0.5)
+        self.policy = policy or getattr(config_module, 'AUDIT_QUEUE_FULL_POLICY', POLICY_DROP)
+        self.block_timeout = block_timeout or getattr(config_module, 'AUDIT_BLOCK_TIMEOUT', 1.0)
+        self.enabled = getattr(config_module, 'AUDIT_ASYNC_WRITES', True)
+        
+        self.queue = queue.Queue(maxsize=self.max_queue)
+        self.condition = threading.Condition()
+        self.flush_requested = threading.Event()
+        self.thread = None
+        self.stopped = False
+        self.counts_ready = False
+        self.counts_lock = threading.Lock()
+        
+        # 計數器
+        self.queued = 0   # 已接受（放入佇列或直接寫入）
+        self.written = 0  # 已寫入資料庫
+        self.dropped = 0  # 佇列已滿而丟棄
+        self.failed = 0   # 寫入失敗
+        self.batches = 0
+        
+        atexit.register(self.stop)
+    
+    def submit(self, row: tuple) -> bool:
+        """放入一筆記錄，佇列已滿而丟棄時返回 False"""
+        if self.stopped or not self.enabled:
+            # 未啟用或已關閉（例如 atexit 之後）時直接寫入
+            with self.condition:
+                self.queued += 1
+            self._write_batch([row])
+            return True
+        
+        self._ensure_started()
+        try:
+            if self.policy == POLICY_BLOCK:
+                self.queue.put(row, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(row)
+        except queue.Full:
+            with self.condition:
+                self.dropped += 1
+            return False
+        
+        with self.condition:
+            self.queued += 1
+        return True
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待目前已放入佇列的記錄全部處理完，逾時返回 False"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            target = self.queued
+            if self.written + self.failed >= target:
+                return True
+            self.flush_requested.set()
+            while self.written + self.failed < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not (self.thread and self.thread.is_alive()):
+                    return False
+                self.condition.wait(remaining)
+        return True
+    
+    def stop(self, timeout: float = 5.0):
+        """寫完佇列中的記錄並停止背景執行緒"""
+        self.flush(timeout)
+        self.stopped = True
+        self.flush_requested.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
+    
+    def get_stats(self) -> Dict:
+        """寫入器計數器"""
+        with self.condition:
+            return {
+                'enabled': self.enabled,
+                'policy': self.policy,
+                'queued': self.queued,
+                'pending': self.queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches
+            }
+    
+    def _ensure_started(self):
+        """第一次寫入時才啟動背景執行緒"""
+        if self.thread and self.thread.is_alive():
+            return
+        with self.condition:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self.thread.start()
+    
+    def _run(self):
+        """背景執行緒：收集一批記錄後以單一交易寫入"""
+        while not (self.stopped and self.queue.empty()):
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0 or self.flush_requested.is_set():
+                        batch.append(self.queue.get_nowait())
+                    else:
+                        batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            if self.queue.empty():
+                self.flush_requested.clear()
+            self._write_batch(batch)
+    
+    def ensure_daily_counts(self):
+        """每日計數表為空而 audit_logs 已有資料時（升級前的資料庫），由既有記錄重建計數"""
+        if self.counts_ready:
+            return
+        with self.counts_lock:
+            if self.counts_ready:
+                return
+            with db_manager.get_db_cursor() as cursor:
+                cursor.execute("SELECT 1 FROM audit_log_daily_counts LIMIT 1")
+                if cursor.fetchone() is None:
+                    cursor.execute("""
+                        INSERT INTO audit_log_daily_counts (day, user_id, action, resource_type, count)
+                        SELECT substr(created_at, 1, 10), user_id, action, resource_type, COUNT(*)
+                        FROM audit_logs
+                        GROUP BY 1, 2, 3, 4
+                    """)
+            self.counts_ready = True
+    
+    def _write_batch(self, batch: List[tuple]):
+        """寫入一批記錄並於同一交易更新每日計數"""
+        counts = Counter((row[10][:10], row[0], row[2], row[3]) for row in batch)
+        try:
+            self.ensure_daily_counts()
+            with db_manager.get_db_cursor() as cursor:
+                cursor.executemany(INSERT_QUERY, batch)
+                cursor.executemany(COUNT_QUERY, [key + (count,) for key, count in counts.items()])
+            written, failed = len(batch), 0
+        except Exception as e:
+            # 記錄失敗不應該影響主要業務流程
+            print(f"審計日誌批次寫入失敗 ({len(batch)} 筆): {e}")
+            written, failed = 0, len(batch)
+        
+        with self.condition:
+            self.written += written
+            self.failed += failed
+            self.batches += 1
+            self.condition.notify_all()
+        
+        # 封存在自己的背景執行緒執行，不阻塞寫入器
+        audit_archive.ensure_started()
+
+audit_writer = AuditWriter()
@@ -0,0 +1,128 @@
+import asyncio
+import time
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import config as config_module
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class AsyncCheckEngine:
+    """併發 API 健康檢查引擎（基於 aiohttp）"""
+
+    def __init__(self, timeout: float = None, max_concurrency: int = None,
+                 per_host_limit: int = None):
+        self.timeout = timeout if timeout is not None else getattr(config_module, 'REQUEST_TIMEOUT', 10)
+        self.max_concurrency = max_concurrency or getattr(config_module, 'CHECK_MAX_CONCURRENCY', 50)
+        self.per_host_limit = per_host_limit or getattr(config_module, 'CHECK_PER_HOST_LIMIT', 5)
+
+    @staticmethod
+    def is_available() -> bool:
+        """檢查 aiohttp 是否可用"""
+        return aiohttp is not None
+
+    def check_apis(self, apis: List[Dict]) -> List[Tuple[Dict, Tuple[str, float, str, str, Optional[int]]]]:
+        """
+        同步入口：併發檢查多個 API
+        返回: [(api, (status, response_time, error_message, response_data, status_code)), ...]，順序與輸入相同
+        """
+        if not apis:
+            return []
+
+        def run_async():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                return loop.run_until_complete(self.check_apis_async(apis))
+            finally:
+                loop.close()
+
+        # 在新線程中運行，避免與呼叫端既有的事件迴圈衝突
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(run_async).result()
+
+    async def check_apis_async(self, apis: List[Dict]) -> List[Tuple[Dict, Tuple[str, float, str, str, Optional[int]]]]:
+        """併發檢查多個 API（全域與每主機併發限制）"""
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for concurrent health checks")
+
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.per_host_limit
+        )
+        async with aiohttp.ClientSession(connector=connector) as session:
+            tasks = []
+            for api in apis:
+                host = self._host_key(api.get('url', ''))
+                if host not in host_limits:
+                    host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+                tasks.append(self._check_with_limits(session, api, global_limit, host_limits[host]))
+
+            results = await asyncio.gather(*tasks)
+
+        return list(zip(apis, results))
+
+    async def _check_with_limits(self, session, api: Dict, global_limit: asyncio.Semaphore,
+                                 host_limit: asyncio.Semaphore) -> Tuple[str, float, str, str, Optional[int]]:
+        """取得併發名額後才開始計時，排隊時間不計入回應時間"""
+        async with host_limit:
+            async with global_limit:
+                return await self._check_one(session, api)
+
+    async def _check_one(self, session, api: Dict) -> Tuple[str, float, str, str, Optional[int]]:
+        """
+        檢查單一 API，結果格式與 APIChecker.make_request_with_status_code 相同
+        返回: (status, response_time, error_message, response_data, status_code)
+        """
+        timeout = api.get('timeout', self.timeout)
+        try:
+            start_time = time.time()
+            method = api.get('method', 'GET').upper()
+            url = api['url']
+            headers = api.get('headers', {})
+
+            # 處理請求體和動態變數
+            data = api.get('body', api.get('request_body', ''))
+            if data and '{{timestamp}}' in data:
+                current_timestamp = str(int(time.time()))
+                data = data.replace('{{timestamp}}', current_timestamp)
+
+            async with session.request(
+                method=method,
+                url=url,
+                headers=headers,
+                data=data or None,
+                timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                response_text = await response.text(errors='replace')
+                response_time = time.time() - start_time
+
+                if 200 <= response.status < 300:
+                    status = 'healthy'
+                    error_message = ''
+                else:
+                    status = 'unhealthy'
+                    error_message = f'HTTP {response.status}'
+
+                return status, response_time, error_message, response_text[:1000], response.status
+
+        except asyncio.TimeoutError:
+            return 'unhealthy', timeout, '請求超時', '', None
+        except aiohttp.ClientConnectionError:
+            return 'unhealthy', 0.0, '連接錯誤', '', None
+        except Exception as e:
+            return 'unhealthy', 0.0, str(e), '', None
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        """取得用於每主機限流的 key"""
+        try:
+            return urlsplit(url).netloc.lower()
+        except ValueError:
+            return url
@@ -0,0 +1,239 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from database.db_manager import db_manager
+from latency_histogram import LatencyHistogram
+import config as config_module
+
+# 錯誤分類
+ERROR_TIMEOUT = 'timeout'
+ERROR_CONNECTION = 'connection'
+ERROR_HTTP_4XX = 'http_4xx'
+ERROR_HTTP_5XX = 'http_5xx'
+ERROR_HTTP_OTHER = 'http_other'
+ERROR_OTHER = 'other'
+
+def classify_error(status: str, status_code: Optional[int], error_msg: Optional[str]) -> Optional[str]:
+    """將檢查結果轉為精簡的錯誤分類，健康時返回 None"""
+    if status == 'healthy':
+        return None
+    if status_code:
+        if 400 <= status_code < 500:
+            return ERROR_HTTP_4XX
+        if 500 <= status_code < 600:
+            return ERROR_HTTP_5XX
+        return ERROR_HTTP_OTHER
+    if error_msg == '請求超時':
+        return ERROR_TIMEOUT
+    if error_msg == '連接錯誤':
+        return ERROR_CONNECTION
+    return ERROR_OTHER
+
+class CheckHistoryStore:
+    """
+    健康檢查歷史（時間序列）儲存
+    原始結果只追加寫入 api_check_results；同一批次同時增量更新
+    1 分鐘、1 小時、1 天三種解析度的彙總，查詢長時間區間時只讀取彙總資料
+    """
+    
+    RESOLUTIONS = (60, 3600, 86400)
+    PRUNE_CHUNK_SIZE = 5000
+    
+    def __init__(self):
+        self.raw_retention_days = getattr(config_module, 'CHECK_HISTORY_RAW_RETENTION_DAYS', 7)
+        self.rollup_retention_days = {
+            60: getattr(config_module, 'CHECK_HISTORY_MINUTE_RETENTION_DAYS', 30),
+            3600: getattr(config_module, 'CHECK_HISTORY_HOUR_RETENTION_DAYS', 365),
+            86400: getattr(config_module, 'CHECK_HISTORY_DAY_RETENTION_DAYS', 0)
+        }
+        self.prune_interval = getattr(config_module, 'CHECK_HISTORY_PRUNE_INTERVAL', 3600)
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+    
+    # ---------- 寫入 ----------
+    
+    def record_results(self, records: List[Dict]):
+        """
+        批次寫入檢查結果並更新彙總（單一交易）
+        records: [{'api_id', 'ts', 'latency_ms', 'status_code', 'error_class'}, ...]
+        """
+        if not records:
+            return
+        
+        raw_rows = []
+        rollups: Dict[Tuple[str, int, int], Dict] = {}
+        for record in records:
+            ts = int(record['ts'])
+            latency_ms = float(record.get('latency_ms') or 0.0)
+            ok = record.get('error_class') is None
+            raw_rows.append((
+                record['api_id'], ts, round(latency_ms, 3),
+                record.get('status_code'), record.get('error_class')
+            ))
+            
+            for resolution in self.RESOLUTIONS:
+                key = (record['api_id'], resolution, ts - ts % resolution)
+                rollup = rollups.get(key)
+                if rollup is None:
+                    rollup = rollups[key] = {
+                        'count': 0, 'ok_count': 0, 'latency_sum': 0.0,
+                        'latency_min': latency_ms, 'latency_max': latency_ms,
+                        'histogram': LatencyHistogram()
+                    }
+                rollup['count'] += 1
+                rollup['ok_count'] += 1 if ok else 0
+                rollup['latency_sum'] += latency_ms
+                rollup['latency_min'] = min(rollup['latency_min'], latency_ms)
+                rollup['latency_max'] = max(rollup['latency_max'], latency_ms)
+                rollup['histogram'].record(latency_ms)
+        
+        rollup_rows = [
+            (api_id, resolution, bucket_start, r['count'], r['ok_count'], r['latency_sum'],
+             r['latency_min'], r['latency_max'], r['histogram'].to_json())
+            for (api_id, resolution, bucket_start), r in rollups.items()
+        ]
+        
+        with db_manager.get_db_cursor() as cursor:
+            cursor.connection.create_function('merge_histogram', 2, LatencyHistogram.merge_json,
+                                              deterministic=True)
+            cursor.executemany("""
+                INSERT INTO api_check_results (api_id, ts, latency_ms, status_code, error_class)
+                VALUES (?, ?, ?, ?, ?)
+            """, raw_rows)
+            cursor.executemany("""
+                INSERT INTO api_check_rollups (
+                    api_id, resolution, bucket_start, count, ok_count,
+                    latency_sum, latency_min, latency_max, histogram
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (api_id, resolution, bucket_start) DO UPDATE SET
+                    count = count + excluded.count,
+                    ok_count = ok_count + excluded.ok_count,
+                    latency_sum = latency_sum + excluded.latency_sum,
+                    latency_min = MIN(latency_min, excluded.latency_min),
+                    latency_max = MAX(latency_max, excluded.latency_max),
+                    histogram = merge_histogram(histogram, excluded.histogram)
+            """, rollup_rows)
+        
+        self.prune_if_due()
+    
+    # ---------- 保留政策 ----------
+    
+    def prune_if_due(self):
+        """距離上次清理超過 prune_interval 時執行清理"""
+        now = time.time()
+        with self._prune_lock:
+            if now - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = now
+        self.prune()
+    
+    def prune(self) -> Dict[str, int]:
+        """依保留天數刪除過期的原始資料與彙總（分批刪除，避免長時間鎖住資料庫）"""
+        now = int(time.time())
+        deleted = {'raw': 0}
+        
+        if self.raw_retention_days > 0:
+            deleted['raw'] = self._delete_in_chunks("""
+                DELETE FROM api_check_results WHERE rowid IN (
+                    SELECT rowid FROM api_check_results WHERE ts < ? LIMIT ?
+                )
+            """, now - self.raw_retention_days * 86400)
+        
+        for resolution, days in self.rollup_retention_days.items():
+            deleted[f'rollup_{resolution}'] = 0
+            if days > 0:
+                deleted[f'rollup_{resolution}'] = db_manager.execute_delete("""
+                    DELETE FROM api_check_rollups WHERE resolution = ? AND bucket_start < ?
+                """, (resolution, now - days * 86400))
+        
+        return deleted
+    
+    def _delete_in_chunks(self, query: str, cutoff: int) -> int:
+        total = 0
+        while True:
+            deleted = db_manager.execute_delete(query, (cutoff, self.PRUNE_CHUNK_SIZE))
+            total += deleted
+            if deleted < self.PRUNE_CHUNK_SIZE:
+                return total
+    
+    # ---------- 查詢 ----------
+    
+    def choose_resolution(self, start_ts: int, end_ts: int, max_points: int = 2000) -> int:
+        """選擇仍在保留期內且資料點數量不超過 max_points 的最細解析度"""
+        now = int(time.time())
+        for resolution in self.RESOLUTIONS:
+            days = self.rollup_retention_days[resolution]
+            covers = days <= 0 or start_ts >= now - days * 86400
+            if covers and (end_ts - start_ts) / resolution <= max_points:
+                return resolution
+        return self.RESOLUTIONS[-1]
+    
+    def _load_rollups(self, api_id: str, start_ts: int, end_ts: int,
+                      resolution: int) -> List[Dict]:
+        return db_manager.execute_query("""
+            SELECT bucket_start, count, ok_count, latency_sum, latency_min, latency_max, histogram
+            FROM api_check_rollups
+            WHERE api_id = ? AND resolution = ? AND bucket_start >= ? AND bucket_start < ?
+            ORDER BY bucket_start
+        """, (api_id, resolution, start_ts - start_ts % resolution, end_ts))
+    
+    def get_summary(self, api_id: str, start_ts: int, end_ts: int,
+                    percentiles: Iterable[float] = (50, 95, 99)) -> Dict:
+        """區間內的可用率與延遲百分位數（合併彙總直方圖計算）"""
+        resolution = self.choose_resolution(start_ts, end_ts)
+        rows = self._load_rollups(api_id, start_ts, end_ts, resolution)
+        
+        histogram = LatencyHistogram()
+        count = ok_count = 0
+        latency_sum = 0.0
+        for row in rows:
+            count += row['count']
+            ok_count += row['ok_count']
+            latency_sum += row['latency_sum']
+            histogram.merge(LatencyHistogram.from_json(row['histogram']))
+        
+        return {
+            'api_id': api_id,
+            'start': start_ts,
+            'end': end_ts,
+            'resolution': resolution,
+            'checks': count,
+            'uptime': round(ok_count / count * 100, 3) if count else None,
+            'avg_latency_ms': round(latency_sum / count, 3) if count else None,
+            'latency_min_ms': min((row['latency_min'] for row in rows), default=None),
+            'latency_max_ms': max((row['latency_max'] for row in rows), default=None),
+            'percentiles': histogram.percentiles(percentiles)
+        }
+    
+    def get_series(self, api_id: str, start_ts: int, end_ts: int,
+                   resolution: int = None) -> Dict:
+        """繪圖用的時間序列（每個時間桶的檢查數、可用率、平均與 p95 延遲）"""
+        if resolution not in self.RESOLUTIONS:
+            resolution = self.choose_resolution(start_ts, end_ts)
+        rows = self._load_rollups(api_id, start_ts, end_ts, resolution)
+        
+        points = []
+        for row in rows:
+            histogram = LatencyHistogram.from_json(row['histogram'])
+            points.append({
+                'ts': row['bucket_start'],
+                'checks': row['count'],
+                'uptime': round(row['ok_count'] / row['count'] * 100, 3) if row['count'] else None,
+                'avg_latency_ms': round(row['latency_sum'] / row['count'], 3) if row['count'] else None,
+                'latency_min_ms': row['latency_min'],
+                'latency_max_ms': row['latency_max'],
+                'p95_latency_ms': histogram.percentile(95)
+            })
+        
+        return {'api_id': api_id, 'resolution': resolution, 'points': points}
+    
+    def get_raw_results(self, api_id: str, start_ts: int, end_ts: int,
+                        limit: int = 1000) -> List[Dict]:
+        """取得原始檢查結果（僅保留期內）"""
+        return db_manager.execute_query("""
+            SELECT ts, latency_ms, status_code, error_class
+            FROM api_check_results
+            WHERE api_id = ? AND ts >= ? AND ts < ?
+            ORDER BY ts DESC
+            LIMIT ?
+        """, (api_id, start_ts, end_ts, limit))
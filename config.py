@@ -11,6 +11,60 @@ import os
 CHECK_INTERVAL = int(os.environ.get('CHECK_INTERVAL', 60))  # 檢查間隔（秒）
 MAX_ERROR_COUNT = int(os.environ.get('MAX_ERROR_COUNT', 3))  # 連續錯誤次數閾值
 REQUEST_TIMEOUT = int(os.environ.get('REQUEST_TIMEOUT', 10))  # HTTP 請求超時時間（秒）
+CHECK_MAX_CONCURRENCY = int(os.environ.get('CHECK_MAX_CONCURRENCY', 50))  # 健康檢查全域併發上限
+CHECK_PER_HOST_LIMIT = int(os.environ.get('CHECK_PER_HOST_LIMIT', 5))  # 每個主機的健康檢查併發上限
+CHECK_JITTER_RATIO = float(os.environ.get('CHECK_JITTER_RATIO', 0.1))  # 檢查間隔的隨機抖動比例
+
+# 排程器配置
+SCHEDULER_TICK_SECONDS = int(os.environ.get('SCHEDULER_TICK_SECONDS', 1))  # 到期檢查的派發頻率（秒）
+SCHEDULER_SYNC_SECONDS = int(os.environ.get('SCHEDULER_SYNC_SECONDS', 60))  # 重新同步 API 清單的頻率（秒）
+SCHEDULER_MAX_CONCURRENT_TICKS = int(os.environ.get('SCHEDULER_MAX_CONCURRENT_TICKS', 10))  # 可同時執行的派發批次
+
+# 壓力測試配置
+STRESS_TEST_SAMPLE_SIZE = int(os.environ.get('STRESS_TEST_SAMPLE_SIZE', 200))  # 保留的抽樣請求紀錄筆數
+STRESS_TEST_MAX_IN_FLIGHT = int(os.environ.get('STRESS_TEST_MAX_IN_FLIGHT', 500))  # 開放模型同時進行中的請求上限
+STRESS_TEST_WORKERS = int(os.environ.get('STRESS_TEST_WORKERS', 1))  # 壓力測試工作行程數（1 表示在目前行程執行）
+STRESS_TEST_SNAPSHOT_INTERVAL = float(os.environ.get('STRESS_TEST_SNAPSHOT_INTERVAL', 1.0))  # 工作行程回傳統計快照的間隔（秒）
+STRESS_TEST_LIVE_INTERVAL = float(os.environ.get('STRESS_TEST_LIVE_INTERVAL', 1.0))  # 即時監控快照的發布間隔（秒）
+
+# 審計日誌寫入配置
+AUDIT_ASYNC_WRITES = os.environ.get('AUDIT_ASYNC_WRITES', 'True').lower() == 'true'  # 以背景執行緒批次寫入審計日誌
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))  # 待寫入佇列上限
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))  # 每個交易最多寫入的筆數
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 0.5))  # 收集一批記錄的最長等待時間（秒）
+AUDIT_QUEUE_FULL_POLICY = os.environ.get('AUDIT_QUEUE_FULL_POLICY', 'drop')  # 佇列已滿時：drop 直接丟棄，block 等待後丟棄
+AUDIT_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_BLOCK_TIMEOUT', 1.0))  # block 模式的最長等待時間（秒）
+AUDIT_HOT_MONTHS = int(os.environ.get('AUDIT_HOT_MONTHS', 3))  # audit_logs 保留的月份數（含當月），更早的月份封存（0 表示不封存）
+AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR', 'data/audit_archive')  # 封存檔目錄
+AUDIT_ARCHIVE_RETENTION_MONTHS = int(os.environ.get('AUDIT_ARCHIVE_RETENTION_MONTHS', 0))  # 封存檔保留月份數（0 表示永久保留）
+AUDIT_ARCHIVE_INTERVAL = int(os.environ.get('AUDIT_ARCHIVE_INTERVAL', 86400))  # 封存檢查頻率（秒）
+
+# 檢查歷史保留配置（天數，0 表示永久保留）
+CHECK_HISTORY_RAW_RETENTION_DAYS = int(os.environ.get('CHECK_HISTORY_RAW_RETENTION_DAYS', 7))  # 原始檢查結果
+CHECK_HISTORY_MINUTE_RETENTION_DAYS = int(os.environ.get('CHECK_HISTORY_MINUTE_RETENTION_DAYS', 30))  # 1 分鐘彙總
+CHECK_HISTORY_HOUR_RETENTION_DAYS = int(os.environ.get('CHECK_HISTORY_HOUR_RETENTION_DAYS', 365))  # 1 小時彙總
+CHECK_HISTORY_DAY_RETENTION_DAYS = int(os.environ.get('CHECK_HISTORY_DAY_RETENTION_DAYS', 0))  # 1 天彙總
+CHECK_HISTORY_PRUNE_INTERVAL = int(os.environ.get('CHECK_HISTORY_PRUNE_INTERVAL', 3600))  # 清理頻率（秒）
+
+# SQLite 連線配置
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'performance')  # performance（WAL + synchronous=NORMAL）或 safe（SQLite 預設）
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))  # 記憶體映射讀取的大小（位元組，0 表示停用）
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))  # 每個連線的頁面快取（KiB）
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))  # 等待資料庫鎖的時間（毫秒）
+SQLITE_BUSY_RETRIES = int(os.environ.get('SQLITE_BUSY_RETRIES', 5))  # 仍為 SQLITE_BUSY 時的重試次數
+SQLITE_BUSY_BACKOFF_MS = int(os.environ.get('SQLITE_BUSY_BACKOFF_MS', 50))  # 第一次重試前的等待時間（毫秒，之後倍增）
+SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 8))  # 每個行程的唯讀連線數上限（寫入固定一條連線）
+SQLITE_POOL_TIMEOUT = float(os.environ.get('SQLITE_POOL_TIMEOUT', 30))  # 等待連線池連線的時間（秒）
+QUERY_PROFILING = os.environ.get('QUERY_PROFILING', 'True').lower() == 'true'  # 依語句指紋統計查詢耗時
+QUERY_PROFILE_SAMPLE_RATE = float(os.environ.get('QUERY_PROFILE_SAMPLE_RATE', 1.0))  # 納入統計的呼叫比例（0~1，慢查詢一律記錄）
+QUERY_SLOW_MS = float(os.environ.get('QUERY_SLOW_MS', 100))  # 慢查詢門檻（毫秒，0 表示停用），超過時擷取 EXPLAIN QUERY PLAN
+QUERY_PROFILE_MAX_STATEMENTS = int(os.environ.get('QUERY_PROFILE_MAX_STATEMENTS', 500))  # 最多追蹤的語句指紋數
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60))  # 用戶快取存活時間（秒，0 表示停用；其他 worker 的修改由共用的變更版本立即反映）
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))  # 用戶快取最多筆數（LRU 淘汰）
+STATUS_SNAPSHOT_MAX_AGE = float(os.environ.get('STATUS_SNAPSHOT_MAX_AGE', 10))  # API 狀態快照最長沿用秒數（反映其他 worker 的修改）
+STATUS_LATENCY_CHANGE_RATIO = float(os.environ.get('STATUS_LATENCY_CHANGE_RATIO', 0.2))  # 延遲相對上次發布值的變化超過此比例才算變更
+STATUS_LATENCY_CHANGE_MIN = float(os.environ.get('STATUS_LATENCY_CHANGE_MIN', 0.05))  # 延遲變化至少要超過的秒數（避免毫秒級抖動觸發變更）
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 64))  # 專案報告快取最多專案數（LRU 淘汰，依專案資料版本失效）
 
 # ========== 應用程式配置 ==========
 
@@ -41,6 +95,11 @@ ENABLE_LOGGING = os.environ.get('ENABLE_LOGGING', 'True').lower() == 'true'
 
 # ========== HTTP 和 API 配置 ==========
 
+# HTTP 連線池配置（健康檢查與壓力測試共用）
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 100))  # 快取的主機連線池數量
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))  # 每個主機保留的 keep-alive 連線數
+HTTP_ENABLE_HTTP2 = os.environ.get('HTTP_ENABLE_HTTP2', 'False').lower() == 'true'  # 使用 httpx 啟用 HTTP/2
+
 # 允許的 HTTP 方法
 ALLOWED_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'PATCH', 'HEAD', 'OPTIONS']
 
@@ -111,9 +170,57 @@ class Config:
     SECRET_KEY = SECRET_KEY
     DATA_FILE = DATA_FILE
     DATABASE_FILE = DATABASE_FILE
+    LOG_LEVEL = LOG_LEVEL
     CHECK_INTERVAL = CHECK_INTERVAL
     MAX_ERROR_COUNT = MAX_ERROR_COUNT
     REQUEST_TIMEOUT = REQUEST_TIMEOUT
+    CHECK_MAX_CONCURRENCY = CHECK_MAX_CONCURRENCY
+    CHECK_PER_HOST_LIMIT = CHECK_PER_HOST_LIMIT
+    CHECK_JITTER_RATIO = CHECK_JITTER_RATIO
+    SCHEDULER_TICK_SECONDS = SCHEDULER_TICK_SECONDS
+    SCHEDULER_SYNC_SECONDS = SCHEDULER_SYNC_SECONDS
+    SCHEDULER_MAX_CONCURRENT_TICKS = SCHEDULER_MAX_CONCURRENT_TICKS
+    CHECK_HISTORY_RAW_RETENTION_DAYS = CHECK_HISTORY_RAW_RETENTION_DAYS
+    CHECK_HISTORY_MINUTE_RETENTION_DAYS = CHECK_HISTORY_MINUTE_RETENTION_DAYS
+    CHECK_HISTORY_HOUR_RETENTION_DAYS = CHECK_HISTORY_HOUR_RETENTION_DAYS
+    CHECK_HISTORY_DAY_RETENTION_DAYS = CHECK_HISTORY_DAY_RETENTION_DAYS
+    CHECK_HISTORY_PRUNE_INTERVAL = CHECK_HISTORY_PRUNE_INTERVAL
+    STRESS_TEST_SAMPLE_SIZE = STRESS_TEST_SAMPLE_SIZE
+    STRESS_TEST_MAX_IN_FLIGHT = STRESS_TEST_MAX_IN_FLIGHT
+    STRESS_TEST_WORKERS = STRESS_TEST_WORKERS
+    STRESS_TEST_SNAPSHOT_INTERVAL = STRESS_TEST_SNAPSHOT_INTERVAL
+    STRESS_TEST_LIVE_INTERVAL = STRESS_TEST_LIVE_INTERVAL
+    AUDIT_ASYNC_WRITES = AUDIT_ASYNC_WRITES
+    AUDIT_QUEUE_SIZE = AUDIT_QUEUE_SIZE
+    AUDIT_BATCH_SIZE = AUDIT_BATCH_SIZE
+    AUDIT_FLUSH_INTERVAL = AUDIT_FLUSH_INTERVAL
+    AUDIT_QUEUE_FULL_POLICY = AUDIT_QUEUE_FULL_POLICY
+    AUDIT_BLOCK_TIMEOUT = AUDIT_BLOCK_TIMEOUT
+    AUDIT_HOT_MONTHS = AUDIT_HOT_MONTHS
+    AUDIT_ARCHIVE_DIR = AUDIT_ARCHIVE_DIR
+    AUDIT_ARCHIVE_RETENTION_MONTHS = AUDIT_ARCHIVE_RETENTION_MONTHS
+    AUDIT_ARCHIVE_INTERVAL = AUDIT_ARCHIVE_INTERVAL
+    SQLITE_PROFILE = SQLITE_PROFILE
+    SQLITE_MMAP_SIZE = SQLITE_MMAP_SIZE
+    SQLITE_CACHE_SIZE_KB = SQLITE_CACHE_SIZE_KB
+    SQLITE_BUSY_TIMEOUT_MS = SQLITE_BUSY_TIMEOUT_MS
+    SQLITE_BUSY_RETRIES = SQLITE_BUSY_RETRIES
+    SQLITE_BUSY_BACKOFF_MS = SQLITE_BUSY_BACKOFF_MS
+    SQLITE_READ_POOL_SIZE = SQLITE_READ_POOL_SIZE
+    SQLITE_POOL_TIMEOUT = SQLITE_POOL_TIMEOUT
+    QUERY_PROFILING = QUERY_PROFILING
+    QUERY_PROFILE_SAMPLE_RATE = QUERY_PROFILE_SAMPLE_RATE
+    QUERY_SLOW_MS = QUERY_SLOW_MS
+    QUERY_PROFILE_MAX_STATEMENTS = QUERY_PROFILE_MAX_STATEMENTS
+    USER_CACHE_TTL = USER_CACHE_TTL
+    USER_CACHE_SIZE = USER_CACHE_SIZE
+    STATUS_SNAPSHOT_MAX_AGE = STATUS_SNAPSHOT_MAX_AGE
+    STATUS_LATENCY_CHANGE_RATIO = STATUS_LATENCY_CHANGE_RATIO
+    STATUS_LATENCY_CHANGE_MIN = STATUS_LATENCY_CHANGE_MIN
+    REPORT_CACHE_SIZE = REPORT_CACHE_SIZE
+    HTTP_POOL_CONNECTIONS = HTTP_POOL_CONNECTIONS
+    HTTP_POOL_MAXSIZE = HTTP_POOL_MAXSIZE
+    HTTP_ENABLE_HTTP2 = HTTP_ENABLE_HTTP2
     DEBUG = DEBUG
     DEFAULT_HOST = DEFAULT_HOST
     DEFAULT_PORT = DEFAULT_PORT
\ No newline at end of file
@@ -3,6 +3,7 @@ import json
 from datetime import datetime
 from typing import List, Dict, Optional
 from database.db_manager import db_manager
+from status_snapshot import status_snapshot, latency_thresholds
 
 class DataManager:
     """基於 SQLite 的資料管理器"""
@@ -17,33 +18,85 @@ class DataManager:
         # 向後兼容，但實際上使用 SQLite
         pass
     
+    # API 清單與單一 API 查詢共用的欄位（不含壓力測試結果）
+    API_COLUMNS = (
+        'id', 'name', 'url', 'type', 'method', 'request_body',
+        'status', 'response_time', 'last_check', 'error_count',
+        'last_error', 'last_response',
+        'concurrent_requests', 'duration_seconds', 'interval_seconds',
+        'check_interval_seconds', 'target_rps', 'load_profile',
+        'change_version', 'created_at', 'updated_at'
+    )
+    
+    # 狀態、錯誤或延遲有明顯變化（與 status_snapshot.latency_changed 相同的門檻）
+    STATUS_CHANGED_CONDITION = """
+        status IS NOT :status
+        OR last_error IS NOT (CASE WHEN :status = 'unhealthy' THEN :error_msg ELSE NULL END)
+        OR (response_time IS NULL) != (:response_time IS NULL)
+        OR ABS(:response_time - response_time) > MAX(ABS(response_time) * :latency_ratio, :latency_min)
+    """
+    
+    # 寫入狀態時與新值比較：有變才更新 change_version 與延遲（延遲保存上次發布的值）
+    STATUS_UPDATE_QUERY = f"""
+        UPDATE apis 
+        SET change_version = CASE WHEN {STATUS_CHANGED_CONDITION} THEN :change_version ELSE change_version END,
+            response_time = CASE WHEN {STATUS_CHANGED_CONDITION} THEN :response_time ELSE response_time END,
+            status = :status, last_check = :checked_at, 
+            last_response = :response_data, error_count = CASE 
+                WHEN :status = 'unhealthy' THEN error_count + 1 
+                ELSE 0 
+            END,
+            last_error = CASE 
+                WHEN :status = 'unhealthy' THEN :error_msg 
+                ELSE NULL 
+            END
+        WHERE id = :id
+    """
+    
     def load_apis(self) -> List[Dict]:
-        """載入 API 清單"""
-        query = """
-            SELECT 
-                id, name, url, type, method, request_body,
-                status, response_time, last_check, error_count, 
-                last_error, last_response,
-                concurrent_requests, duration_seconds, interval_seconds,
-                created_at, updated_at
-            FROM apis 
-            ORDER BY created_at DESC
+        """
+        載入 API 清單（監控欄位與壓力測試配置）
+        最後測試時間與測試次數以單一彙總查詢取得，不載入壓力測試的原始結果；
+        需要歷史結果時使用 get_api_by_id(include_stress_results=True) 或 get_stress_test_summaries
+        """
+        query = f"""
+            SELECT {self._prefixed_api_columns('a')},
+                   s.last_test, COALESCE(s.test_count, 0) AS test_count
+            FROM apis a
+            LEFT JOIN (
+                SELECT api_id, MAX(start_time) AS last_test, COUNT(*) AS test_count
+                FROM stress_test_results
+                GROUP BY api_id
+            ) s ON s.api_id = a.id
+            ORDER BY a.created_at DESC
         """
         apis = db_manager.execute_query(query)
         
         # 為每個 API 添加 stress_test 配置（保持向後兼容）
         for api in apis:
-            api['stress_test'] = {
-                'concurrent_requests': api.get('concurrent_requests', 1),
-                'duration_seconds': api.get('duration_seconds', 10),
-                'interval_seconds': api.get('interval_seconds', 1.0),
-                'enabled': False,
-                'last_test': self._get_last_stress_test_time(api['id']),
-                'results': self._get_stress_test_results(api['id'])
-            }
+            self._attach_stress_test(api, api.pop('last_test'), api.pop('test_count'))
         
         return apis
     
+    def _prefixed_api_columns(self, alias: str) -> str:
+        return ', '.join(f"{alias}.{column}" for column in self.API_COLUMNS)
+    
+    def _attach_stress_test(self, api: Dict, last_test: Optional[str], test_count: int,
+                            results: List[Dict] = None):
+        """添加 stress_test 配置；只有明確載入時才包含 results"""
+        api['stress_test'] = {
+            'concurrent_requests': api.get('concurrent_requests', 1),
+            'duration_seconds': api.get('duration_seconds', 10),
+            'interval_seconds': api.get('interval_seconds', 1.0),
+            'target_rps': api.get('target_rps'),
+            'load_profile': api.get('load_profile') or 'constant',
+            'enabled': False,
+            'last_test': last_test,
+            'test_count': test_count
+        }
+        if results is not None:
+            api['stress_test']['results'] = results
+    
     def save_apis(self, apis: List[Dict]):
         """儲存 API 清單（向後兼容方法，實際不建議使用）"""
         # 這個方法保留是為了向後兼容，但建議使用個別的 add/update/delete 方法
@@ -51,78 +104,118 @@ class DataManager:
     
     def add_api(self, name: str, url: str, api_type: str = "REST", method: str = "GET", 
                 request_body: str = None, concurrent_requests: int = 1, 
-                duration_seconds: int = 10, interval_seconds: float = 1.0) -> Dict:
+                duration_seconds: int = 10, interval_seconds: float = 1.0,
+                check_interval_seconds: Optional[int] = None,
+                target_rps: Optional[float] = None, load_profile: str = 'constant') -> Dict:
         """新增 API"""
         api_id = str(uuid.uuid4())
         
         query = """
             INSERT INTO apis (
                 id, name, url, type, method, request_body,
-                concurrent_requests, duration_seconds, interval_seconds
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                concurrent_requests, duration_seconds, interval_seconds,
+                check_interval_seconds, target_rps, load_profile, change_version
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         
-        db_manager.execute_insert(query, (
-            api_id, name, url, api_type, method, request_body,
-            concurrent_requests, duration_seconds, interval_seconds
-        ))
+        with db_manager.get_db_cursor() as cursor:
+            cursor.execute(query, (
+                api_id, name, url, api_type, method, request_body,
+                concurrent_requests, duration_seconds, interval_seconds,
+                check_interval_seconds, target_rps, load_profile,
+                self._next_change_version(cursor)
+            ))
+        status_snapshot.invalidate()
         
         # 返回新創建的 API
         return self.get_api_by_id(api_id)
     
     def delete_api(self, api_id: str) -> bool:
         """刪除 API"""
-        query = "DELETE FROM apis WHERE id = ?"
-        rows_affected = db_manager.execute_delete(query, (api_id,))
+        with db_manager.get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM apis WHERE id = ?", (api_id,))
+            rows_affected = cursor.rowcount
+            if rows_affected:
+                # 留下墓碑，增量查詢的前端才知道要移除
+                cursor.execute(
+                    "INSERT OR REPLACE INTO api_deletions (api_id, change_version) VALUES (?, ?)",
+                    (api_id, self._next_change_version(cursor))
+                )
+            # 檢查歷史沒有外鍵（避免與進行中的批次寫入衝突），一併清除
+            cursor.execute("DELETE FROM api_check_results WHERE api_id = ?", (api_id,))
+            cursor.execute("DELETE FROM api_check_rollups WHERE api_id = ?", (api_id,))
+        status_snapshot.invalidate()
         return rows_affected > 0
     
     def update_api_status(self, api_id: str, status: str, response_time: float = 0, 
                          error_msg: str = None, response_data: str = None):
         """更新 API 狀態"""
-        query = """
-            UPDATE apis 
-            SET status = ?, response_time = ?, last_check = ?, 
-                last_response = ?, error_count = CASE 
-                    WHEN ? = 'unhealthy' THEN error_count + 1 
-                    ELSE 0 
-                END,
-                last_error = CASE 
-                    WHEN ? = 'unhealthy' THEN ? 
-                    ELSE NULL 
-                END
-            WHERE id = ?
+        self.update_api_statuses([{
+            'id': api_id, 'status': status, 'response_time': response_time,
+            'error_msg': error_msg, 'response_data': response_data
+        }])
+    
+    def update_api_statuses(self, results: List[Dict]):
+        """
+        批次更新多個 API 的狀態（單一交易、一次 executemany）
+        整批共用一個新的變更版本，只有狀態、錯誤改變或延遲明顯變化的 API 會標上此版本
+        results: [{'id', 'status', 'response_time', 'error_msg', 'response_data'}, ...]
         """
+        if not results:
+            return
         
-        db_manager.execute_update(query, (
-            status, response_time, datetime.now().isoformat(),
-            response_data, status, status, error_msg, api_id
-        ))
+        checked_at = datetime.now().isoformat()
+        latency_ratio, latency_min = latency_thresholds()
+        with db_manager.get_db_cursor() as cursor:
+            change_version = self._next_change_version(cursor)
+            cursor.executemany(self.STATUS_UPDATE_QUERY, [
+                {
+                    'id': result['id'], 'status': result['status'],
+                    'response_time': result.get('response_time', 0),
+                    'error_msg': result.get('error_msg'), 'response_data': result.get('response_data'),
+                    'checked_at': checked_at, 'change_version': change_version,
+                    'latency_ratio': latency_ratio, 'latency_min': latency_min
+                }
+                for result in results
+            ])
+        status_snapshot.apply_status_updates(results, checked_at, change_version)
     
-    def get_api_by_id(self, api_id: str) -> Optional[Dict]:
-        """根據 ID 取得特定 API"""
-        query = """
-            SELECT 
-                id, name, url, type, method, request_body,
-                status, response_time, last_check, error_count, 
-                last_error, last_response,
-                concurrent_requests, duration_seconds, interval_seconds,
-                created_at, updated_at
-            FROM apis 
-            WHERE id = ?
+    def _next_change_version(self, cursor) -> int:
+        """在目前的寫入交易中遞增並返回變更版本（寫入連線以 BEGIN IMMEDIATE 開始，跨行程也不會重複）"""
+        cursor.execute("UPDATE api_change_counter SET version = version + 1 WHERE id = 1")
+        cursor.execute("SELECT version FROM api_change_counter WHERE id = 1")
+        return cursor.fetchone()[0]
+    
+    def get_change_version(self) -> int:
+        """目前的變更版本"""
+        rows = db_manager.execute_query("SELECT version FROM api_change_counter WHERE id = 1")
+        return rows[0]['version'] if rows else 0
+    
+    def get_deletions(self) -> Dict[str, int]:
+        """已刪除 API 的墓碑：{api_id: 刪除時的變更版本}"""
+        rows = db_manager.execute_query("SELECT api_id, change_version FROM api_deletions")
+        return {row['api_id']: row['change_version'] for row in rows}
+    
+    def get_api_by_id(self, api_id: str, include_stress_results: bool = False) -> Optional[Dict]:
+        """
+        根據 ID 取得特定 API
+        include_stress_results: 是否載入最近的壓力測試完整結果（需解析原始結果 JSON，僅結果頁使用）
+        """
+        query = f"""
+            SELECT {self._prefixed_api_columns('a')},
+                   (SELECT MAX(start_time) FROM stress_test_results WHERE api_id = a.id) AS last_test,
+                   (SELECT COUNT(*) FROM stress_test_results WHERE api_id = a.id) AS test_count
+            FROM apis a
+            WHERE a.id = ?
         """
         results = db_manager.execute_query(query, (api_id,))
         
         if results:
             api = results[0]
-            # 添加 stress_test 配置
-            api['stress_test'] = {
-                'concurrent_requests': api.get('concurrent_requests', 1),
-                'duration_seconds': api.get('duration_seconds', 10),
-                'interval_seconds': api.get('interval_seconds', 1.0),
-                'enabled': False,
-                'last_test': self._get_last_stress_test_time(api['id']),
-                'results': self._get_stress_test_results(api['id'])
-            }
+            self._attach_stress_test(
+                api, api.pop('last_test'), api.pop('test_count'),
+                self._get_stress_test_results(api_id) if include_stress_results else None
+            )
             return api
         
         return None
@@ -140,6 +233,7 @@ class DataManager:
         db_manager.execute_update(query, (
             concurrent_requests, duration_seconds, interval_seconds, api_id
         ))
+        status_snapshot.invalidate()
     
     def save_stress_test_result(self, api_id: str, result: Dict):
         """儲存壓力測試結果"""
@@ -175,39 +269,65 @@ class DataManager:
         
         # 只保留最近 10 次測試結果
         self._cleanup_old_stress_test_results(api_id)
+        status_snapshot.invalidate()
     
     def update_api(self, api_id: str, name: str, url: str, api_type: str = "REST", 
                    method: str = "GET", request_body: str = None, 
                    concurrent_requests: int = 1, duration_seconds: int = 10, 
-                   interval_seconds: float = 1.0) -> bool:
+                   interval_seconds: float = 1.0,
+                   check_interval_seconds: Optional[int] = None,
+                   target_rps: Optional[float] = None, load_profile: str = 'constant') -> bool:
         """更新 API 資訊"""
         query = """
             UPDATE apis 
             SET name = ?, url = ?, type = ?, method = ?, request_body = ?,
                 concurrent_requests = ?, duration_seconds = ?, interval_seconds = ?,
+                check_interval_seconds = ?, target_rps = ?, load_profile = ?,
                 status = 'unknown', response_time = 0, last_check = NULL,
-                error_count = 0, last_error = NULL
+                error_count = 0, last_error = NULL, change_version = ?
             WHERE id = ?
         """
         
-        rows_affected = db_manager.execute_update(query, (
-            name, url, api_type, method, request_body,
-            concurrent_requests, duration_seconds, interval_seconds,
-            api_id
-        ))
+        with db_manager.get_db_cursor() as cursor:
+            change_version = self._next_change_version(cursor)
+            cursor.execute(query, (
+                name, url, api_type, method, request_body,
+                concurrent_requests, duration_seconds, interval_seconds,
+                check_interval_seconds, target_rps, load_profile, change_version, api_id
+            ))
+            rows_affected = cursor.rowcount
+        status_snapshot.invalidate()
         
         return rows_affected > 0
     
-    def _get_last_stress_test_time(self, api_id: str) -> Optional[str]:
-        """獲取最後一次壓力測試時間"""
-        query = """
-            SELECT start_time FROM stress_test_results 
+    def get_stress_test_summaries(self, api_id: str, limit: int = 10, offset: int = 0) -> Dict:
+        """
+        分頁取得壓力測試摘要（最新的在前）
+        只讀取資料表的統計欄位與測試配置，不載入原始結果
+        """
+        total = db_manager.execute_query(
+            "SELECT COUNT(*) AS count FROM stress_test_results WHERE api_id = ?", (api_id,)
+        )[0]['count']
+        
+        rows = db_manager.execute_query("""
+            SELECT 
+                id, test_name, start_time, end_time,
+                total_requests, successful_requests, failed_requests,
+                success_rate, avg_response_time, min_response_time,
+                max_response_time, requests_per_second, test_config
+            FROM stress_test_results 
             WHERE api_id = ? 
             ORDER BY start_time DESC 
-            LIMIT 1
-        """
-        results = db_manager.execute_query(query, (api_id,))
-        return results[0]['start_time'] if results else None
+            LIMIT ? OFFSET ?
+        """, (api_id, limit, offset))
+        
+        for row in rows:
+            try:
+                row['config'] = json.loads(row.pop('test_config') or '{}')
+            except json.JSONDecodeError:
+                row['config'] = {}
+        
+        return {'total': total, 'results': rows}
     
     def _get_stress_test_results(self, api_id: str, limit: int = 10) -> List[Dict]:
         """獲取壓力測試結果"""
@@ -231,7 +351,11 @@ class DataManager:
                 try:
                     raw_data = json.loads(result['raw_results'])
                     result['requests'] = raw_data.get('requests', [])
+                    result['config'] = raw_data.get('config', {})
+                    result['total_duration'] = raw_data.get('total_duration', 0)
+                    # 保留百分位數、狀態碼等延伸統計，欄位值以資料表為準
                     result['statistics'] = {
+                        **raw_data.get('statistics', {}),
                         'total_requests': result['total_requests'],
                         'successful_requests': result['successful_requests'],
                         'failed_requests': result['failed_requests'],
@@ -245,6 +369,8 @@ class DataManager:
                     result['requests'] = []
                     result['statistics'] = {}
         
+        # 依時間由舊到新排列，results[-1] 為最近一次測試
+        results.reverse()
         return results
     
     def _cleanup_old_stress_test_results(self, api_id: str, keep_count: int = 10):
@@ -0,0 +1,179 @@
+"""
+SQLite 連線池
+以有界佇列實作借出／歸還：讀取池最多 max_size 條連線，寫入池只有一條連線（單一寫入者，
+寫入依序排隊而不是在 SQLite 層互相搶鎖）。同一個執行單位（asyncio task、greenlet 或執行緒）
+重複借用時沿用已借出的連線，巢狀的 get_db_cursor 不會互相等待或拆開交易。
+gevent 的 monkey patch 會把 threading／queue 換成協程版本，因此同一份實作在執行緒與 greenlet 下都成立
+"""
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
+
+class PoolTimeout(sqlite3.OperationalError):
+    """等待連線逾時"""
+    pass
+
+def current_owner():
+    """目前的執行單位：asyncio task > greenlet > 執行緒"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return ('task', id(task))
+    if greenlet is not None:
+        return ('greenlet', id(greenlet.getcurrent()))
+    return ('thread', threading.get_ident())
+
+class ConnectionPool:
+    """有界 SQLite 連線池（連線於需要時才建立，最多 max_size 條）"""
+    
+    def __init__(self, name: str, factory: Callable[[], sqlite3.Connection], max_size: int, timeout: float):
+        self.name = name
+        self.factory = factory
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()  # 後進先出：優先重用快取較熱的連線
+        self._held: Dict = {}          # 執行單位 -> [連線, 巢狀深度]
+        self._created = 0
+        self._abandoned = []           # fork 前建立的連線（子行程不可使用也不可關閉）
+        
+        # 指標
+        self.checkouts = 0
+        self.waits = 0          # 需要等待其他人歸還的借出次數
+        self.wait_total = 0.0   # 秒
+        self.wait_max = 0.0
+        self.timeouts = 0
+    
+    def is_held(self) -> bool:
+        """目前的執行單位是否已借出此池的連線"""
+        return current_owner() in self._held
+    
+    @contextmanager
+    def connection(self):
+        """借出連線，返回 (連線, 是否為最外層借用)；巢狀借用沿用同一條連線"""
+        owner = current_owner()
+        held = self._held.get(owner)
+        if held is not None:
+            held[1] += 1
+            try:
+                yield held[0], False
+            finally:
+                held[1] -= 1
+            return
+        
+        connection = self._checkout()
+        self._held[owner] = [connection, 1]
+        try:
+            yield connection, True
+        finally:
+            del self._held[owner]
+            self._checkin(connection)
+    
+    def _checkout(self) -> sqlite3.Connection:
+        started = time.monotonic()
+        waited = False
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.max_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    connection = self.factory()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                waited = True
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise PoolTimeout(f"等待 {self.name} 連線逾時（{self.timeout:g} 秒，池大小 {self.max_size}）")
+        
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_total += elapsed
+                self.wait_max = max(self.wait_max, elapsed)
+        return connection
+    
+    def _checkin(self, connection: sqlite3.Connection):
+        """歸還連線；仍在交易中（例如例外未被處理）時先回滾"""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            # 連線已損壞：丟棄，讓下一次借出重新建立
+            with self._lock:
+                self._created -= 1
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+            return
+        self._idle.put(connection)
+    
+    def close_idle(self):
+        """關閉所有閒置連線（借出中的連線歸還後仍會放回池中）"""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+            connection.close()
+    
+    def reset_after_fork(self):
+        """fork 後的子行程捨棄繼承的連線（SQLite 連線不能跨行程使用）"""
+        while True:
+            try:
+                self._abandoned.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._abandoned.extend(held[0] for held in self._held.values())
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._held = {}
+        self._created = 0
+    
+    def get_stats(self) -> Dict:
+        """連線池指標（等待時間單位為毫秒）"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'max_size': self.max_size,
+                'created': self._created,
+                'idle': self._idle.qsize(),
+                'in_use': len(self._held),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_total_ms': round(self.wait_total * 1000, 2),
+                'wait_avg_ms': round(self.wait_total * 1000 / self.waits, 2) if self.waits else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 2),
+                'timeouts': self.timeouts
+            }
+
+def register_fork_reset(*pools: ConnectionPool):
+    """gunicorn preload_app 會在主行程建立連線後 fork，子行程需重置連線池"""
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: [pool.reset_after_fork() for pool in pools])
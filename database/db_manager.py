@@ -1,67 +1,181 @@
 import sqlite3
 import os
-import threading
+import random
+import time
 from contextlib import contextmanager
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import logging
-import sys
+import config as config_module
+from database.connection_pool import ConnectionPool, register_fork_reset
+from database.query_profiler import QueryProfiler
 
-# 配置詳細的日誌輸出
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-# 創建專門的 logger
+# 日誌層級由應用程式入口設定（config.LOG_LEVEL）
 sql_logger = logging.getLogger('database')
-sql_logger.setLevel(logging.DEBUG)
 
 class DatabaseManager:
     """SQLite 資料庫管理器"""
     
-    def __init__(self, db_path: str = "data/api_monitor.db"):
+    # 既有資料庫需要補上的欄位：(表名, 欄位名, 欄位定義)
+    COLUMN_MIGRATIONS = [
+        ('apis', 'check_interval_seconds', 'INTEGER'),
+        ('apis', 'target_rps', 'REAL'),
+        ('apis', 'load_profile', "TEXT DEFAULT 'constant'"),
+        ('apis', 'change_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ]
+    
+    # 全文檢索的虛擬表（search_schema.sql 建立）
+    SEARCH_TABLES = ('test_cases_fts', 'audit_logs_fts')
+    
+    # 連線 PRAGMA 設定檔（mmap_size、cache_size、busy_timeout 由 config 設定）
+    PRAGMA_PROFILES = {
+        # WAL：讀取不會被寫入阻塞；synchronous=NORMAL 在 WAL 下只於 checkpoint 時 fsync
+        'performance': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'temp_store': 'MEMORY'},
+        # SQLite 預設行為（rollback journal，每次提交都 fsync）
+        'safe': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'temp_store': 'DEFAULT'}
+    }
+    
+    # 報告中列出的 PRAGMA
+    REPORT_PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store',
+                      'busy_timeout', 'foreign_keys', 'page_size', 'wal_autocheckpoint')
+    
+    def __init__(self, db_path: str = "data/api_monitor.db", profile: str = None):
         self.db_path = db_path
-        self.connection_pool = threading.local()
+        self.fts_enabled = False
+        self.profile = profile or getattr(config_module, 'SQLITE_PROFILE', 'performance')
+        if self.profile not in self.PRAGMA_PROFILES:
+            raise ValueError(f"未知的 SQLite 設定檔: {self.profile}")
+        self.mmap_size = getattr(config_module, 'SQLITE_MMAP_SIZE', 268435456)
+        self.cache_size_kb = getattr(config_module, 'SQLITE_CACHE_SIZE_KB', 65536)
+        self.busy_timeout_ms = getattr(config_module, 'SQLITE_BUSY_TIMEOUT_MS', 5000)
+        self.busy_retries = getattr(config_module, 'SQLITE_BUSY_RETRIES', 5)
+        self.busy_backoff_ms = getattr(config_module, 'SQLITE_BUSY_BACKOFF_MS', 50)
+        self.busy_retry_count = 0  # 因資料庫忙碌而重試的次數
+        pool_timeout = getattr(config_module, 'SQLITE_POOL_TIMEOUT', 30)
+        # 讀取池：多條唯讀連線；寫入池：單一寫入者，寫入在這裡排隊
+        self.read_pool = ConnectionPool('read', lambda: self._create_connection(readonly=True),
+                                        getattr(config_module, 'SQLITE_READ_POOL_SIZE', 8), pool_timeout)
+        self.write_pool = ConnectionPool('write', lambda: self._create_connection(readonly=False),
+                                         1, pool_timeout)
+        register_fork_reset(self.read_pool, self.write_pool)
+        self.query_profiler = QueryProfiler(
+            sample_rate=getattr(config_module, 'QUERY_PROFILE_SAMPLE_RATE', 1.0),
+            slow_ms=getattr(config_module, 'QUERY_SLOW_MS', 100),
+            max_statements=getattr(config_module, 'QUERY_PROFILE_MAX_STATEMENTS', 500),
+            explain=self.explain_query_plan,
+            enabled=getattr(config_module, 'QUERY_PROFILING', True)
+        )
         self._ensure_database_exists()
         self._initialize_database()
+        self._report_pragmas()
     
     def _ensure_database_exists(self):
         """確保資料庫目錄存在"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
     
-    def _get_connection(self) -> sqlite3.Connection:
-        """獲取資料庫連接（線程安全）"""
-        if not hasattr(self.connection_pool, 'connection'):
-            self.connection_pool.connection = sqlite3.connect(
-                self.db_path,
-                check_same_thread=False,
-                timeout=30.0
-            )
-            # 啟用外鍵約束
-            self.connection_pool.connection.execute("PRAGMA foreign_keys = ON")
-            # 設置 Row factory 以便獲取字典格式結果
-            self.connection_pool.connection.row_factory = sqlite3.Row
-        
-        return self.connection_pool.connection
+    def _create_connection(self, readonly: bool) -> sqlite3.Connection:
+        """建立連線池使用的連線（連線會在不同執行緒／greenlet 間借用，但同一時間只有一個使用者）"""
+        connection = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+            # 寫入連線以 BEGIN IMMEDIATE 開始交易，一開始就取得寫入鎖，避免 WAL 下讀取交易升級失敗
+            isolation_level=None if readonly else 'IMMEDIATE'
+        )
+        self._apply_pragmas(connection)
+        if readonly:
+            connection.execute("PRAGMA query_only = ON")
+        # 設置 Row factory 以便獲取字典格式結果
+        connection.row_factory = sqlite3.Row
+        return connection
+    
+    def _apply_pragmas(self, connection: sqlite3.Connection):
+        """套用設定檔的 PRAGMA（journal_mode 寫在資料庫檔中，其餘為每個連線的設定）"""
+        settings = self.PRAGMA_PROFILES[self.profile]
+        # 啟用外鍵約束
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        connection.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+        connection.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+        connection.execute(f"PRAGMA temp_store = {settings['temp_store']}")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        # 負數代表以 KiB 為單位
+        connection.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+    
+    def get_pragma_report(self) -> Dict[str, Any]:
+        """目前連線實際生效的 PRAGMA"""
+        report = {'profile': self.profile, 'sqlite_version': sqlite3.sqlite_version}
+        with self.read_pool.connection() as (connection, _):
+            for pragma in self.REPORT_PRAGMAS:
+                row = connection.execute(f"PRAGMA {pragma}").fetchone()
+                report[pragma] = row[0] if row else None
+        report['busy_retries'] = self.busy_retry_count
+        return report
+    
+    def get_pool_stats(self) -> Dict[str, Dict]:
+        """讀取池與寫入池的借出與等待時間指標"""
+        return {'read': self.read_pool.get_stats(), 'write': self.write_pool.get_stats()}
+    
+    def _report_pragmas(self):
+        """啟動時輸出生效的 PRAGMA（設定不受支援時，例如 WAL 在網路檔案系統上，可由此發現）"""
+        report = self.get_pragma_report()
+        print(f"🗄️ SQLite {report['sqlite_version']} ({self.db_path}) 設定檔 {self.profile}: " +
+              ', '.join(f"{pragma}={report[pragma]}" for pragma in self.REPORT_PRAGMAS))
+        expected = self.PRAGMA_PROFILES[self.profile]['journal_mode'].lower()
+        if str(report['journal_mode']).lower() != expected:
+            sql_logger.warning(f"⚠️ journal_mode 為 {report['journal_mode']}，未能切換為 {expected}")
+    
+    def _run_with_retry(self, operation):
+        """
+        執行資料庫操作，遇到 SQLITE_BUSY / 資料庫鎖定時以指數退避（含隨機抖動）重試
+        busy_timeout 已涵蓋一般等待；WAL 下讀取交易升級為寫入時會立即返回 BUSY，需由此重試
+        """
+        for attempt in range(self.busy_retries + 1):
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                message = str(e).lower()
+                if attempt >= self.busy_retries or ('locked' not in message and 'busy' not in message):
+                    raise
+                self.busy_retry_count += 1
+                delay = self.busy_backoff_ms / 1000 * (2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+    
+    def _run_profiled(self, query: str, params, operation, count_rows):
+        """執行（含忙碌重試）並將耗時與筆數記錄到查詢剖析"""
+        if not self.query_profiler.enabled:
+            return self._run_with_retry(operation)
+        started = time.perf_counter()
+        result = self._run_with_retry(operation)
+        self.query_profiler.record(query, params, time.perf_counter() - started, count_rows(result))
+        return result
+    
+    def explain_query_plan(self, query: str, params=()) -> List[str]:
+        """EXPLAIN QUERY PLAN 的各行說明"""
+        with self.get_db_cursor(commit=False) as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+            return [row['detail'] for row in cursor.fetchall()]
     
     @contextmanager
     def get_db_cursor(self, commit: bool = True):
-        """獲取資料庫游標的上下文管理器"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        try:
-            yield cursor
-            if commit:
-                conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            cursor.close()
+        """
+        獲取資料庫游標的上下文管理器
+        commit=True 借用寫入連線；commit=False 借用唯讀連線（已持有寫入連線時沿用，才讀得到未提交的寫入）。
+        巢狀使用時由最外層負責提交或回滾
+        """
+        pool = self.read_pool if not commit and not self.write_pool.is_held() else self.write_pool
+        with pool.connection() as (conn, outermost):
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                if commit and outermost:
+                    conn.commit()
+            except Exception as e:
+                if outermost:
+                    conn.rollback()
+                raise e
+            finally:
+                cursor.close()
     
     def _initialize_database(self):
         """初始化資料庫結構"""
@@ -71,12 +185,54 @@ class DatabaseManager:
             with open(schema_path, 'r', encoding='utf-8') as f:
                 schema_sql = f.read()
             
+            # 先補齊既有表的欄位，schema 中的索引才能建立在新欄位上
+            self._migrate_columns()
+            
             with self.get_db_cursor() as cursor:
                 cursor.executescript(schema_sql)
         
+        self._initialize_search_index()
+        
         # 創建預設管理員用戶（如果不存在）
         self._create_default_admin()
     
+    def _initialize_search_index(self):
+        """建立全文檢索索引；SQLite 不支援 FTS5 trigram 時略過（搜尋改用 LIKE）"""
+        schema_path = os.path.join(os.path.dirname(__file__), 'search_schema.sql')
+        if not os.path.exists(schema_path):
+            return
+        
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            schema_sql = f.read()
+        
+        try:
+            with self.get_db_cursor() as cursor:
+                cursor.execute(
+                    f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN "
+                    f"({', '.join('?' * len(self.SEARCH_TABLES))})", self.SEARCH_TABLES
+                )
+                existing = {row[0] for row in cursor.fetchall()}
+                cursor.executescript(schema_sql)
+                
+                # 新建立的索引需要由既有資料重建
+                for table in self.SEARCH_TABLES:
+                    if table not in existing:
+                        cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+                        sql_logger.info(f"✅ 已建立全文檢索索引: {table}")
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            sql_logger.warning(f"⚠️ 無法建立全文檢索索引，搜尋將改用 LIKE: {e}")
+    
+    def _migrate_columns(self):
+        """為既有資料庫補上新增的欄位（新資料庫由 schema.sql 直接建立）"""
+        with self.get_db_cursor() as cursor:
+            for table, column, definition in self.COLUMN_MIGRATIONS:
+                cursor.execute(f"PRAGMA table_info({table})")
+                columns = [row[1] for row in cursor.fetchall()]
+                if columns and column not in columns:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                    sql_logger.info(f"✅ 已添加欄位: {table}.{column}")
+    
     def _create_default_admin(self):
         """創建預設管理員用戶"""
         import uuid
@@ -100,17 +256,13 @@ class DatabaseManager:
     
     def execute_query(self, query: str, params: tuple = ()) -> List[Dict]:
         """執行查詢並返回結果"""
-        sql_logger.info(f"🔍 執行 SQL 查詢")
-        sql_logger.info(f"📝 SQL: {query}")
-        sql_logger.info(f"📊 參數: {params}")
-        
-        try:
+        def run():
             with self.get_db_cursor(commit=False) as cursor:
                 cursor.execute(query, params)
-                rows = cursor.fetchall()
-                result = [dict(row) for row in rows]
-                sql_logger.info(f"✅ 查詢成功，返回 {len(result)} 筆記錄")
-                return result
+                return [dict(row) for row in cursor.fetchall()]
+        
+        try:
+            return self._run_profiled(query, params, run, len)
         except Exception as e:
             sql_logger.error(f"💥 SQL 查詢失敗: {str(e)}")
             sql_logger.error(f"💥 錯誤類型: {type(e).__name__}")
@@ -122,26 +274,39 @@ class DatabaseManager:
     
     def execute_insert(self, query: str, params: tuple = ()) -> str:
         """執行插入並返回 lastrowid"""
-        with self.get_db_cursor() as cursor:
-            cursor.execute(query, params)
-            return str(cursor.lastrowid)
+        def run():
+            with self.get_db_cursor() as cursor:
+                cursor.execute(query, params)
+                return str(cursor.lastrowid)
+        
+        return self._run_profiled(query, params, run, lambda result: 1)
     
     def execute_update(self, query: str, params: tuple = ()) -> int:
         """執行更新並返回影響的行數"""
-        with self.get_db_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.rowcount
+        def run():
+            with self.get_db_cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.rowcount
+        
+        return self._run_profiled(query, params, run, lambda result: result)
     
     def execute_delete(self, query: str, params: tuple = ()) -> int:
         """執行刪除並返回影響的行數"""
-        with self.get_db_cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.rowcount
+        def run():
+            with self.get_db_cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.rowcount
+        
+        return self._run_profiled(query, params, run, lambda result: result)
     
     def execute_many(self, query: str, params_list: List[tuple]) -> None:
         """批量執行 SQL 語句"""
-        with self.get_db_cursor() as cursor:
-            cursor.executemany(query, params_list)
+        def run():
+            with self.get_db_cursor() as cursor:
+                cursor.executemany(query, params_list)
+        
+        self._run_profiled(query, params_list[0] if params_list else (), run,
+                           lambda result: len(params_list))
     
     def table_exists(self, table_name: str) -> bool:
         """檢查表是否存在"""
@@ -159,15 +324,18 @@ class DatabaseManager:
             return [dict(row) for row in cursor.fetchall()]
     
     def backup_database(self, backup_path: str):
-        """備份資料庫"""
-        import shutil
-        shutil.copy2(self.db_path, backup_path)
+        """備份資料庫（使用 SQLite 線上備份，WAL 中尚未寫回主檔的內容也會包含在內）"""
+        destination = sqlite3.connect(backup_path)
+        try:
+            with self.read_pool.connection() as (connection, _):
+                connection.backup(destination)
+        finally:
+            destination.close()
     
     def close_all_connections(self):
-        """關閉所有連接"""
-        if hasattr(self.connection_pool, 'connection'):
-            self.connection_pool.connection.close()
-            del self.connection_pool.connection
+        """關閉所有閒置連接"""
+        self.read_pool.close_idle()
+        self.write_pool.close_idle()
 
 # 全域資料庫管理器實例
 db_manager = DatabaseManager()
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+SQL 查詢剖析
+以語句指紋（字面值換成 ?、空白正規化）彙總呼叫次數、總／平均／最大耗時與返回筆數；
+依取樣率只彙總部分呼叫以降低負擔，超過慢查詢門檻的呼叫一律記錄並擷取 EXPLAIN QUERY PLAN
+"""
+import logging
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+OTHER_FINGERPRINT = '<other>'  # 指紋數量達上限後，新語句併入此項
+SORT_KEYS = ('total_ms', 'avg_ms', 'max_ms', 'calls', 'rows', 'slow_calls')
+
+query_logger = logging.getLogger('database.queries')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """語句指紋：去除字面值與多餘空白，IN (?, ?, ...) 不論參數個數視為同一語句"""
+    text = _STRING_LITERAL.sub('?', sql)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+    return _IN_LIST.sub('(?...)', text)
+
+class QueryProfiler:
+    """依語句指紋彙總的查詢統計（執行緒安全）"""
+    
+    def __init__(self, sample_rate: float = 1.0, slow_ms: float = 100.0, max_statements: int = 500,
+                 explain: Callable[[str, tuple], List[str]] = None, enabled: bool = True):
+        self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        self.slow_ms = slow_ms
+        self.max_statements = max_statements
+        self.explain = explain  # (sql, params) -> 查詢計畫各行
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+        self._started_at = time.time()
+    
+    def record(self, sql: str, params: tuple, elapsed: float, rows: Optional[int]):
+        """記錄一次執行（elapsed 單位為秒，rows 為返回或影響的筆數）；未取樣的呼叫只在慢查詢時記錄"""
+        elapsed_ms = elapsed * 1000
+        slow = self.slow_ms > 0 and elapsed_ms >= self.slow_ms
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        if not self.enabled or not (sampled or slow):
+            return
+        
+        key = fingerprint(sql)
+        need_plan = False
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_statements:
+                    key = OTHER_FINGERPRINT
+                    entry = self._stats.get(key)
+                if entry is None:
+                    entry = self._stats[key] = {
+                        'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                        'slow_calls': 0, 'last_slow_ms': None, 'plan': None
+                    }
+            if sampled:
+                entry['calls'] += 1
+                entry['total_ms'] += elapsed_ms
+                entry['rows'] += rows or 0
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            if slow:
+                query_logger.warning("慢查詢 %.1f ms（%s 筆）: %s", elapsed_ms, rows, key)
+                entry['slow_calls'] += 1
+                entry['last_slow_ms'] = round(elapsed_ms, 2)
+                # 每個指紋只擷取一次查詢計畫（reset 後重新擷取）
+                need_plan = entry['plan'] is None and key != OTHER_FINGERPRINT and self.explain is not None
+                if need_plan:
+                    entry['plan'] = []
+        
+        if need_plan:
+            try:
+                plan = self.explain(sql, params)
+            except Exception as e:
+                plan = [f"無法取得查詢計畫: {e}"]
+            with self._lock:
+                if key in self._stats:
+                    self._stats[key]['plan'] = plan
+    
+    def get_report(self, sort: str = 'total_ms', limit: int = 50) -> Dict:
+        """統計報告，依 total_ms、avg_ms、max_ms、calls、rows 或 slow_calls 由大到小排序"""
+        with self._lock:
+            statements = []
+            for key, entry in self._stats.items():
+                calls = entry['calls']
+                statements.append({
+                    'fingerprint': key,
+                    'calls': calls,
+                    'estimated_calls': round(calls / self.sample_rate) if self.sample_rate else calls,
+                    'total_ms': round(entry['total_ms'], 2),
+                    'avg_ms': round(entry['total_ms'] / calls, 3) if calls else 0.0,
+                    'max_ms': round(entry['max_ms'], 2),
+                    'rows': entry['rows'],
+                    'avg_rows': round(entry['rows'] / calls, 1) if calls else 0.0,
+                    'slow_calls': entry['slow_calls'],
+                    'last_slow_ms': entry['last_slow_ms'],
+                    'plan': entry['plan']
+                })
+        if sort not in SORT_KEYS:
+            sort = 'total_ms'
+        statements.sort(key=lambda item: item[sort], reverse=True)
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_ms,
+            'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._started_at)),
+            'statement_count': len(statements),
+            'statements': statements[:limit]
+        }
+    
+    def reset(self):
+        """清除所有統計"""
+        with self._lock:
+            self._stats = {}
+            self._started_at = time.time()
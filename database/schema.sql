@@ -28,6 +28,10 @@ CREATE TABLE IF NOT EXISTS apis (
     concurrent_requests INTEGER DEFAULT 1,
     duration_seconds INTEGER DEFAULT 10,
     interval_seconds REAL DEFAULT 1.0,
+    check_interval_seconds INTEGER, -- 健康檢查間隔（秒），NULL 表示使用全域 CHECK_INTERVAL
+    target_rps REAL, -- 開放模型壓力測試的目標每秒請求數，NULL 表示使用封閉模型
+    load_profile TEXT DEFAULT 'constant', -- 開放模型負載曲線：constant, ramp, step, spike
+    change_version INTEGER NOT NULL DEFAULT 0, -- 狀態、延遲或錯誤最後一次改變時的變更版本
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
@@ -53,6 +57,29 @@ CREATE TABLE IF NOT EXISTS stress_test_results (
     FOREIGN KEY (api_id) REFERENCES apis (id) ON DELETE CASCADE
 );
 
+-- 健康檢查歷史（只追加的原始結果，依保留天數清理）
+CREATE TABLE IF NOT EXISTS api_check_results (
+    api_id TEXT NOT NULL,
+    ts INTEGER NOT NULL, -- Unix 時間戳（秒）
+    latency_ms REAL,
+    status_code INTEGER,
+    error_class TEXT -- NULL 表示健康：timeout, connection, http_4xx, http_5xx, http_other, other
+);
+
+-- 健康檢查彙總（1 分鐘 / 1 小時 / 1 天，批次寫入時增量更新）
+CREATE TABLE IF NOT EXISTS api_check_rollups (
+    api_id TEXT NOT NULL,
+    resolution INTEGER NOT NULL, -- 時間桶長度（秒）：60, 3600, 86400
+    bucket_start INTEGER NOT NULL, -- 時間桶起點（Unix 時間戳）
+    count INTEGER NOT NULL DEFAULT 0,
+    ok_count INTEGER NOT NULL DEFAULT 0,
+    latency_sum REAL NOT NULL DEFAULT 0,
+    latency_min REAL,
+    latency_max REAL,
+    histogram TEXT, -- JSON 格式的對數分桶延遲直方圖
+    PRIMARY KEY (api_id, resolution, bucket_start)
+) WITHOUT ROWID;
+
 -- 產品標籤表
 CREATE TABLE IF NOT EXISTS product_tags (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -139,9 +166,16 @@ CREATE INDEX IF NOT EXISTS idx_apis_status ON apis(status);
 CREATE INDEX IF NOT EXISTS idx_apis_url ON apis(url);
 CREATE INDEX IF NOT EXISTS idx_stress_test_results_api_id ON stress_test_results(api_id);
 CREATE INDEX IF NOT EXISTS idx_stress_test_results_start_time ON stress_test_results(start_time);
+CREATE INDEX IF NOT EXISTS idx_stress_test_results_api_start ON stress_test_results(api_id, start_time);
+CREATE INDEX IF NOT EXISTS idx_api_check_results_api_ts ON api_check_results(api_id, ts);
+CREATE INDEX IF NOT EXISTS idx_api_check_results_ts ON api_check_results(ts);
+CREATE INDEX IF NOT EXISTS idx_api_check_rollups_cleanup ON api_check_rollups(resolution, bucket_start);
 CREATE INDEX IF NOT EXISTS idx_test_cases_tc_id ON test_cases(tc_id);
 CREATE INDEX IF NOT EXISTS idx_test_cases_status ON test_cases(status);
 CREATE INDEX IF NOT EXISTS idx_test_cases_project_id ON test_cases(test_project_id);
+CREATE INDEX IF NOT EXISTS idx_test_cases_responsible ON test_cases(responsible_user_id);
+CREATE INDEX IF NOT EXISTS idx_test_case_tags_tag ON test_case_tags(product_tag_id, test_case_id);
+CREATE INDEX IF NOT EXISTS idx_test_projects_created ON test_projects(created_at, id);
 CREATE INDEX IF NOT EXISTS idx_test_results_project ON test_results(project_id);
 CREATE INDEX IF NOT EXISTS idx_test_results_test_case ON test_results(test_case_id);
 CREATE INDEX IF NOT EXISTS idx_test_results_status ON test_results(status);
@@ -205,4 +239,80 @@ CREATE TABLE IF NOT EXISTS audit_logs (
 CREATE INDEX IF NOT EXISTS idx_audit_logs_user_id ON audit_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs(action);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_resource_type ON audit_logs(resource_type);
-CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_username_created ON audit_logs(username, created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_resource_created ON audit_logs(resource_type, created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_action_created ON audit_logs(action, created_at);
+
+-- 審計日誌每日計數（依日期、用戶、操作、資源類型增量累加，統計不需掃描 audit_logs）
+CREATE TABLE IF NOT EXISTS audit_log_daily_counts (
+    day TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id, action, resource_type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_log_daily_counts_resource_day ON audit_log_daily_counts(resource_type, day);
+
+-- 已封存的審計日誌月份
+CREATE TABLE IF NOT EXISTS audit_log_archives (
+    period TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 審計日誌封存的跨行程租約（單列；同一時間只有一個 worker 封存與刪除熱資料）
+CREATE TABLE IF NOT EXISTS audit_archive_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+-- API 狀態變更版本（單列遞增計數器，跨 worker 共用）
+CREATE TABLE IF NOT EXISTS api_change_counter (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO api_change_counter (id, version) VALUES (1, 0);
+
+-- 已刪除 API 的墓碑，讓增量查詢能通知前端移除
+CREATE TABLE IF NOT EXISTS api_deletions (
+    api_id TEXT PRIMARY KEY,
+    change_version INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_apis_change_version ON apis(change_version);
+
+-- 測試專案的資料版本（測試結果、案例或標籤改變時遞增，作為報告快取的鍵；
+-- 獨立成表以免觸發 test_projects 的 updated_at 觸發器）
+CREATE TABLE IF NOT EXISTS test_project_versions (
+    project_id INTEGER PRIMARY KEY,
+    data_version INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (project_id) REFERENCES test_projects (id) ON DELETE CASCADE
+);
+
+-- 用戶資料變更版本（單列遞增計數器，跨 worker 共用）：用戶快取命中時比對，
+-- 任一 worker 修改或刪除用戶後其他 worker 的快取立即失效（角色用於權限檢查）
+CREATE TABLE IF NOT EXISTS user_change_counter (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO user_change_counter (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS bump_user_change_counter_on_update
+    AFTER UPDATE ON users
+    BEGIN
+        UPDATE user_change_counter SET version = version + 1 WHERE id = 1;
+    END;
+
+CREATE TRIGGER IF NOT EXISTS bump_user_change_counter_on_delete
+    AFTER DELETE ON users
+    BEGIN
+        UPDATE user_change_counter SET version = version + 1 WHERE id = 1;
+    END;
\ No newline at end of file
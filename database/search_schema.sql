@@ -0,0 +1,59 @@
+-- 全文檢索索引（FTS5 trigram 分詞，中文等不以空白分詞的內容也能以子字串搜尋）
+-- 需要 SQLite 3.34 以上且編譯時啟用 FTS5；不支援時由 DatabaseManager 略過，搜尋改用 LIKE
+
+-- 測試案例（外部內容表，只存索引不重複存放內容）
+CREATE VIRTUAL TABLE IF NOT EXISTS test_cases_fts USING fts5(
+    title,
+    description,
+    acceptance_criteria,
+    content='test_cases',
+    content_rowid='id',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS test_cases_fts_insert
+    AFTER INSERT ON test_cases
+    BEGIN
+        INSERT INTO test_cases_fts (rowid, title, description, acceptance_criteria)
+        VALUES (NEW.id, NEW.title, NEW.description, NEW.acceptance_criteria);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS test_cases_fts_delete
+    AFTER DELETE ON test_cases
+    BEGIN
+        INSERT INTO test_cases_fts (test_cases_fts, rowid, title, description, acceptance_criteria)
+        VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.acceptance_criteria);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS test_cases_fts_update
+    AFTER UPDATE OF title, description, acceptance_criteria ON test_cases
+    BEGIN
+        INSERT INTO test_cases_fts (test_cases_fts, rowid, title, description, acceptance_criteria)
+        VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.acceptance_criteria);
+        INSERT INTO test_cases_fts (rowid, title, description, acceptance_criteria)
+        VALUES (NEW.id, NEW.title, NEW.description, NEW.acceptance_criteria);
+    END;
+
+-- 操作記錄（資源名稱與變更內容）
+CREATE VIRTUAL TABLE IF NOT EXISTS audit_logs_fts USING fts5(
+    resource_name,
+    old_values,
+    new_values,
+    content='audit_logs',
+    content_rowid='id',
+    tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS audit_logs_fts_insert
+    AFTER INSERT ON audit_logs
+    BEGIN
+        INSERT INTO audit_logs_fts (rowid, resource_name, old_values, new_values)
+        VALUES (NEW.id, NEW.resource_name, NEW.old_values, NEW.new_values);
+    END;
+
+CREATE TRIGGER IF NOT EXISTS audit_logs_fts_delete
+    AFTER DELETE ON audit_logs
+    BEGIN
+        INSERT INTO audit_logs_fts (audit_logs_fts, rowid, resource_name, old_values, new_values)
+        VALUES ('delete', OLD.id, OLD.resource_name, OLD.old_values, OLD.new_values);
+    END;
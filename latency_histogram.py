@@ -0,0 +1,88 @@
+import json
+import math
+from typing import Dict, Iterable, Optional
+
+class LatencyHistogram:
+    """
+    對數分桶的延遲直方圖（單位：毫秒）
+    每個桶的上界比前一個大 GROWTH 倍，百分位數的相對誤差約 ±2.5%；
+    直方圖可直接相加合併，適合做增量彙總與跨時間區間的百分位數查詢
+    """
+    
+    GROWTH = 1.05
+    MIN_VALUE = 0.1  # 小於等於此值的延遲都歸入第 0 桶
+    
+    def __init__(self, buckets: Dict[int, int] = None):
+        self.buckets: Dict[int, int] = dict(buckets) if buckets else {}
+        self.count = sum(self.buckets.values())
+    
+    @classmethod
+    def bucket_index(cls, value: float) -> int:
+        """取得數值所屬的桶索引"""
+        if value <= cls.MIN_VALUE:
+            return 0
+        return int(math.ceil(math.log(value / cls.MIN_VALUE, cls.GROWTH)))
+    
+    @classmethod
+    def bucket_value(cls, index: int) -> float:
+        """桶的代表值（上下界的幾何中點）"""
+        if index <= 0:
+            return cls.MIN_VALUE
+        return cls.MIN_VALUE * cls.GROWTH ** (index - 0.5)
+    
+    def record(self, value: float, count: int = 1):
+        """記錄一筆（或多筆相同的）延遲"""
+        index = self.bucket_index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+    
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """合併另一個直方圖（就地修改並返回自身）"""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        return self
+    
+    def difference(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """取得自 other（較早的累計快照）之後新增的部分"""
+        buckets = {}
+        for index, count in self.buckets.items():
+            delta = count - other.buckets.get(index, 0)
+            if delta > 0:
+                buckets[index] = delta
+        return LatencyHistogram(buckets)
+    
+    def percentile(self, p: float) -> Optional[float]:
+        """取得百分位數（p 為 0-100），沒有資料時返回 None"""
+        if self.count == 0:
+            return None
+        rank = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.buckets))
+    
+    def percentiles(self, ps: Iterable[float] = (50, 90, 95, 99)) -> Dict[str, Optional[float]]:
+        """一次取得多個百分位數，key 為 'p50'、'p99.9' 等格式"""
+        return {f"p{p:g}": self.percentile(p) for p in ps}
+    
+    def to_dict(self) -> Dict[str, int]:
+        return {str(index): count for index, count in self.buckets.items()}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        return cls({int(index): int(count) for index, count in (data or {}).items()})
+    
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+    
+    @classmethod
+    def from_json(cls, text: Optional[str]) -> 'LatencyHistogram':
+        return cls.from_dict(json.loads(text) if text else {})
+    
+    @staticmethod
+    def merge_json(left: Optional[str], right: Optional[str]) -> str:
+        """合併兩個 JSON 格式的直方圖（可註冊為 SQLite 函數）"""
+        return LatencyHistogram.from_json(left).merge(LatencyHistogram.from_json(right)).to_json()
@@ -0,0 +1,23 @@
+"""
+開放模型（固定到達率）壓力測試的負載曲線
+target_rps 為曲線的峰值速率，各曲線在任何時間點的速率都大於 0
+"""
+
+LOAD_PROFILES = {
+    'constant': '固定速率',
+    'ramp': '漸增（前半段由 10% 線性增加到目標）',
+    'step': '階梯（四段：25%、50%、75%、100%）',
+    'spike': '尖峰（基準 25%，中段 20% 時間達到目標）'
+}
+
+def target_rate(profile: str, target_rps: float, elapsed: float, duration: float) -> float:
+    """取得經過 elapsed 秒時的目標每秒請求數"""
+    progress = min(max(elapsed / duration, 0.0), 1.0) if duration > 0 else 1.0
+    
+    if profile == 'ramp':
+        return target_rps * (0.1 + 0.9 * min(progress / 0.5, 1.0))
+    if profile == 'step':
+        return target_rps * (min(int(progress * 4), 3) + 1) / 4
+    if profile == 'spike':
+        return target_rps if 0.4 <= progress < 0.6 else target_rps * 0.25
+    return target_rps
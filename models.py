@@ -125,6 +125,11 @@ class TestProject:
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
     
+    @property
+    def test_date(self) -> datetime:
+        """測試日期（舊欄位 test_date）：開始測試時間，未設定時為建立時間"""
+        return self.start_time or self.created_at
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             'id': self.id,
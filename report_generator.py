@@ -1,9 +1,12 @@
 import json
-from typing import Dict, List, Any, Optional
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass
-from models import TestProject, TestCase, ProductTag, TestStatistics, TestStatus
+from models import TestProject, TestResult, TestStatistics, TestStatus, ProjectStatus
 from test_case_manager import TestCaseManager
+import config as config_module
 
 @dataclass
 class ProductStats:
@@ -12,6 +15,7 @@ class ProductStats:
     total_cases: int
     passed_cases: int
     failed_cases: int
+    blocked_cases: int
     not_tested_cases: int
     pass_rate: float
     fail_rate: float
@@ -26,33 +30,81 @@ class ProjectReport:
     test_case_details: List[Dict[str, Any]]
     summary: Dict[str, Any]
 
+def _parse_datetime(value) -> Optional[datetime]:
+    """資料庫的時間字串轉為 datetime（空值或格式不符時返回 None）"""
+    if not value or isinstance(value, datetime):
+        return value or None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
 class ReportGenerator:
-    """報告生成器"""
+    """報告生成器（專案報告依專案資料版本快取，資料未變時不重新計算）"""
     
-    def __init__(self, test_case_manager: TestCaseManager):
+    def __init__(self, test_case_manager: TestCaseManager, cache_size: int = None):
         self.manager = test_case_manager
+        self.cache_size = cache_size if cache_size is not None else getattr(config_module, 'REPORT_CACHE_SIZE', 64)
+        self._cache_lock = threading.Lock()
+        self._cache: OrderedDict = OrderedDict()  # project_id -> ((資料版本, 負責人用戶名), 報告)
+        
+        # 計數器
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     def generate_project_report(self, project_id: str) -> Optional[ProjectReport]:
-        """生成專案報告"""
-        project = self.manager.get_test_project(project_id)
-        if not project:
+        """
+        生成專案報告
+        以專案資料版本（update_test_result、案例與標籤修改時遞增）與目前負責人的用戶名為鍵快取；
+        返回的報告由多個請求共用，呼叫端不應修改
+        """
+        project_id = int(project_id)
+        info = self.manager.get_project_version_info(project_id)
+        if info is None:
+            with self._cache_lock:
+                self._cache.pop(project_id, None)
             return None
+        version = (info['data_version'], info['responsible_user_name'])
+        
+        with self._cache_lock:
+            entry = self._cache.get(project_id)
+            if entry is not None and entry[0] == version:
+                self._cache.move_to_end(project_id)
+                self.cache_hits += 1
+                return entry[1]
+            self.cache_misses += 1
+        
+        # 版本在讀取資料之前取得：產生期間資料若有變動，版本已遞增，下次請求會重新產生
+        report = self._build_project_report(project_id)
+        if report is not None and self.cache_size > 0:
+            with self._cache_lock:
+                self._cache[project_id] = (version, report)
+                self._cache.move_to_end(project_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return report
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """報告快取計數器"""
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                'size': len(self._cache),
+                'max_size': self.cache_size,
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': round(self.cache_hits / lookups, 4) if lookups else 0.0
+            }
+    
+    def _build_project_report(self, project_id: int) -> Optional[ProjectReport]:
+        """自資料庫讀取專案、測試結果與專案內的測試案例（含標籤）並產生報告"""
+        project_data = self.manager.get_test_project_by_id(project_id)
+        if not project_data:
+            return None
+        project = self._to_project(project_data)
+        test_cases = self.manager.get_test_cases(project_id=project_id)
         
-        # 取得相關資料
-        test_cases = {tc.id: tc for tc in self.manager.get_test_cases() 
-                     if tc.id in project.selected_test_cases}
-        product_tags = {tag.id: tag for tag in self.manager.get_product_tags()}
-        
-        # 計算統計資料
-        statistics = self._calculate_statistics(project, test_cases, product_tags)
-        
-        # 計算產品統計
-        product_stats = self._calculate_product_stats(project, test_cases, product_tags)
-        
-        # 生成測試案例詳情
-        test_case_details = self._generate_test_case_details(project, test_cases, product_tags)
-        
-        # 生成摘要
+        statistics, product_stats, test_case_details = self._aggregate(project, test_cases)
         summary = self._generate_summary(project, statistics, product_stats)
         
         return ProjectReport(
@@ -63,139 +115,156 @@ class ReportGenerator:
             summary=summary
         )
     
-    def _calculate_statistics(self, project: TestProject, test_cases: Dict[str, TestCase], 
-                            product_tags: Dict[str, ProductTag]) -> TestStatistics:
-        """計算統計資料"""
-        total_cases = len(project.selected_test_cases)
-        passed_cases = sum(1 for result in project.test_results.values() 
-                          if result.status == TestStatus.PASS)
-        failed_cases = sum(1 for result in project.test_results.values() 
-                          if result.status == TestStatus.FAIL)
-        not_tested_cases = total_cases - len(project.test_results)
-        
-        pass_rate = (passed_cases / total_cases * 100) if total_cases > 0 else 0
-        fail_rate = (failed_cases / total_cases * 100) if total_cases > 0 else 0
-        
-        # 計算各產品標籤的統計
-        product_stats_dict = {}
-        for tag_id, tag in product_tags.items():
-            tag_cases = [case for case in test_cases.values() 
-                        if tag_id in case.product_tags]
-            
-            if not tag_cases:
-                continue
-            
-            tag_total = len(tag_cases)
-            tag_passed = sum(1 for case in tag_cases 
-                           if case.id in project.test_results and 
-                           project.test_results[case.id].status == TestStatus.PASS)
-            tag_failed = sum(1 for case in tag_cases 
-                           if case.id in project.test_results and 
-                           project.test_results[case.id].status == TestStatus.FAIL)
-            tag_pass_rate = (tag_passed / tag_total * 100) if tag_total > 0 else 0
-            
-            product_stats_dict[tag.name] = {
-                'total': tag_total,
-                'passed': tag_passed,
-                'failed': tag_failed,
-                'not_tested': tag_total - tag_passed - tag_failed,
-                'pass_rate': round(tag_pass_rate, 2)
-            }
-        
-        return TestStatistics(
-            total_cases=total_cases,
-            passed_cases=passed_cases,
-            failed_cases=failed_cases,
-            not_tested_cases=not_tested_cases,
-            pass_rate=round(pass_rate, 2),
-            fail_rate=round(fail_rate, 2),
-            product_stats=product_stats_dict
+    @staticmethod
+    def _to_project(data: Dict[str, Any]) -> TestProject:
+        """資料庫的專案（get_test_project_by_id 的結果）轉為 TestProject"""
+        try:
+            status = ProjectStatus(data.get('status') or 'draft')
+        except ValueError:
+            status = ProjectStatus.DRAFT
+        
+        test_results = {}
+        for case_id, result in data.get('test_results', {}).items():
+            test_results[str(case_id)] = TestResult(
+                test_case_id=str(case_id),
+                status=TestStatus(result['status']),
+                notes=result.get('notes'),
+                known_issues=result.get('known_issues'),
+                blocked_reason=result.get('blocked_reason'),
+                tested_at=_parse_datetime(result.get('tested_at'))
+            )
+        
+        return TestProject(
+            id=str(data['id']),
+            name=data['name'],
+            responsible_user=data.get('responsible_user_name') or '',
+            selected_test_cases=[str(case_id) for case_id in data.get('selected_test_cases', [])],
+            start_time=_parse_datetime(data.get('start_time')),
+            end_time=_parse_datetime(data.get('end_time')),
+            test_results=test_results,
+            status=status,
+            created_at=_parse_datetime(data.get('created_at')) or datetime.now(),
+            updated_at=_parse_datetime(data.get('updated_at')) or datetime.now()
         )
     
-    def _calculate_product_stats(self, project: TestProject, test_cases: Dict[str, TestCase], 
-                               product_tags: Dict[str, ProductTag]) -> List[ProductStats]:
-        """計算產品統計"""
-        product_stats = []
+    def _aggregate(self, project: TestProject,
+                   test_cases: List[Dict[str, Any]]) -> Tuple[TestStatistics, List[ProductStats], List[Dict[str, Any]]]:
+        """
+        單次走訪專案的測試案例，同時累計整體統計、各產品標籤統計與案例詳情
+        每個案例只更新自身標籤的累計，成本為 O(案例數 + 案例標籤關聯數)，與標籤總數無關
+        """
+        totals = Counter()
+        tags: Dict[Any, Dict[str, Any]] = {}  # tag_id -> {'name', 'counts', 'critical_failures'}
+        details = []
         
-        for tag_id, tag in product_tags.items():
-            tag_cases = [case for case in test_cases.values() 
-                        if tag_id in case.product_tags]
-            
-            if not tag_cases:
-                continue
-            
-            total = len(tag_cases)
-            passed = sum(1 for case in tag_cases 
-                        if case.id in project.test_results and 
-                        project.test_results[case.id].status == TestStatus.PASS)
-            failed = sum(1 for case in tag_cases 
-                        if case.id in project.test_results and 
-                        project.test_results[case.id].status == TestStatus.FAIL)
-            not_tested = total - passed - failed
-            
-            pass_rate = (passed / total * 100) if total > 0 else 0
-            fail_rate = (failed / total * 100) if total > 0 else 0
+        for case in test_cases:
+            result = project.test_results.get(str(case['id']))
+            status = result.status if result else TestStatus.NOT_TESTED
+            totals[status] += 1
             
-            # 找出重要失敗項目
-            critical_failures = []
-            for case in tag_cases:
-                if (case.id in project.test_results and 
-                    project.test_results[case.id].status == TestStatus.FAIL):
-                    result = project.test_results[case.id]
-                    failure_info = f"{case.title}"
+            for tag in case.get('product_tags', []):
+                entry = tags.get(tag['id'])
+                if entry is None:
+                    entry = tags[tag['id']] = {'name': tag['name'], 'counts': Counter(), 'critical_failures': []}
+                entry['counts'][status] += 1
+                # 重要失敗項目
+                if status == TestStatus.FAIL:
+                    failure_info = case['title']
                     if result.known_issues:
                         failure_info += f" - {result.known_issues}"
-                    critical_failures.append(failure_info)
+                    entry['critical_failures'].append(failure_info)
             
+            details.append(self._generate_test_case_detail(case, result, status))
+        
+        product_stats = []
+        product_stats_dict = {}
+        for entry in tags.values():
+            counts = entry['counts']
+            total = sum(counts.values())
+            pass_rate, fail_rate = self._rates(counts, total)
             product_stats.append(ProductStats(
-                product_name=tag.name,
+                product_name=entry['name'],
                 total_cases=total,
-                passed_cases=passed,
-                failed_cases=failed,
-                not_tested_cases=not_tested,
-                pass_rate=round(pass_rate, 2),
-                fail_rate=round(fail_rate, 2),
-                critical_failures=critical_failures
+                passed_cases=counts[TestStatus.PASS],
+                failed_cases=counts[TestStatus.FAIL],
+                blocked_cases=counts[TestStatus.BLOCKED],
+                not_tested_cases=counts[TestStatus.NOT_TESTED],
+                pass_rate=pass_rate,
+                fail_rate=fail_rate,
+                critical_failures=entry['critical_failures']
             ))
+            product_stats_dict[entry['name']] = {
+                'total': total,
+                'passed': counts[TestStatus.PASS],
+                'failed': counts[TestStatus.FAIL],
+                'blocked': counts[TestStatus.BLOCKED],
+                'not_tested': counts[TestStatus.NOT_TESTED],
+                'pass_rate': pass_rate
+            }
         
         # 按通過率排序
         product_stats.sort(key=lambda x: x.pass_rate, reverse=True)
-        return product_stats
-    
-    def _generate_test_case_details(self, project: TestProject, test_cases: Dict[str, TestCase], 
-                                  product_tags: Dict[str, ProductTag]) -> List[Dict[str, Any]]:
-        """生成測試案例詳情"""
-        details = []
         
-        for case_id in project.selected_test_cases:
-            case = test_cases.get(case_id)
-            if not case:
-                continue
-            
-            result = project.test_results.get(case_id)
-            
-            # 產品標籤名稱
-            tag_names = [product_tags[tag_id].name for tag_id in case.product_tags 
-                        if tag_id in product_tags]
-            
-            detail = {
-                'id': case.id,
-                'title': case.title,
-                'user_role': case.user_role,
-                'feature_description': case.feature_description,
-                'acceptance_criteria': case.acceptance_criteria,
-                'test_notes': case.test_notes,
-                'product_tags': tag_names,
-                'status': result.status.value if result else 'not_tested',
-                'status_text': self._get_status_text(result.status if result else TestStatus.NOT_TESTED),
-                'test_result_notes': result.notes if result else '',
-                'known_issues': result.known_issues if result else '',
-                'tested_at': result.tested_at.isoformat() if result and result.tested_at else None
-            }
-            
-            details.append(detail)
-        
-        return details
+        total_cases = len(test_cases)
+        pass_rate, fail_rate = self._rates(totals, total_cases)
+        statistics = TestStatistics(
+            total_cases=total_cases,
+            passed_cases=totals[TestStatus.PASS],
+            failed_cases=totals[TestStatus.FAIL],
+            blocked_cases=totals[TestStatus.BLOCKED],
+            not_tested_cases=totals[TestStatus.NOT_TESTED],
+            pass_rate=pass_rate,
+            fail_rate=fail_rate,
+            product_stats=product_stats_dict
+        )
+        return statistics, product_stats, details
+    
+    @staticmethod
+    def _rates(counts: Counter, total: int) -> Tuple[float, float]:
+        """通過率與失敗率（百分比，小數兩位）"""
+        if not total:
+            return 0, 0
+        return (round(counts[TestStatus.PASS] / total * 100, 2),
+                round(counts[TestStatus.FAIL] / total * 100, 2))
+    
+    def _generate_test_case_detail(self, case: Dict[str, Any], result: Optional[TestResult],
+                                   status: TestStatus) -> Dict[str, Any]:
+        """生成測試案例詳情（description 依「用戶角色:」「功能描述:」格式拆分，與前端一致）"""
+        user_role, feature_description = self._split_description(case.get('description') or '')
+        return {
+            'id': str(case['id']),
+            'tc_id': case.get('tc_id'),
+            'title': case['title'],
+            'user_role': user_role,
+            'feature_description': feature_description,
+            'acceptance_criteria': [
+                criterion.strip() for criterion in (case.get('acceptance_criteria') or '').split('\n')
+                if criterion.strip()
+            ],
+            'test_notes': '',
+            'product_tags': [tag['name'] for tag in case.get('product_tags', [])],
+            'status': status.value,
+            'status_text': self._get_status_text(status),
+            'test_result_notes': result.notes if result else '',
+            'known_issues': result.known_issues if result else '',
+            'blocked_reason': result.blocked_reason if result else '',
+            'tested_at': result.tested_at.isoformat() if result and result.tested_at else None
+        }
+    
+    @staticmethod
+    def _split_description(description: str) -> Tuple[str, str]:
+        user_role = ''
+        feature_description = ''
+        for line in description.split('\n'):
+            line = line.strip()
+            if line.startswith('用戶角色:'):
+                user_role = line.replace('用戶角色:', '').strip()
+            elif line.startswith('功能描述:'):
+                feature_description = line.replace('功能描述:', '').strip()
+            elif not user_role and not feature_description:
+                # 沒有特定格式時將整個描述作為功能描述
+                feature_description = description
+        return user_role, feature_description
     
     def _generate_summary(self, project: TestProject, statistics: TestStatistics, 
                          product_stats: List[ProductStats]) -> Dict[str, Any]:
@@ -231,8 +300,8 @@ class ReportGenerator:
             'problematic_products': [{'name': ps.product_name, 'fail_rate': ps.fail_rate, 
                                     'critical_failures': ps.critical_failures} for ps in problematic_products],
             'perfect_products': [ps.product_name for ps in perfect_products],
-            'completion_rate': round((len(project.test_results) / len(project.selected_test_cases) * 100) 
-                                   if project.selected_test_cases else 0, 2),
+            'completion_rate': round(((statistics.total_cases - statistics.not_tested_cases) / statistics.total_cases * 100)
+                                   if statistics.total_cases else 0, 2),
             'top_issues': self._get_top_issues(project, statistics),
             'recommendations': self._generate_recommendations(statistics, product_stats)
         }
@@ -242,6 +311,7 @@ class ReportGenerator:
         status_map = {
             TestStatus.PASS: '通過',
             TestStatus.FAIL: '失敗',
+            TestStatus.BLOCKED: '阻擋',
             TestStatus.NOT_TESTED: '待測試'
         }
         return status_map.get(status, '未知')
@@ -317,6 +387,7 @@ class ReportGenerator:
                     'total_cases': ps.total_cases,
                     'passed_cases': ps.passed_cases,
                     'failed_cases': ps.failed_cases,
+                    'blocked_cases': ps.blocked_cases,
                     'not_tested_cases': ps.not_tested_cases,
                     'pass_rate': ps.pass_rate,
                     'fail_rate': ps.fail_rate,
@@ -329,18 +400,59 @@ class ReportGenerator:
         }
     
     def generate_comparison_report(self, project_ids: List[str]) -> Dict[str, Any]:
-        """生成多專案比較報告"""
-        reports = []
-        
-        for project_id in project_ids:
-            report = self.generate_project_report(project_id)
-            if report:
-                reports.append(report)
-        
-        if not reports:
+        """
+        生成多專案比較報告
+        以 TestCaseManager.get_comparison_counts 的分組計數在記憶體中單次彙總，
+        不逐一產生專案報告；成本與這些專案的結果筆數成正比
+        """
+        counts = self.manager.get_comparison_counts(project_ids)
+        if not counts['projects']:
             return {}
         
-        # 比較統計
+        projects: Dict[int, Dict[str, Any]] = {}
+        for row in counts['projects']:
+            test_date = _parse_datetime(row.get('start_time')) or _parse_datetime(row.get('created_at'))
+            projects[row['id']] = {
+                'id': row['id'],
+                'name': row['name'],
+                'status': row.get('status'),
+                'responsible_user': row.get('responsible_user_name') or '',
+                'test_date': test_date.isoformat() if test_date else None,
+                'counts': Counter(),
+                'trend': []
+            }
+        
+        for row in counts['statuses']:
+            projects[row['project_id']]['counts'][TestStatus(row['status'])] += row['count']
+        
+        tags: Dict[Any, Dict[str, Any]] = {}  # tag_id -> {'name', 'projects': {project_id: Counter}}
+        for row in counts['tags']:
+            entry = tags.setdefault(row['tag_id'], {'name': row['tag_name'], 'projects': {}})
+            entry['projects'].setdefault(row['project_id'], Counter())[TestStatus(row['status'])] += row['count']
+        
+        # 依測試日期累計：各日期之後已測試的比例與通過率（相對於專案的案例總數）
+        daily: Dict[int, Dict[str, Counter]] = {}
+        for row in counts['daily']:
+            daily.setdefault(row['project_id'], {}).setdefault(row['day'], Counter())[TestStatus(row['status'])] += row['count']
+        for project_id, days in daily.items():
+            project = projects[project_id]
+            total = sum(project['counts'].values())
+            cumulative = Counter()
+            for day in sorted(days, key=lambda day: day or ''):
+                cumulative.update(days[day])
+                tested = sum(cumulative.values())
+                pass_rate, fail_rate = self._rates(cumulative, total)
+                project['trend'].append({
+                    'date': day,
+                    'tested': sum(days[day].values()),
+                    'cumulative_tested': tested,
+                    'completion_rate': round(tested / total * 100, 2) if total else 0,
+                    'pass_rate': pass_rate,
+                    'fail_rate': fail_rate
+                })
+        
+        # 依測試日期排序（趨勢與產品比較都以此順序呈現）
+        ordered = sorted(projects.values(), key=lambda project: (project['test_date'] or '', project['id']))
         comparison_stats = {
             'projects': [],
             'overall_trends': {},
@@ -349,43 +461,60 @@ class ReportGenerator:
         }
         
         # 整理各專案統計
-        for report in reports:
-            comparison_stats['projects'].append({
-                'name': report.project.name,
-                'test_date': report.project.test_date.isoformat(),
-                'pass_rate': report.statistics.pass_rate,
-                'fail_rate': report.statistics.fail_rate,
-                'completion_rate': report.summary['completion_rate']
-            })
+        for project in ordered:
+            project_counts = project.pop('counts')
+            comparison_stats['projects'].append({**project, **self._count_summary(project_counts)})
+        
+        # 各產品標籤在每個專案中的統計
+        for entry in sorted(tags.values(), key=lambda entry: entry['name']):
+            comparison_stats['product_comparison'][entry['name']] = [
+                {'project_id': project['id'], 'project_name': project['name'],
+                 **self._count_summary(entry['projects'][project['id']])}
+                for project in ordered if project['id'] in entry['projects']
+            ]
         
         # 計算趨勢
-        pass_rates = [report.statistics.pass_rate for report in reports]
+        project_stats = comparison_stats['projects']
+        pass_rates = [project['pass_rate'] for project in project_stats]
         comparison_stats['overall_trends'] = {
             'average_pass_rate': round(sum(pass_rates) / len(pass_rates), 2),
-            'best_project': max(reports, key=lambda r: r.statistics.pass_rate).project.name,
-            'worst_project': min(reports, key=lambda r: r.statistics.pass_rate).project.name,
-            'improvement_trend': self._calculate_trend(reports)
+            'best_project': max(project_stats, key=lambda project: project['pass_rate'])['name'],
+            'worst_project': min(project_stats, key=lambda project: project['pass_rate'])['name'],
+            'improvement_trend': self._calculate_trend(pass_rates)
         }
         
+        # 建議：最早與最新專案間通過率下降的產品
+        for product_name, entries in comparison_stats['product_comparison'].items():
+            if len(entries) >= 2 and entries[-1]['pass_rate'] < entries[0]['pass_rate']:
+                comparison_stats['recommendations'].append(
+                    f"{product_name} 產品的通過率由 {entries[0]['pass_rate']}% 降至 {entries[-1]['pass_rate']}%，建議重點關注"
+                )
+        
         return comparison_stats
     
-    def _calculate_trend(self, reports: List[ProjectReport]) -> str:
-        """計算改善趨勢"""
-        if len(reports) < 2:
+    def _count_summary(self, counts: Counter) -> Dict[str, Any]:
+        """狀態計數轉為比較報告的統計欄位"""
+        total = sum(counts.values())
+        pass_rate, fail_rate = self._rates(counts, total)
+        return {
+            'total_cases': total,
+            'passed_cases': counts[TestStatus.PASS],
+            'failed_cases': counts[TestStatus.FAIL],
+            'blocked_cases': counts[TestStatus.BLOCKED],
+            'not_tested_cases': counts[TestStatus.NOT_TESTED],
+            'pass_rate': pass_rate,
+            'fail_rate': fail_rate,
+            'completion_rate': round((total - counts[TestStatus.NOT_TESTED]) / total * 100, 2) if total else 0
+        }
+    
+    def _calculate_trend(self, pass_rates: List[float]) -> str:
+        """計算改善趨勢（pass_rates 依測試日期排序）"""
+        if len(pass_rates) < 2:
             return "資料不足"
         
-        # 按測試日期排序
-        sorted_reports = sorted(reports, key=lambda r: r.project.test_date)
-        
-        # 計算通過率趨勢
-        pass_rates = [report.statistics.pass_rate for report in sorted_reports]
-        
-        if len(pass_rates) >= 2:
-            if pass_rates[-1] > pass_rates[0]:
-                return "改善中"
-            elif pass_rates[-1] < pass_rates[0]:
-                return "退步中"
-            else:
-                return "穩定"
-        
-        return "無法判斷"
\ No newline at end of file
+        if pass_rates[-1] > pass_rates[0]:
+            return "改善中"
+        elif pass_rates[-1] < pass_rates[0]:
+            return "退步中"
+        else:
+            return "穩定"
@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from services.form_validator import FormValidator
+from database.db_manager import db_manager
+from user_cache import user_cache
 
 # 創建管理功能的藍圖
 admin_bp = Blueprint('admin', __name__)
@@ -27,7 +29,10 @@ def register_admin_routes(app, data_manager, api_checker, admin_required):
             'request_body': request.form.get('request_body', '').strip(),
             'concurrent_requests': int(request.form.get('concurrent_requests', 1)),
             'duration_seconds': int(request.form.get('duration_seconds', 10)),
-            'interval_seconds': float(request.form.get('interval_seconds', 1.0))
+            'interval_seconds': float(request.form.get('interval_seconds', 1.0)),
+            'check_interval_seconds': int(request.form['check_interval_seconds']) if request.form.get('check_interval_seconds', '').strip() else None,
+            'target_rps': float(request.form['target_rps']) if request.form.get('target_rps', '').strip() else None,
+            'load_profile': request.form.get('load_profile', 'constant').strip()
         }
         
         # 驗證表單
@@ -44,7 +49,8 @@ def register_admin_routes(app, data_manager, api_checker, admin_required):
                 form_data['name'], form_data['url'], form_data['type'], 
                 form_data['method'], form_data['request_body'] if form_data['request_body'] else None,
                 form_data['concurrent_requests'], form_data['duration_seconds'], 
-                form_data['interval_seconds']
+                form_data['interval_seconds'], form_data['check_interval_seconds'],
+                form_data['target_rps'], form_data['load_profile']
             )
             flash(f'成功新增 API: {form_data["name"]} ({form_data["method"]}) - 壓力測試配置已設定', 'success')
             
@@ -96,7 +102,10 @@ def register_admin_routes(app, data_manager, api_checker, admin_required):
             'request_body': request.form.get('request_body', '').strip(),
             'concurrent_requests': int(request.form.get('concurrent_requests', 1)),
             'duration_seconds': int(request.form.get('duration_seconds', 10)),
-            'interval_seconds': float(request.form.get('interval_seconds', 1.0))
+            'interval_seconds': float(request.form.get('interval_seconds', 1.0)),
+            'check_interval_seconds': int(request.form['check_interval_seconds']) if request.form.get('check_interval_seconds', '').strip() else None,
+            'target_rps': float(request.form['target_rps']) if request.form.get('target_rps', '').strip() else None,
+            'load_profile': request.form.get('load_profile', 'constant').strip()
         }
         
         # 驗證表單
@@ -113,7 +122,8 @@ def register_admin_routes(app, data_manager, api_checker, admin_required):
                 api_id, form_data['name'], form_data['url'], form_data['type'], 
                 form_data['method'], form_data['request_body'] if form_data['request_body'] else None,
                 form_data['concurrent_requests'], form_data['duration_seconds'], 
-                form_data['interval_seconds']
+                form_data['interval_seconds'], form_data['check_interval_seconds'],
+                form_data['target_rps'], form_data['load_profile']
             )
             
             if success:
@@ -134,4 +144,35 @@ def register_admin_routes(app, data_manager, api_checker, admin_required):
             flash(f'更新 API 時發生錯誤: {str(e)}', 'error')
             return redirect(url_for('admin.edit_api', api_id=api_id))
     
+    @admin_bp.route('/api/admin/db-stats')
+    @admin_required
+    def api_db_stats():
+        """資料庫連線池指標（借出次數、等待時間、逾時）與生效的 PRAGMA"""
+        return jsonify({
+            'success': True,
+            'pools': db_manager.get_pool_stats(),
+            'pragmas': db_manager.get_pragma_report()
+        })
+    
+    @admin_bp.route('/api/admin/query-stats')
+    @admin_required
+    def api_query_stats():
+        """依語句指紋彙總的查詢統計（sort: total_ms、avg_ms、max_ms、calls、rows、slow_calls）"""
+        sort = request.args.get('sort', 'total_ms')
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        return jsonify({'success': True, 'profile': db_manager.query_profiler.get_report(sort, limit)})
+    
+    @admin_bp.route('/api/admin/query-stats/reset', methods=['POST'])
+    @admin_required
+    def api_reset_query_stats():
+        """清除查詢統計"""
+        db_manager.query_profiler.reset()
+        return jsonify({'success': True})
+    
+    @admin_bp.route('/api/admin/user-cache-stats')
+    @admin_required
+    def api_user_cache_stats():
+        """用戶快取的命中／未命中計數"""
+        return jsonify({'success': True, 'stats': user_cache.get_stats()})
+    
     app.register_blueprint(admin_bp)
\ No newline at end of file
@@ -1,10 +1,17 @@
 from flask import request, render_template, jsonify, make_response, session
 from audit_logger import AuditLogger
+from audit_writer import audit_writer
+from audit_archive import audit_archive
+from search_index import search_index
 from datetime import datetime, timedelta
 import csv
 import io
 
 
+# 關鍵操作（統計用）
+CRITICAL_ACTIONS = (AuditLogger.ACTION_CREATE, AuditLogger.ACTION_UPDATE, AuditLogger.ACTION_DELETE)
+
+
 def register_audit_routes(app, admin_required):
     """註冊操作記錄路由"""
     
@@ -13,18 +20,19 @@ def register_audit_routes(app, admin_required):
     def audit_logs():
         """操作記錄頁面（僅管理員可查看）"""
         # 獲取篩選參數
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), 200)
+        after = request.args.get('after', '')
+        before = request.args.get('before', '')
         action = request.args.get('action', '')
         resource_type = request.args.get('resource_type', '')
         username = request.args.get('username', '')
         start_date = request.args.get('start_date', '')
         end_date = request.args.get('end_date', '')
+        period = request.args.get('period', '')
+        keyword = request.args.get('q', '').strip()
         export = request.args.get('export', '')
         
-        # 計算偏移量
-        offset = (page - 1) * per_page
-        
         # 構建篩選條件
         filters = {}
         if action:
@@ -38,43 +46,155 @@ def register_audit_routes(app, admin_required):
         if end_date:
             filters['end_date'] = end_date + ' 23:59:59'
         
+        # 已封存的月份改由封存檔查詢
+        archive_period = period if audit_archive.is_archived(period) else None
+        
         # 如果是匯出請求
         if export == 'csv':
-            return export_audit_logs_csv(filters)
-        
-        # 獲取操作記錄
-        logs = AuditLogger.get_audit_logs(
-            limit=per_page,
-            offset=offset,
-            **filters
-        )
+            return export_audit_logs_csv(filters, archive_period)
         
-        # 獲取總數（用於分頁）
-        total_logs = AuditLogger.get_audit_logs(limit=9999, offset=0, **filters)
-        total = len(total_logs)
+        # 分頁連結保留篩選條件，只替換游標與頁碼
+        link_args = {key: value for key, value in request.args.items()
+                     if key not in ('page', 'after', 'before', 'export') and value}
         
         # 獲取統計信息
         stats = get_audit_stats()
+        archives = audit_archive.list_archives()
+        
+        if archive_period:
+            # 封存檔以頁碼分頁
+            result = audit_archive.query(archive_period, limit=per_page,
+                                         offset=(page - 1) * per_page, **filters)
+            total = result['total']
+            pagination = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'has_prev': page > 1,
+                'has_next': page * per_page < total,
+                'prev_args': dict(link_args, page=page - 1),
+                'next_args': dict(link_args, page=page + 1),
+                'first_args': link_args
+            }
+            return render_template('audit_logs.html',
+                                 logs=result['logs'],
+                                 stats=stats,
+                                 pagination=pagination,
+                                 archives=archives,
+                                 archive_period=archive_period)
+        
+        if keyword:
+            # 關鍵字搜尋依相關度排序，以頁碼分頁
+            result = search_index.search_audit_logs(keyword, limit=per_page,
+                                                    offset=(page - 1) * per_page, **filters)
+            total = result['total']
+            pagination = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'has_prev': page > 1,
+                'has_next': page * per_page < total,
+                'prev_args': dict(link_args, page=page - 1),
+                'next_args': dict(link_args, page=page + 1),
+                'first_args': link_args
+            }
+            return render_template('audit_logs.html',
+                                 logs=result['results'],
+                                 stats=stats,
+                                 pagination=pagination,
+                                 archives=archives,
+                                 archive_period=None)
+        
+        # 以 (created_at, id) 游標分頁獲取操作記錄（只讀取列表欄位）
+        try:
+            result = AuditLogger.get_audit_log_page(
+                limit=per_page,
+                after=after or None,
+                before=before or None,
+                **filters
+            )
+        except ValueError:
+            page = 1
+            result = AuditLogger.get_audit_log_page(limit=per_page, **filters)
+        logs = result['logs']
+        
+        # 獲取總數（用於分頁）
+        total = AuditLogger.count_audit_logs(**filters)
+        
+        pages = (total + per_page - 1) // per_page
         
-        # 分頁信息
         pagination = {
             'page': page,
             'per_page': per_page,
             'total': total,
-            'pages': (total + per_page - 1) // per_page,
-            'has_prev': page > 1,
-            'has_next': page * per_page < total,
-            'prev_num': page - 1 if page > 1 else None,
-            'next_num': page + 1 if page * per_page < total else None
+            'pages': pages,
+            'has_prev': result['prev_cursor'] is not None,
+            'has_next': result['next_cursor'] is not None,
+            'prev_args': dict(link_args, before=result['prev_cursor'], page=max(page - 1, 1)),
+            'next_args': dict(link_args, after=result['next_cursor'], page=page + 1),
+            'first_args': link_args
         }
         
-        # 添加分頁迭代器
-        pagination['iter_pages'] = lambda: get_pagination_pages(page, pagination['pages'])
-        
         return render_template('audit_logs.html',
                              logs=logs,
                              stats=stats,
-                             pagination=pagination)
+                             pagination=pagination,
+                             archives=archives,
+                             archive_period=None)
+    
+    @app.route('/api/audit-logs/<int:log_id>')
+    @admin_required
+    def api_audit_log_detail(log_id):
+        """單筆操作記錄的完整變更內容（供詳情視窗載入，period 指定時查詢封存檔）"""
+        period = request.args.get('period', '')
+        if period:
+            log = audit_archive.get_log(period, log_id)
+        else:
+            log = AuditLogger.get_audit_log(log_id)
+        if not log:
+            return jsonify({'success': False, 'message': '找不到操作記錄'}), 404
+        
+        for values in (log.get('old_values'), log.get('new_values')):
+            if isinstance(values, dict):
+                values.pop('password', None)
+                values.pop('password_hash', None)
+        
+        return jsonify({'success': True, 'log': log})
+    
+    @app.route('/api/audit-logs/search')
+    @admin_required
+    def api_search_audit_logs():
+        """全文檢索操作記錄的資源名稱與變更內容（可搭配 action、resource_type、username 篩選）"""
+        query = request.args.get('q', '').strip()
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        filters = {key: request.args[key] for key in ('action', 'resource_type', 'username')
+                   if request.args.get(key)}
+        
+        result = search_index.search_audit_logs(query, limit=limit, offset=offset, **filters)
+        result['query'] = query
+        return jsonify(result)
+    
+    @app.route('/api/audit-archives')
+    @admin_required
+    def api_audit_archives():
+        """已封存的審計日誌月份"""
+        return jsonify({'success': True, 'archives': audit_archive.list_archives()})
+    
+    @app.route('/api/audit-archives/run', methods=['POST'])
+    @admin_required
+    def api_run_audit_archive():
+        """立即執行封存與過期清理"""
+        audit_writer.flush()
+        return jsonify({'success': True, 'result': audit_archive.run()})
+    
+    @app.route('/api/audit-writer-stats')
+    @admin_required
+    def api_audit_writer_stats():
+        """背景審計寫入器的計數器（已接受、已寫入、丟棄、失敗）"""
+        return jsonify({'success': True, 'stats': audit_writer.get_stats()})
     
     @app.route('/api/audit-logs')
     @admin_required
@@ -190,10 +310,13 @@ def register_audit_routes(app, admin_required):
         })
 
 
-def export_audit_logs_csv(filters):
-    """匯出操作記錄為CSV"""
+def export_audit_logs_csv(filters, archive_period=None):
+    """匯出操作記錄為CSV（archive_period 指定時匯出封存檔）"""
     # 獲取所有符合條件的記錄
-    logs = AuditLogger.get_audit_logs(limit=10000, offset=0, **filters)
+    if archive_period:
+        logs = audit_archive.query(archive_period, limit=10000, offset=0, **filters)['logs']
+    else:
+        logs = AuditLogger.get_audit_logs(limit=10000, offset=0, **filters)
     
     # 創建CSV文件
     output = io.StringIO()
@@ -239,196 +362,62 @@ def export_audit_logs_csv(filters):
 
 
 def get_audit_stats():
-    """獲取操作記錄統計信息"""
-    from database.db_manager import db_manager
-    
-    # 總記錄數
-    total_query = "SELECT COUNT(*) as count FROM audit_logs"
-    total_result = db_manager.execute_query(total_query)
-    total = total_result[0]['count'] if total_result else 0
-    
-    # 今日操作數
+    """獲取操作記錄統計信息（由每日計數彙總，含已封存的月份）"""
     today = datetime.now().strftime('%Y-%m-%d')
-    today_query = """
-        SELECT COUNT(*) as count 
-        FROM audit_logs 
-        WHERE DATE(created_at) = ?
-    """
-    today_result = db_manager.execute_query(today_query, (today,))
-    today_count = today_result[0]['count'] if today_result else 0
-    
-    # 活躍用戶數（最近7天）
     week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    users_query = """
-        SELECT COUNT(DISTINCT user_id) as count 
-        FROM audit_logs 
-        WHERE DATE(created_at) >= ?
-    """
-    users_result = db_manager.execute_query(users_query, (week_ago,))
-    unique_users = users_result[0]['count'] if users_result else 0
-    
-    # 關鍵操作數（創建、更新、刪除）
-    critical_query = """
-        SELECT COUNT(*) as count 
-        FROM audit_logs 
-        WHERE action IN ('CREATE', 'UPDATE', 'DELETE')
-        AND DATE(created_at) = ?
-    """
-    critical_result = db_manager.execute_query(critical_query, (today,))
-    critical_actions = critical_result[0]['count'] if critical_result else 0
     
     return {
-        'total': total,
-        'today_count': today_count,
-        'unique_users': unique_users,
-        'critical_actions': critical_actions
+        # 總記錄數
+        'total': AuditLogger.count_operations(),
+        # 今日操作數
+        'today_count': AuditLogger.count_operations(start_day=today, end_day=today),
+        # 活躍用戶數（最近7天）
+        'unique_users': AuditLogger.count_active_users(start_day=week_ago),
+        # 關鍵操作數（創建、更新、刪除）
+        'critical_actions': AuditLogger.count_operations(
+            actions=CRITICAL_ACTIONS, start_day=today, end_day=today
+        )
     }
 
 
 def get_test_case_audit_stats():
     """獲取測試案例專用操作記錄統計信息"""
-    from database.db_manager import db_manager
-    
-    # 測試案例總操作數
-    total_query = """
-        SELECT COUNT(*) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_CASE'
-    """
-    total_result = db_manager.execute_query(total_query)
-    total = total_result[0]['count'] if total_result else 0
-    
-    # 今日測試案例操作數
     today = datetime.now().strftime('%Y-%m-%d')
-    today_query = """
-        SELECT COUNT(*) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_CASE' AND DATE(created_at) = ?
-    """
-    today_result = db_manager.execute_query(today_query, (today,))
-    today_count = today_result[0]['count'] if today_result else 0
-    
-    # 按操作類型統計測試案例操作
-    action_query = """
-        SELECT action, COUNT(*) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_CASE'
-        GROUP BY action
-        ORDER BY count DESC
-    """
-    action_result = db_manager.execute_query(action_query)
-    
-    # 最近活躍的測試案例編輯者（最近7天）
     week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    editors_query = """
-        SELECT COUNT(DISTINCT user_id) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_CASE' 
-        AND DATE(created_at) >= ?
-        AND action IN ('CREATE', 'UPDATE', 'DELETE')
-    """
-    editors_result = db_manager.execute_query(editors_query, (week_ago,))
-    active_editors = editors_result[0]['count'] if editors_result else 0
+    resource_type = AuditLogger.RESOURCE_TEST_CASE
     
     return {
-        'total_test_case_operations': total,
-        'today_test_case_operations': today_count,
-        'active_editors': active_editors,
-        'operations_by_action': action_result
+        'total_test_case_operations': AuditLogger.count_operations(resource_type=resource_type),
+        'today_test_case_operations': AuditLogger.count_operations(
+            resource_type=resource_type, start_day=today, end_day=today
+        ),
+        # 最近活躍的測試案例編輯者（最近7天）
+        'active_editors': AuditLogger.count_active_users(
+            resource_type=resource_type, actions=CRITICAL_ACTIONS, start_day=week_ago
+        ),
+        'operations_by_action': AuditLogger.count_operations_by(resource_type=resource_type)
     }
 
 
 def get_test_project_audit_stats():
     """獲取測試專案專用操作記錄統計信息"""
-    from database.db_manager import db_manager
-    
-    # 測試專案總操作數
-    total_query = """
-        SELECT COUNT(*) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_PROJECT'
-    """
-    total_result = db_manager.execute_query(total_query)
-    total = total_result[0]['count'] if total_result else 0
-    
-    # 今日測試專案操作數
     today = datetime.now().strftime('%Y-%m-%d')
-    today_query = """
-        SELECT COUNT(*) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_PROJECT' AND DATE(created_at) = ?
-    """
-    today_result = db_manager.execute_query(today_query, (today,))
-    today_count = today_result[0]['count'] if today_result else 0
-    
-    # 按操作類型統計測試專案操作
-    action_query = """
-        SELECT action, COUNT(*) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_PROJECT'
-        GROUP BY action
-        ORDER BY count DESC
-    """
-    action_result = db_manager.execute_query(action_query)
-    
-    # 最近活躍的測試專案管理者（最近7天）
     week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    managers_query = """
-        SELECT COUNT(DISTINCT user_id) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_PROJECT' 
-        AND DATE(created_at) >= ?
-        AND action IN ('CREATE', 'UPDATE', 'DELETE')
-    """
-    managers_result = db_manager.execute_query(managers_query, (week_ago,))
-    active_managers = managers_result[0]['count'] if managers_result else 0
-    
-    # 最近創建的專案數（最近30天）
     month_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-    recent_projects_query = """
-        SELECT COUNT(*) as count 
-        FROM audit_logs 
-        WHERE resource_type = 'TEST_PROJECT' 
-        AND action = 'CREATE'
-        AND DATE(created_at) >= ?
-    """
-    recent_projects_result = db_manager.execute_query(recent_projects_query, (month_ago,))
-    recent_projects = recent_projects_result[0]['count'] if recent_projects_result else 0
+    resource_type = AuditLogger.RESOURCE_TEST_PROJECT
     
     return {
-        'total_test_project_operations': total,
-        'today_test_project_operations': today_count,
-        'active_managers': active_managers,
-        'recent_projects_created': recent_projects,
-        'operations_by_action': action_result
+        'total_test_project_operations': AuditLogger.count_operations(resource_type=resource_type),
+        'today_test_project_operations': AuditLogger.count_operations(
+            resource_type=resource_type, start_day=today, end_day=today
+        ),
+        # 最近活躍的測試專案管理者（最近7天）
+        'active_managers': AuditLogger.count_active_users(
+            resource_type=resource_type, actions=CRITICAL_ACTIONS, start_day=week_ago
+        ),
+        # 最近創建的專案數（最近30天）
+        'recent_projects_created': AuditLogger.count_operations(
+            resource_type=resource_type, actions=(AuditLogger.ACTION_CREATE,), start_day=month_ago
+        ),
+        'operations_by_action': AuditLogger.count_operations_by(resource_type=resource_type)
     }
-
-
-def get_pagination_pages(current_page, total_pages, window=5):
-    """生成分頁頁碼列表"""
-    if total_pages <= window:
-        return list(range(1, total_pages + 1))
-    
-    start = max(1, current_page - window // 2)
-    end = min(total_pages, start + window - 1)
-    
-    if end - start < window - 1:
-        start = max(1, end - window + 1)
-    
-    pages = list(range(start, end + 1))
-    
-    # 添加省略號
-    result = []
-    if start > 1:
-        result.append(1)
-        if start > 2:
-            result.append(None)  # 省略號
-    
-    result.extend(pages)
-    
-    if end < total_pages:
-        if end < total_pages - 1:
-            result.append(None)  # 省略號
-        result.append(total_pages)
-    
-    return result
\ No newline at end of file
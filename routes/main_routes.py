@@ -1,5 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session, Response, stream_with_context
+from status_snapshot import status_snapshot
+import json
+import math
 import threading
+import time
 
 # 創建主要功能的藍圖
 main_bp = Blueprint('main', __name__)
@@ -21,15 +25,8 @@ def register_main_routes(app, data_manager, api_checker, stress_tester, user_man
     @login_required
     def dashboard():
         """主監控頁面（需要登入）"""
-        apis = data_manager.load_apis()
-        
-        # 計算統計資料
-        stats = {
-            'total': len(apis),
-            'healthy': len([api for api in apis if api.get('status') == 'healthy']),
-            'unhealthy': len([api for api in apis if api.get('status') == 'unhealthy']),
-            'unknown': len([api for api in apis if api.get('status') == 'unknown'])
-        }
+        snapshot = status_snapshot.get()
+        apis, stats = snapshot.apis, snapshot.stats
         
         current_user = user_manager.get_user_by_id(session['user_id'])
         return render_template('index.html', apis=apis, stats=stats, current_user=current_user)
@@ -60,18 +57,77 @@ def register_main_routes(app, data_manager, api_checker, stress_tester, user_man
 
     @main_bp.route('/api/status')
     def api_status():
-        """提供 JSON 格式的 API 狀態資料"""
-        apis = data_manager.load_apis()
-        stats = {
-            'total': len(apis),
-            'healthy': len([api for api in apis if api.get('status') == 'healthy']),
-            'unhealthy': len([api for api in apis if api.get('status') == 'unhealthy']),
-            'unknown': len([api for api in apis if api.get('status') == 'unknown'])
-        }
+        """
+        提供 JSON 格式的 API 狀態資料（來自記憶體快照，支援 If-None-Match）
+        ?since=<version> 時只返回該版本之後狀態、延遲或錯誤有變的 API 與已刪除的 API（since=0 為完整的精簡清單）
+        延遲只在與上次發布值相差超過 max(上次值 × STATUS_LATENCY_CHANGE_RATIO, STATUS_LATENCY_CHANGE_MIN 秒) 時才算變更，
+        因此 response_time 是上次發布的值，與最新一次檢查的延遲可能有少量差距
+        """
+        since = request.args.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return jsonify({'error': '無效的版本'}), 400
+            return jsonify(status_snapshot.get_delta(since))
+        
+        snapshot = status_snapshot.get()
+        response = Response(snapshot.body, mimetype='application/json')
+        response.set_etag(snapshot.etag)
+        # 每次都向伺服器驗證，內容未變時返回 304
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    @main_bp.route('/api/status/stream')
+    @login_required
+    def api_status_stream():
+        """以 Server-Sent Events 推送 API 狀態增量（事件 id 為變更版本，斷線重連時由 Last-Event-ID 接續）"""
+        try:
+            since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+        except ValueError:
+            since = 0
+        
+        def generate():
+            last_version = since
+            first = True
+            yield 'retry: 3000\n\n'
+            while True:
+                # 第一次送出目前狀態（since=0 時為完整清單），之後只在版本前進且有內容時送出
+                delta = status_snapshot.get_delta(last_version)
+                changed = delta['version'] != last_version and (delta['full'] or delta['changed'] or delta['deleted'])
+                if first or changed:
+                    yield f"id: {delta['version']}\nevent: delta\ndata: {json.dumps(delta, default=str)}\n\n"
+                else:
+                    yield ': keep-alive\n\n'
+                first = False
+                last_version = delta['version']
+                status_snapshot.wait_for_change(last_version, timeout=15)
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
+    @main_bp.route('/api/history/<api_id>')
+    @login_required
+    def api_history(api_id):
+        """API 檢查歷史：可用率、延遲百分位數及時間序列"""
+        try:
+            hours = float(request.args.get('hours', 24))
+            if not math.isfinite(hours):
+                raise ValueError('hours must be finite')
+            hours = min(max(hours, 1 / 60), 24 * 400)
+            resolution = request.args.get('resolution', type=int)
+        except ValueError:
+            return jsonify({'error': '無效的查詢參數'}), 400
+        
+        end_ts = int(time.time())
+        start_ts = end_ts - int(hours * 3600)
+        history = api_checker.check_history
         
         return jsonify({
-            'apis': apis,
-            'stats': stats
+            'summary': history.get_summary(api_id, start_ts, end_ts),
+            'series': history.get_series(api_id, start_ts, end_ts, resolution)
         })
 
     @main_bp.route('/health')
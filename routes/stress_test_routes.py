@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
+import json
 import threading
+from urllib.parse import quote
 
 # 創建壓力測試功能的藍圖
 stress_test_bp = Blueprint('stress_test', __name__)
@@ -23,6 +25,13 @@ def register_stress_test_routes(app, data_manager, stress_tester, login_required
                 flash(f'API {api["name"]} 的壓力測試正在執行中', 'error')
                 return redirect(url_for('main.dashboard'))
             
+            # 先清除上一次測試的即時快照，避免監控頁面讀到舊的完成狀態
+            stress_tester.live_feed.start(api_id, api_name=api['name'])
+            
+            # 啟動前最新一筆結果的 ID：監控頁面連到其他 worker 時，以出現更新的結果判斷測試完成
+            previous = data_manager.get_stress_test_summaries(api_id, limit=1)['results']
+            after_result_id = previous[0]['id'] if previous else 0
+            
             # 在背景執行壓力測試
             def run_test():
                 try:
@@ -37,7 +46,8 @@ def register_stress_test_routes(app, data_manager, stress_tester, login_required
             flash(f'已啟動 API {api["name"]} 的壓力測試', 'success')
             
             # 先顯示loading頁面，然後重定向到實時監控頁面
-            return redirect(url_for('main.loading') + '?redirect=' + url_for('stress_test.stress_test_live', api_id=api_id) + '&delay=1500')
+            live_url = url_for('stress_test.stress_test_live', api_id=api_id, after=after_result_id)
+            return redirect(url_for('main.loading') + '?redirect=' + quote(live_url, safe='/') + '&delay=1500')
             
         except Exception as e:
             flash(f'啟動壓力測試時發生錯誤: {str(e)}', 'error')
@@ -53,58 +63,131 @@ def register_stress_test_routes(app, data_manager, stress_tester, login_required
             flash('找不到指定的 API', 'error')
             return redirect(url_for('main.index'))
         
-        return render_template('stress_live.html', api=api)
+        return render_template('stress_live.html', api=api,
+                               after_result_id=request.args.get('after', 0, type=int))
 
     @stress_test_bp.route('/stress-test-results/<api_id>')
     @login_required
     def stress_test_results(api_id):
         """顯示壓力測試結果"""
-        api = data_manager.get_api_by_id(api_id)
+        api = data_manager.get_api_by_id(api_id, include_stress_results=True)
         if not api:
             flash('找不到指定的 API', 'error')
             return redirect(url_for('main.index'))
         
         return render_template('stress_results.html', api=api)
 
+    @stress_test_bp.route('/api/stress-test-history/<api_id>')
+    @login_required
+    def stress_test_history(api_id):
+        """分頁取得壓力測試摘要（不含原始請求紀錄）"""
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+            per_page = min(max(1, int(request.args.get('per_page', 10))), 100)
+        except ValueError:
+            return jsonify({'error': '無效的分頁參數'}), 400
+        
+        history = data_manager.get_stress_test_summaries(api_id, limit=per_page, offset=(page - 1) * per_page)
+        total = history['total']
+        
+        return jsonify({
+            'results': history['results'],
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'has_prev': page > 1,
+                'has_next': page * per_page < total
+            }
+        })
+
+    @stress_test_bp.route('/api/stress-test-stream/<api_id>')
+    @login_required
+    def stress_test_stream(api_id):
+        """
+        以 Server-Sent Events 推送壓力測試即時快照（只讀取記憶體，不查詢資料庫）
+        即時快照只存在於執行測試的 worker；多個 gunicorn worker 時請求可能落在其他 worker，
+        此時送出 elsewhere 事件，前端改以 /api/stress-test-status 輪詢（完成與否以資料庫中的新結果判斷）
+        """
+        feed = stress_tester.live_feed
+        
+        def generate():
+            last_seq = 0
+            # 告訴瀏覽器斷線後的重新連線間隔
+            yield 'retry: 3000\n\n'
+            while True:
+                snapshot = feed.wait_for_update(api_id, last_seq, timeout=15)
+                if snapshot is None:
+                    if not stress_tester.is_test_running(api_id):
+                        # 本 worker 沒有這個測試（可能在其他 worker 執行，或服務已重啟），不能視為已完成
+                        yield 'event: elsewhere\ndata: {"status": "unknown"}\n\n'
+                        return
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                last_seq = snapshot['seq']
+                yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+                if snapshot['status'] != 'running':
+                    yield f"event: end\ndata: {json.dumps({'status': snapshot['status']})}\n\n"
+                    return
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
     @stress_test_bp.route('/api/stress-test-status/<api_id>')
     @login_required
     def stress_test_status(api_id):
-        """取得壓力測試狀態（AJAX 用）"""
+        """
+        取得壓力測試狀態（AJAX 用）
+        is_running 與即時資料只反映本 worker；latest_result_id（資料庫中最新結果的 ID）各 worker 一致
+        """
         is_running = stress_tester.is_test_running(api_id)
-        api = data_manager.get_api_by_id(api_id)
+        latest = data_manager.get_stress_test_summaries(api_id, limit=1)['results']
+        latest_result_id = latest[0]['id'] if latest else 0
+        
+        # 有即時快照時直接使用，避免載入並解析整個 API 的歷史結果
+        snapshot = stress_tester.live_feed.get(api_id)
+        if snapshot:
+            statistics = snapshot['statistics']
+            return jsonify({
+                'is_running': is_running,
+                'latest_result_id': latest_result_id,
+                'api_name': snapshot.get('api_name', 'Unknown'),
+                'latest_result': {
+                    'total_requests': statistics['total_requests'],
+                    'successful_requests': statistics['successful_requests'],
+                    'failed_requests': statistics['failed_requests'],
+                    'success_rate': statistics['success_rate'],
+                    'avg_response_time': statistics['avg_response_time'],
+                    'min_response_time': statistics['min_response_time'],
+                    'max_response_time': statistics['max_response_time'],
+                    'requests_per_second': statistics['requests_per_second'],
+                    'request_count': statistics['total_requests'],
+                    'percentiles': statistics.get('percentiles', {}),
+                    'window': snapshot['window'],
+                    'last_5_requests': [
+                        {
+                            'request_number': statistics['total_requests'] - len(snapshot['recent_requests']) + i + 1,
+                            'success': req.get('success', False),
+                            'response_time': req.get('response_time', 0),
+                            'status_code': req.get('status_code'),
+                            'error': req.get('error'),
+                            'timestamp': req.get('timestamp', '')
+                        }
+                        for i, req in enumerate(snapshot['recent_requests'])
+                    ]
+                }
+            })
         
-        result = {
+        # 本 worker 沒有執行中的測試：前端只需要 latest_result_id 判斷是否完成，不載入歷史結果
+        api = data_manager.get_api_by_id(api_id)
+        return jsonify({
             'is_running': is_running,
+            'latest_result_id': latest_result_id,
             'api_name': api['name'] if api else 'Unknown'
-        }
-        
-        if api and api.get('stress_test', {}).get('results'):
-            latest_result = api['stress_test']['results'][-1]
-            result['latest_result'] = {
-                'total_requests': latest_result['statistics']['total_requests'],
-                'successful_requests': latest_result['statistics']['successful_requests'],
-                'failed_requests': latest_result['statistics']['failed_requests'],
-                'success_rate': latest_result['statistics']['success_rate'],
-                'avg_response_time': latest_result['statistics']['avg_response_time'],
-                'min_response_time': latest_result['statistics']['min_response_time'],
-                'max_response_time': latest_result['statistics']['max_response_time'],
-                'requests_per_second': latest_result['statistics']['requests_per_second'],
-                'start_time': latest_result['start_time'],
-                'end_time': latest_result.get('end_time'),
-                'request_count': len(latest_result['requests']),
-                'last_5_requests': [
-                    {
-                        'request_number': i + len(latest_result['requests']) - 4,
-                        'success': req.get('success', False),
-                        'response_time': req.get('response_time', 0),
-                        'status_code': req.get('status_code'),
-                        'error': req.get('error'),
-                        'timestamp': req.get('timestamp', '')
-                    }
-                    for i, req in enumerate(latest_result['requests'][-5:])
-                ] if len(latest_result['requests']) > 0 else []
-            }
-        
-        return jsonify(result)
+        })
     
     app.register_blueprint(stress_test_bp)
\ No newline at end of file
@@ -3,7 +3,54 @@ from apscheduler.triggers.interval import IntervalTrigger
 from api_checker import APIChecker
 from data_manager import DataManager
 from config import Config
+from datetime import datetime
+from typing import Dict, List, Optional
 import atexit
+import heapq
+import itertools
+import random
+import threading
+import time
+
+class DueQueue:
+    """以最小堆維護各 API 下一次到期時間的排程佇列"""
+    
+    def __init__(self):
+        self._heap = []  # (due_time, seq, api_id)
+        self._entries = {}  # api_id -> seq，用於惰性刪除過期的堆項目
+        self._counter = itertools.count()
+    
+    def schedule(self, api_id: str, due_time: float):
+        """排入（或重新排入）API 的到期時間"""
+        seq = next(self._counter)
+        self._entries[api_id] = seq
+        heapq.heappush(self._heap, (due_time, seq, api_id))
+    
+    def remove(self, api_id: str):
+        """移除 API，堆中的舊項目在彈出時略過"""
+        self._entries.pop(api_id, None)
+    
+    def pop_due(self, now: float) -> List[str]:
+        """彈出所有已到期的 API，成本只與到期數量相關"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, api_id = heapq.heappop(self._heap)
+            if self._entries.get(api_id) == seq:
+                del self._entries[api_id]
+                due.append(api_id)
+        return due
+    
+    def next_due(self) -> Optional[float]:
+        """取得最近的到期時間"""
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+    
+    def __contains__(self, api_id: str) -> bool:
+        return api_id in self._entries
+    
+    def __len__(self) -> int:
+        return len(self._entries)
 
 class APIScheduler:
     def __init__(self):
@@ -11,27 +58,104 @@ class APIScheduler:
         self.data_manager = DataManager(self.config.DATA_FILE)
         self.api_checker = APIChecker(self.data_manager)
         self.scheduler = BackgroundScheduler()
+        self.due_queue = DueQueue()
+        self.apis: Dict[str, Dict] = {}  # api_id -> 最近一次同步的 API 設定
+        self.in_flight = set()  # 正在檢查中的 API（不在佇列中）
+        self.lock = threading.Lock()
+        self.last_sync = 0.0
         self.setup_scheduler()
     
     def setup_scheduler(self):
         """設定排程器"""
-        # 每 60 秒檢查一次所有 API
+        # 每個 tick 只派發已到期的 API；多個 tick 可並行，避免慢速主機拖住其他檢查
         self.scheduler.add_job(
-            func=self.api_checker.check_all_apis,
-            trigger=IntervalTrigger(seconds=self.config.CHECK_INTERVAL),
+            func=self.dispatch_due,
+            trigger=IntervalTrigger(seconds=self.config.SCHEDULER_TICK_SECONDS),
             id='api_health_check',
             name='API 健康檢查',
+            max_instances=self.config.SCHEDULER_MAX_CONCURRENT_TICKS,
+            coalesce=True,
             replace_existing=True
         )
         
         # 註冊程式結束時停止排程器
         atexit.register(lambda: self.scheduler.shutdown())
     
+    def get_check_interval(self, api: Dict) -> int:
+        """取得 API 的檢查間隔（未設定時使用全域 CHECK_INTERVAL）"""
+        return api.get('check_interval_seconds') or self.config.CHECK_INTERVAL
+    
+    def _next_delay(self, interval: float) -> float:
+        """加入抖動的下一次檢查延遲，避免大量 API 在同一秒觸發"""
+        jitter = interval * self.config.CHECK_JITTER_RATIO
+        return max(1.0, interval + random.uniform(-jitter, jitter))
+    
+    def sync_apis(self):
+        """與資料庫同步 API 清單：新增、刪除及間隔變更"""
+        apis = self.data_manager.load_apis()
+        now = time.time()
+        
+        with self.lock:
+            current_ids = set()
+            for api in apis:
+                api_id = api['id']
+                current_ids.add(api_id)
+                previous = self.apis.get(api_id)
+                self.apis[api_id] = api
+                
+                if api_id in self.in_flight:
+                    continue
+                
+                interval = self.get_check_interval(api)
+                if previous is None or self.get_check_interval(previous) != interval:
+                    # 新 API 或間隔變更：在一個間隔內隨機分散首次檢查
+                    self.due_queue.schedule(api_id, now + random.uniform(0, interval))
+            
+            for api_id in list(self.apis):
+                if api_id not in current_ids:
+                    del self.apis[api_id]
+                    self.due_queue.remove(api_id)
+            
+            self.last_sync = now
+    
+    def dispatch_due(self):
+        """派發已到期的 API 檢查"""
+        # 由單一 tick 認領同步工作，避免並行 tick 重複讀取資料庫
+        with self.lock:
+            now = time.time()
+            needs_sync = now - self.last_sync >= self.config.SCHEDULER_SYNC_SECONDS
+            if needs_sync:
+                self.last_sync = now
+        if needs_sync:
+            self.sync_apis()
+        
+        with self.lock:
+            due_ids = self.due_queue.pop_due(time.time())
+            due_apis = [self.apis[api_id] for api_id in due_ids if api_id in self.apis]
+            self.in_flight.update(api['id'] for api in due_apis)
+        
+        if not due_apis:
+            return
+        
+        try:
+            self.api_checker.check_apis(due_apis)
+        finally:
+            now = time.time()
+            with self.lock:
+                for api in due_apis:
+                    self.in_flight.discard(api['id'])
+                    # 檢查期間被刪除的 API 不再排程
+                    current = self.apis.get(api['id'])
+                    if current is not None:
+                        delay = self._next_delay(self.get_check_interval(current))
+                        self.due_queue.schedule(api['id'], now + delay)
+    
     def start(self):
         """啟動排程器"""
         if not self.scheduler.running:
+            self.sync_apis()
             self.scheduler.start()
-            print(f"排程器已啟動，每 {self.config.CHECK_INTERVAL} 秒檢查一次 API")
+            print(f"排程器已啟動，共 {len(self.apis)} 個 API，預設每 {self.config.CHECK_INTERVAL} 秒檢查一次")
     
     def stop(self):
         """停止排程器"""
@@ -45,8 +169,17 @@ class APIScheduler:
     
     def get_scheduler_status(self):
         """取得排程器狀態"""
+        with self.lock:
+            next_due = self.due_queue.next_due()
+            queue_status = {
+                'scheduled_apis': len(self.due_queue),
+                'in_flight': len(self.in_flight),
+                'next_due': datetime.fromtimestamp(next_due).isoformat() if next_due else None
+            }
+        
         return {
             'running': self.scheduler.running,
+            'queue': queue_status,
             'jobs': [
                 {
                     'id': job.id,
@@ -55,4 +188,4 @@ class APIScheduler:
                 }
                 for job in self.scheduler.get_jobs()
             ]
-        }
\ No newline at end of file
+        }
@@ -100,7 +100,14 @@ restore_database() {
         
         # 備份當前資料庫（如果存在）
         if [[ -f "$DATA_PATH/api_monitor.db" ]]; then
-            sudo mv "$DATA_PATH/api_monitor.db" "$DATA_PATH/api_monitor.db.backup.$(date +%s)"
+            BACKUP_SUFFIX="backup.$(date +%s)"
+            sudo mv "$DATA_PATH/api_monitor.db" "$DATA_PATH/api_monitor.db.$BACKUP_SUFFIX"
+            # WAL 模式的日誌檔屬於舊資料庫，不能留給恢復後的資料庫
+            for suffix in -wal -shm; do
+                if [[ -f "$DATA_PATH/api_monitor.db$suffix" ]]; then
+                    sudo mv "$DATA_PATH/api_monitor.db$suffix" "$DATA_PATH/api_monitor.db.$BACKUP_SUFFIX$suffix"
+                fi
+            done
             log "當前資料庫已備份"
         fi
         
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+SQLite 設定檔效能比較
+以多個行程（模擬多個 gunicorn worker，各自持有連線）同時對同一個資料庫讀寫，
+比較 safe（rollback journal + synchronous=FULL）與 performance（WAL + synchronous=NORMAL）
+的讀寫吞吐量、延遲與 SQLITE_BUSY 錯誤數
+
+用法：python scripts/sqlite_benchmark.py --workers 4 --duration 10 --write-ratio 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_TEST_CASES = 5000
+
+def load_database_manager(work_dir: str):
+    """在暫存目錄中匯入 DatabaseManager（模組層級的 db_manager 會建立在該目錄下），不輸出 SQL 日誌"""
+    os.chdir(work_dir)
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    logging.disable(logging.INFO)
+    with contextlib.redirect_stdout(io.StringIO()):
+        from database.db_manager import DatabaseManager
+    return DatabaseManager
+
+def percentile(values, ratio):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * ratio), len(values) - 1)]
+
+def run_worker(work_dir, db_path, profile, duration, write_ratio, seed, result_queue):
+    """工作行程：在 duration 秒內隨機讀寫，回傳各操作的延遲（毫秒）與錯誤數"""
+    DatabaseManager = load_database_manager(work_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = DatabaseManager(db_path, profile=profile)
+    rng = random.Random(seed)
+    latencies = {'read': [], 'write': []}
+    errors = 0
+    
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        case_id = rng.randint(1, SEED_TEST_CASES)
+        started = time.perf_counter()
+        try:
+            if rng.random() < write_ratio:
+                manager.execute_update(
+                    "UPDATE test_cases SET actual_hours = actual_hours + 1 WHERE id = ?", (case_id,)
+                )
+                kind = 'write'
+            else:
+                manager.execute_query("""
+                    SELECT id, tc_id, title, status, priority
+                    FROM test_cases
+                    WHERE id >= ? ORDER BY id LIMIT 20
+                """, (case_id,))
+                kind = 'read'
+        except Exception:
+            errors += 1
+            continue
+        latencies[kind].append((time.perf_counter() - started) * 1000)
+    
+    result_queue.put({'latencies': latencies, 'errors': errors, 'busy_retries': manager.busy_retry_count})
+
+def benchmark_profile(profile, workers, duration, write_ratio):
+    """以指定設定檔執行一輪測試並返回彙總結果"""
+    work_dir = tempfile.mkdtemp(prefix='sqlite_benchmark_')
+    DatabaseManager = load_database_manager(work_dir)
+    db_path = os.path.join(work_dir, 'benchmark.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = DatabaseManager(db_path, profile=profile)
+    manager.execute_many(
+        "INSERT INTO test_cases (tc_id, title, description) VALUES (?, ?, ?)",
+        [(f"TC{i:05d}", f"測試案例 {i}", "功能描述: 效能測試資料") for i in range(1, SEED_TEST_CASES + 1)]
+    )
+    report = manager.get_pragma_report()
+    manager.close_all_connections()
+    
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    processes = [
+        context.Process(target=run_worker,
+                        args=(work_dir, db_path, profile, duration, write_ratio, index, result_queue))
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    results = [result_queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    os.chdir(PROJECT_ROOT)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    
+    reads = [value for result in results for value in result['latencies']['read']]
+    writes = [value for result in results for value in result['latencies']['write']]
+    return {
+        'profile': profile,
+        'journal_mode': report['journal_mode'],
+        'synchronous': report['synchronous'],
+        'reads_per_second': len(reads) / duration,
+        'writes_per_second': len(writes) / duration,
+        'read_p50': percentile(reads, 0.5),
+        'read_p99': percentile(reads, 0.99),
+        'write_p50': percentile(writes, 0.5),
+        'write_p99': percentile(writes, 0.99),
+        'errors': sum(result['errors'] for result in results),
+        'busy_retries': sum(result['busy_retries'] for result in results)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 設定檔效能比較')
+    parser.add_argument('--workers', type=int, default=4, help='同時讀寫的行程數')
+    parser.add_argument('--duration', type=float, default=10.0, help='每個設定檔的測試秒數')
+    parser.add_argument('--write-ratio', type=float, default=0.2, help='寫入操作的比例（0~1）')
+    parser.add_argument('--profiles', default='safe,performance', help='要比較的設定檔（逗號分隔）')
+    args = parser.parse_args()
+    
+    print(f"🚀 {args.workers} 個行程，每個設定檔 {args.duration:g} 秒，寫入比例 {args.write_ratio:.0%}")
+    header = f"{'設定檔':<12}{'journal':>9}{'sync':>6}{'讀取/秒':>10}{'寫入/秒':>10}" \
+             f"{'讀 p50':>9}{'讀 p99':>9}{'寫 p50':>9}{'寫 p99':>9}{'錯誤':>6}{'重試':>6}"
+    print(header)
+    for profile in args.profiles.split(','):
+        result = benchmark_profile(profile.strip(), args.workers, args.duration, args.write_ratio)
+        print(f"{result['profile']:<12}{result['journal_mode']:>9}{result['synchronous']:>6}"
+              f"{result['reads_per_second']:>10.0f}{result['writes_per_second']:>10.0f}"
+              f"{result['read_p50']:>9.2f}{result['read_p99']:>9.2f}"
+              f"{result['write_p50']:>9.2f}{result['write_p99']:>9.2f}"
+              f"{result['errors']:>6}{result['busy_retries']:>6}")
+    print("（延遲單位為毫秒）")
+
+if __name__ == "__main__":
+    main()
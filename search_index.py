@@ -0,0 +1,204 @@
+"""
+測試案例與操作記錄的全文檢索
+使用 FTS5 trigram 索引（由 database/search_schema.sql 的觸發器同步），依 bm25 排序並產生摘要；
+SQLite 不支援 FTS5 或關鍵字短於 3 個字元（trigram 無法索引）時改用 LIKE 搜尋
+"""
+import html
+import re
+from typing import Dict, List, Optional
+from database.db_manager import db_manager
+
+# 摘要中標記命中位置的控制字元，輸出前轉為 <mark>（其餘內容先做 HTML 跳脫）
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+TRIGRAM_MIN_LENGTH = 3
+SNIPPET_TOKENS = 16        # FTS5 摘要的字數
+SNIPPET_CONTEXT_CHARS = 30  # LIKE 搜尋時命中位置前後保留的字元數
+MAX_TERMS = 8
+
+def parse_terms(query: str) -> List[str]:
+    """以空白切分關鍵字（所有關鍵字都必須命中）"""
+    return (query or '').split()[:MAX_TERMS]
+
+def match_expression(terms: List[str]) -> Optional[str]:
+    """組出 FTS5 MATCH 運算式，每個關鍵字視為片語；有關鍵字短於 trigram 長度時返回 None"""
+    if not terms or any(len(term) < TRIGRAM_MIN_LENGTH for term in terms):
+        return None
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def render_snippet(snippet: Optional[str]) -> str:
+    """HTML 跳脫摘要並將命中標記轉為 <mark>"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+def make_snippet(texts: List[Optional[str]], terms: List[str]) -> str:
+    """LIKE 搜尋時在第一個命中的欄位擷取摘要並標記所有關鍵字"""
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    for text in texts:
+        match = pattern.search(text or '') if terms else None
+        if not match:
+            continue
+        start = max(match.start() - SNIPPET_CONTEXT_CHARS, 0)
+        end = min(match.end() + SNIPPET_CONTEXT_CHARS, len(text))
+        excerpt = pattern.sub(lambda m: MARK_START + m.group(0) + MARK_END, text[start:end])
+        return ('…' if start > 0 else '') + excerpt + ('…' if end < len(text) else '')
+    return ''
+
+def like_conditions(columns: List[str], terms: List[str]):
+    """每個關鍵字需命中任一欄位的 LIKE 條件，返回 (條件列表, 參數列表)"""
+    conditions = []
+    params = []
+    for term in terms:
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append('(' + ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in columns) + ')')
+        params.extend([pattern] * len(columns))
+    return conditions, params
+
+class SearchIndex:
+    """全文檢索查詢（索引內容由資料庫觸發器維護，這裡只負責查詢）"""
+    
+    # 欄位權重：標題命中比描述、驗收條件重要
+    TEST_CASE_WEIGHTS = (10.0, 3.0, 1.0)
+    AUDIT_LOG_WEIGHTS = (5.0, 1.0, 1.0)
+    
+    def search_test_cases(self, query: str, limit: int = 20, offset: int = 0, project_id: int = None,
+                          status: str = None) -> Dict:
+        """搜尋測試案例標題、描述與驗收條件，返回 {'engine', 'results', 'total'}"""
+        terms = parse_terms(query)
+        if not terms:
+            return {'engine': None, 'results': [], 'total': 0}
+        
+        where_conditions = []
+        params: List = []
+        if project_id is not None:
+            where_conditions.append("tc.test_project_id = ?")
+            params.append(project_id)
+        if status:
+            where_conditions.append("tc.status = ?")
+            params.append(status)
+        
+        expression = match_expression(terms) if db_manager.fts_enabled else None
+        if expression:
+            weights = ', '.join(str(weight) for weight in self.TEST_CASE_WEIGHTS)
+            where_clause = ' AND '.join(['test_cases_fts MATCH ?'] + where_conditions)
+            from_clause = """
+                FROM test_cases_fts
+                JOIN test_cases tc ON tc.id = test_cases_fts.rowid
+            """
+            results = db_manager.execute_query(f"""
+                SELECT tc.id, tc.tc_id, tc.title, tc.status, tc.priority, tc.test_project_id,
+                       snippet(test_cases_fts, -1, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet,
+                       bm25(test_cases_fts, {weights}) AS rank
+                {from_clause}
+                WHERE {where_clause}
+                ORDER BY rank, tc.id
+                LIMIT ? OFFSET ?
+            """, tuple([expression] + params + [limit, offset]))
+            count_params = [expression] + params
+            engine = 'fts'
+        else:
+            conditions, like_params = like_conditions(
+                ['tc.title', 'tc.description', 'tc.acceptance_criteria'], terms
+            )
+            from_clause = "FROM test_cases tc"
+            where_clause = ' AND '.join(conditions + where_conditions)
+            results = db_manager.execute_query(f"""
+                SELECT tc.id, tc.tc_id, tc.title, tc.status, tc.priority, tc.test_project_id,
+                       tc.description, tc.acceptance_criteria
+                {from_clause}
+                WHERE {where_clause}
+                ORDER BY tc.tc_id
+                LIMIT ? OFFSET ?
+            """, tuple(like_params + params + [limit, offset]))
+            count_params = like_params + params
+            for result in results:
+                result['snippet'] = make_snippet(
+                    [result.pop('description'), result.pop('acceptance_criteria'), result['title']], terms
+                )
+            engine = 'like'
+        
+        for result in results:
+            result['snippet'] = render_snippet(result['snippet'])
+            result['score'] = -result.pop('rank') if 'rank' in result else None
+        total = self._count(from_clause, where_clause, count_params, offset, limit, len(results))
+        return {'engine': engine, 'results': results, 'total': total}
+    
+    def search_audit_logs(self, query: str, limit: int = 50, offset: int = 0, **filters) -> Dict:
+        """
+        搜尋操作記錄的資源名稱與變更內容（僅限尚未封存的記錄），返回 {'engine', 'results', 'total'}
+        filters 與 AuditLogger.get_audit_logs 相同（user_id、username、action、resource_type、日期）
+        """
+        from audit_logger import AuditLogger
+        from audit_writer import audit_writer
+        
+        terms = parse_terms(query)
+        if not terms:
+            return {'engine': None, 'results': [], 'total': 0}
+        
+        audit_writer.flush(AuditLogger.READ_FLUSH_TIMEOUT)
+        where_conditions, params = AuditLogger._build_filters(**filters)
+        where_conditions = [f"al.{condition}" for condition in where_conditions]
+        columns = """
+            al.id, al.user_id, al.username, al.action, al.resource_type, al.resource_id,
+            al.resource_name, al.ip_address, al.created_at,
+            (al.old_values IS NOT NULL OR al.new_values IS NOT NULL) AS has_changes
+        """
+        
+        expression = match_expression(terms) if db_manager.fts_enabled else None
+        if expression:
+            weights = ', '.join(str(weight) for weight in self.AUDIT_LOG_WEIGHTS)
+            where_clause = ' AND '.join(['audit_logs_fts MATCH ?'] + where_conditions)
+            from_clause = """
+                FROM audit_logs_fts
+                JOIN audit_logs al ON al.id = audit_logs_fts.rowid
+            """
+            results = db_manager.execute_query(f"""
+                SELECT {columns},
+                       snippet(audit_logs_fts, -1, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet,
+                       bm25(audit_logs_fts, {weights}) AS rank
+                {from_clause}
+                WHERE {where_clause}
+                ORDER BY rank, al.id DESC
+                LIMIT ? OFFSET ?
+            """, tuple([expression] + params + [limit, offset]))
+            count_params = [expression] + params
+            engine = 'fts'
+        else:
+            conditions, like_params = like_conditions(
+                ['al.resource_name', 'al.old_values', 'al.new_values'], terms
+            )
+            from_clause = "FROM audit_logs al"
+            where_clause = ' AND '.join(conditions + where_conditions)
+            results = db_manager.execute_query(f"""
+                SELECT {columns}, al.old_values, al.new_values
+                {from_clause}
+                WHERE {where_clause}
+                ORDER BY al.created_at DESC, al.id DESC
+                LIMIT ? OFFSET ?
+            """, tuple(like_params + params + [limit, offset]))
+            count_params = like_params + params
+            for result in results:
+                result['snippet'] = make_snippet(
+                    [result['resource_name'], result.pop('new_values'), result.pop('old_values')], terms
+                )
+            engine = 'like'
+        
+        for result in results:
+            result['snippet'] = render_snippet(result['snippet'])
+            result['score'] = -result.pop('rank') if 'rank' in result else None
+        total = self._count(from_clause, where_clause, count_params, offset, limit, len(results))
+        return {'engine': engine, 'results': results, 'total': total}
+    
+    @staticmethod
+    def _count(from_clause: str, where_clause: str, params: List, offset: int, limit: int,
+               fetched: int) -> int:
+        """符合條件的總筆數；這一頁未滿時可直接推算，不必再查一次"""
+        if fetched < limit and (fetched or not offset):
+            return offset + fetched
+        rows = db_manager.execute_query(
+            f"SELECT COUNT(*) AS total {from_clause} WHERE {where_clause}", tuple(params)
+        )
+        return rows[0]['total'] if rows else 0
+
+search_index = SearchIndex()
@@ -3,12 +3,14 @@ import time
 import json
 from typing import Tuple, Dict, Any
 from config import Config
+from services.http_client import get_http_client
 
 class APIRequestHandler:
     """API 請求處理器"""
     
     def __init__(self):
         self.config = Config()
+        self.http_client = get_http_client()
     
     def make_request(self, api: Dict) -> Tuple[str, float, str, str]:
         """
@@ -52,16 +54,16 @@ class APIRequestHandler:
         timeout = self.config.REQUEST_TIMEOUT
         
         if method == 'GET':
-            return requests.get(url, timeout=timeout, headers=headers)
+            return self.http_client.get(url, timeout=timeout, headers=headers)
         
         elif method == 'POST':
             return self._send_post_request(api, headers)
         
         elif method == 'PUT':
-            return requests.put(url, timeout=timeout, headers=headers)
+            return self.http_client.put(url, timeout=timeout, headers=headers)
         
         elif method == 'DELETE':
-            return requests.delete(url, timeout=timeout, headers=headers)
+            return self.http_client.delete(url, timeout=timeout, headers=headers)
         
         else:
             raise ValueError(f"不支援的 HTTP 方法: {method}")
@@ -77,10 +79,10 @@ class APIRequestHandler:
             payload = self._parse_request_body(api['request_body'])
             if isinstance(payload, str):
                 # 如果是字符串，使用 data 參數
-                return requests.post(url, data=payload, timeout=timeout, headers=headers)
+                return self.http_client.post(url, data=payload, timeout=timeout, headers=headers)
             else:
                 # 如果是字典，使用 json 參數
-                return requests.post(url, json=payload, timeout=timeout, headers=headers)
+                return self.http_client.post(url, json=payload, timeout=timeout, headers=headers)
         
         # 特殊的 API 處理
         elif 'ionex' in url.lower() and 'boundingBox' in url:
@@ -88,7 +90,7 @@ class APIRequestHandler:
         else:
             payload = self._create_default_payload()
         
-        return requests.post(url, json=payload, timeout=timeout, headers=headers)
+        return self.http_client.post(url, json=payload, timeout=timeout, headers=headers)
     
     def _parse_request_body(self, request_body: str) -> Any:
         """解析請求主體"""
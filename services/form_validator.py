@@ -1,5 +1,6 @@
 import json
 from typing import Tuple, List, Dict, Optional
+from load_profiles import LOAD_PROFILES
 
 class FormValidator:
     """表單驗證器"""
@@ -65,6 +66,27 @@ class FormValidator:
         except (ValueError, TypeError):
             errors.append('請求間隔必須是有效的數字')
         
+        # 健康檢查間隔驗證（未填寫時使用全域設定）
+        check_interval_seconds = form_data.get('check_interval_seconds')
+        if check_interval_seconds is not None:
+            try:
+                if not (10 <= check_interval_seconds <= 86400):
+                    errors.append('健康檢查間隔必須在 10-86400 秒之間')
+            except (ValueError, TypeError):
+                errors.append('健康檢查間隔必須是有效的數字')
+        
+        # 開放模型參數驗證（未填寫目標 RPS 時使用封閉模型）
+        target_rps = form_data.get('target_rps')
+        if target_rps is not None:
+            try:
+                if not (0.1 <= target_rps <= 10000):
+                    errors.append('目標 RPS 必須在 0.1-10000 之間')
+            except (ValueError, TypeError):
+                errors.append('目標 RPS 必須是有效的數字')
+        
+        if form_data.get('load_profile', 'constant') not in LOAD_PROFILES:
+            errors.append('無效的負載曲線')
+        
         return len(errors) == 0, errors
     
     def validate_user_form(self, form_data: Dict, user_manager, exclude_user_id: Optional[str] = None) -> Tuple[bool, List[str]]:
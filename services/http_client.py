@@ -0,0 +1,194 @@
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import config as config_module
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+class ConnectionStats:
+    """連線重用統計（執行緒安全）"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+    
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+    
+    def record_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+    
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'reused_connections': max(0, self.requests - self.new_connections)
+            }
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """會記錄新建連線與請求次數的連線池 Adapter"""
+    
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+        
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                stats.record_new_connection()
+                return super()._new_conn()
+        
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                stats.record_new_connection()
+                return super()._new_conn()
+        
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+    
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+class HTTPClient:
+    """
+    共用的 keep-alive HTTP 客戶端
+    
+    所有執行緒共用同一個連線池（每個主機最多 pool_maxsize 條連線），
+    每個執行緒使用各自的 Session，不保存 Cookie，行為與 requests.request 相同。
+    啟用 HTTP/2 時改用 httpx（需安裝 httpx[http2]），否則退回 requests。
+    """
+    
+    def __init__(self, pool_connections: int = None, pool_maxsize: int = None,
+                 http2: bool = None):
+        self.pool_connections = pool_connections or getattr(config_module, 'HTTP_POOL_CONNECTIONS', 100)
+        self.pool_maxsize = pool_maxsize or getattr(config_module, 'HTTP_POOL_MAXSIZE', 10)
+        self.stats = ConnectionStats()
+        self.adapter = PooledHTTPAdapter(
+            self.stats,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+        self._local = threading.local()
+        
+        if http2 is None:
+            http2 = getattr(config_module, 'HTTP_ENABLE_HTTP2', False)
+        self._httpx_client = self._create_httpx_client() if http2 else None
+    
+    def _create_httpx_client(self):
+        """建立 HTTP/2 客戶端，缺少 httpx 或 h2 時返回 None"""
+        if httpx is None:
+            return None
+        try:
+            return httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.pool_connections * self.pool_maxsize,
+                    max_keepalive_connections=self.pool_connections * self.pool_maxsize
+                )
+            )
+        except ImportError:
+            return None
+    
+    @property
+    def backend(self) -> str:
+        return 'httpx-http2' if self._httpx_client is not None else 'requests'
+    
+    def get_session(self) -> requests.Session:
+        """取得目前執行緒的 Session（共用同一個連線池）"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+        return session
+    
+    def request(self, method: str, url: str, **kwargs):
+        """
+        發送 HTTP 請求
+        參數與 requests.request 相同；使用 HTTP/2 時例外會轉換為 requests 的例外類型
+        """
+        if self._httpx_client is not None:
+            return self._httpx_request(method, url, **kwargs)
+        return self.get_session().request(method=method, url=url, **kwargs)
+    
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+    
+    def put(self, url: str, **kwargs):
+        return self.request('PUT', url, **kwargs)
+    
+    def delete(self, url: str, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+    
+    def _httpx_request(self, method: str, url: str, data=None, json=None, headers=None,
+                       timeout=None, **kwargs):
+        """透過 httpx 發送請求"""
+        content = None
+        if isinstance(data, (str, bytes)):
+            content, data = data or None, None
+        
+        def trace(event_name, info):
+            if event_name == 'connection.connect_tcp.complete':
+                self.stats.record_new_connection()
+        
+        self.stats.record_request()
+        try:
+            return self._httpx_client.request(
+                method, url,
+                content=content,
+                data=data,
+                json=json,
+                headers=headers,
+                timeout=timeout,
+                extensions={'trace': trace}
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e))
+    
+    def get_stats(self) -> Dict:
+        """取得連線池設定與連線重用統計"""
+        stats = self.stats.to_dict()
+        stats.update({
+            'backend': self.backend,
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize
+        })
+        return stats
+
+_http_client: Optional[HTTPClient] = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> HTTPClient:
+    """取得全域共用的 HTTP 客戶端"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = HTTPClient()
+    return _http_client
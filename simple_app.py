@@ -7,6 +7,7 @@ from user_story_manager import UserStoryManager
 from test_case_app import create_test_case_routes
 from test_case_manager import TestCaseManager
 from config import Config
+from services.http_client import get_http_client
 
 # 導入路由模組
 from routes.auth_routes import register_auth_routes, create_auth_decorators
@@ -16,7 +17,18 @@ from routes.stress_test_routes import register_stress_test_routes
 from routes.user_management_routes import register_user_management_routes
 from routes.audit_routes import register_audit_routes
 
+import logging
 import os
+import sys
+
+# 應用程式層級的日誌設定（各模組只取得自己的 logger，不自行設定層級）
+logging.basicConfig(
+    level=getattr(logging, Config.LOG_LEVEL, logging.INFO),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
 
 def create_app():
     """應用程式工廠函數"""
@@ -75,6 +87,7 @@ def create_app():
                 'timestamp': datetime.now().isoformat(),
                 'database': 'accessible' if db_accessible else 'inaccessible',
                 'user_manager': 'ok' if user_manager_ok else 'error',
+                'http_pool': get_http_client().get_stats(),
                 'version': '1.0.0'
             }
             
@@ -89,8 +102,9 @@ def create_app():
     
     return app
 
-# 建立應用程式實例
-app = create_app()
+# 建立應用程式實例（壓力測試的 spawn 工作行程會以 __mp_main__ 重新執行本檔，不需要建立應用程式）
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     import os
@@ -0,0 +1,224 @@
+"""
+API 狀態快照
+在記憶體中保存 API 清單、健康統計與預先序列化的 /api/status 回應；
+檢查器寫入狀態時直接套用到快照並遞增版本，API 新增、修改、刪除時標記為過期，
+讀取端不需查詢 SQLite。其他 worker 行程的修改由 max_age 到期後重新載入反映。
+增量查詢以資料庫的變更版本（apis.change_version 與 api_deletions 墓碑）為準，各 worker 一致
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import config as config_module
+
+STATUS_KEYS = ('healthy', 'unhealthy', 'unknown')
+
+# 增量回應中每個 API 的欄位（不含 last_response 與壓力測試資料）
+DELTA_FIELDS = (
+    'id', 'name', 'url', 'type', 'method', 'status', 'response_time',
+    'last_check', 'error_count', 'last_error', 'change_version'
+)
+
+def latency_thresholds() -> Tuple[float, float]:
+    """延遲變更門檻：(相對比例, 最小秒數)"""
+    return (getattr(config_module, 'STATUS_LATENCY_CHANGE_RATIO', 0.2),
+            getattr(config_module, 'STATUS_LATENCY_CHANGE_MIN', 0.05))
+
+def latency_changed(old: Optional[float], new: Optional[float]) -> bool:
+    """
+    延遲是否有明顯變化：|新 - 舊| 超過 max(|舊| × 比例, 最小秒數)
+    與 DataManager.STATUS_UPDATE_QUERY 的 SQL 條件一致
+    """
+    if old is None or new is None:
+        return (old is None) != (new is None)
+    ratio, minimum = latency_thresholds()
+    return abs(new - old) > max(abs(old) * ratio, minimum)
+
+class Snapshot:
+    """一個版本的狀態快照（不可修改）"""
+    
+    __slots__ = ('version', 'apis', 'stats', 'body', 'etag', 'loaded_at', 'change_version', 'deletions')
+    
+    def __init__(self, version: int, apis: List[Dict], stats: Dict, body: bytes, etag: str, loaded_at: float,
+                 change_version: int = 0, deletions: Dict[str, int] = None):
+        self.version = version
+        self.apis = apis
+        self.stats = stats
+        self.body = body
+        self.etag = etag
+        self.loaded_at = loaded_at
+        self.change_version = change_version  # 資料庫的變更版本
+        self.deletions = deletions or {}      # 已刪除的 API：{api_id: 變更版本}
+
+def compute_stats(apis: List[Dict]) -> Dict[str, int]:
+    """單次走訪計算各狀態的數量"""
+    counts = Counter(api.get('status') for api in apis)
+    stats = {'total': len(apis)}
+    stats.update({status: counts.get(status, 0) for status in STATUS_KEYS})
+    return stats
+
+class StatusSnapshot:
+    """版本化的 API 狀態快照"""
+    
+    def __init__(self, max_age: float = None):
+        self.max_age = max_age if max_age is not None else getattr(config_module, 'STATUS_SNAPSHOT_MAX_AGE', 10)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._changed = threading.Condition()  # 發布新的變更版本時通知推送串流
+        self._snapshot: Optional[Snapshot] = None
+        self._stale = True
+        self._version = 0
+        
+        # 計數器
+        self.hits = 0
+        self.reloads = 0
+        self.updates = 0
+    
+    def get(self, refresh: bool = False) -> Snapshot:
+        """目前的快照；過期、超過 max_age 或 refresh=True 時自資料庫重新載入"""
+        snapshot = self._snapshot
+        if not refresh and self._is_fresh(snapshot):
+            self.hits += 1
+            return snapshot
+        
+        with self._load_lock:
+            # 等待期間其他請求可能已重新載入
+            current = self._snapshot
+            if self._is_fresh(current) and (not refresh or current is not snapshot):
+                self.hits += 1
+                return current
+            from data_manager import DataManager
+            data_manager = DataManager()
+            with self._lock:
+                self._stale = False
+            try:
+                # 先讀變更版本再讀清單：清單只可能比版本新，前端最多重複收到變更，不會漏掉
+                change_version = data_manager.get_change_version()
+                apis = data_manager.load_apis()
+                deletions = data_manager.get_deletions()
+            except Exception:
+                self.invalidate()
+                raise
+            self.reloads += 1
+            return self._publish(apis, change_version=change_version, deletions=deletions)
+    
+    def get_delta(self, since: int) -> Dict:
+        """
+        since 版本之後狀態、延遲或錯誤有變的 API 與已刪除的 API
+        since 比目前版本新時先重新載入（可能是其他 worker 的版本）；仍然較新（例如資料庫被重建）時返回完整清單（full=True）
+        """
+        snapshot = self.get()
+        if since > snapshot.change_version:
+            snapshot = self.get(refresh=True)
+        full = since <= 0 or since > snapshot.change_version
+        return {
+            'version': snapshot.change_version,
+            'since': since,
+            'full': full,
+            'changed': [
+                {field: api.get(field) for field in DELTA_FIELDS}
+                for api in snapshot.apis
+                if full or (api.get('change_version') or 0) > since
+            ],
+            'deleted': [] if full else [
+                api_id for api_id, version in snapshot.deletions.items() if version > since
+            ],
+            'stats': snapshot.stats
+        }
+    
+    def wait_for_change(self, since: int, timeout: float) -> Snapshot:
+        """
+        等待本行程發布超過 since 的變更版本或逾時，返回目前的快照
+        （其他 worker 的變更要等快照超過 max_age 重新載入後才看得到）
+        """
+        with self._changed:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.change_version <= since:
+                self._changed.wait(timeout)
+        return self.get()
+    
+    def invalidate(self):
+        """API 清單或設定改變，下次讀取時重新載入"""
+        with self._lock:
+            self._stale = True
+    
+    def apply_status_updates(self, results: List[Dict], checked_at: str, change_version: int):
+        """
+        套用檢查結果（與 DataManager.update_api_statuses 寫入資料庫的欄位與變更版本一致）
+        快照尚未載入、有未知的 API 或中間缺了其他 worker 的版本時改為標記過期
+        """
+        # 與重新載入互斥，避免載入中的舊資料覆蓋剛套用的結果
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is None or self._stale:
+                return
+            if change_version != snapshot.change_version + 1:
+                self.invalidate()
+                return
+            known_ids = {api['id'] for api in snapshot.apis}
+            if any(result['id'] not in known_ids for result in results):
+                self.invalidate()
+                return
+            
+            apis = [dict(api) for api in snapshot.apis]
+            by_id = {api['id']: api for api in apis}
+            for result in results:
+                api = by_id[result['id']]
+                unhealthy = result['status'] == 'unhealthy'
+                last_error = result.get('error_msg') if unhealthy else None
+                response_time = result.get('response_time', 0)
+                if (api.get('status') != result['status'] or api.get('last_error') != last_error
+                        or latency_changed(api.get('response_time'), response_time)):
+                    # 只有變更時才更新延遲，保存的是上次發布的值，緩慢漂移累積到門檻時仍會發布
+                    api['change_version'] = change_version
+                    api['response_time'] = response_time
+                api.update({
+                    'status': result['status'],
+                    'last_check': checked_at,
+                    'last_response': result.get('response_data'),
+                    'error_count': (api.get('error_count') or 0) + 1 if unhealthy else 0,
+                    'last_error': last_error
+                })
+            self.updates += 1
+            self._publish(apis, loaded_at=snapshot.loaded_at, change_version=change_version,
+                          deletions=snapshot.deletions)
+    
+    def get_stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else 0,
+            'change_version': snapshot.change_version if snapshot else 0,
+            'etag': snapshot.etag if snapshot else None,
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'updates': self.updates,
+            'max_age_seconds': self.max_age
+        }
+    
+    def _is_fresh(self, snapshot: Optional[Snapshot]) -> bool:
+        return snapshot is not None and not self._stale and time.monotonic() - snapshot.loaded_at < self.max_age
+    
+    def _publish(self, apis: List[Dict], loaded_at: float = None, change_version: int = 0,
+                 deletions: Dict[str, int] = None) -> Snapshot:
+        """序列化並發布新快照；內容未變時沿用原版本與 ETag（ETag 只取決於內容，各 worker 一致）"""
+        stats = compute_stats(apis)
+        body = json.dumps({'apis': apis, 'stats': stats}, ensure_ascii=False, default=str).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()[:16]
+        loaded_at = loaded_at if loaded_at is not None else time.monotonic()
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.etag == etag:
+                snapshot = Snapshot(current.version, current.apis, current.stats, current.body,
+                                    current.etag, loaded_at, change_version, deletions)
+            else:
+                self._version += 1
+                snapshot = Snapshot(self._version, apis, stats, body, etag, loaded_at, change_version, deletions)
+            self._snapshot = snapshot
+        if current is None or change_version != current.change_version:
+            with self._changed:
+                self._changed.notify_all()
+        return snapshot
+
+status_snapshot = StatusSnapshot()
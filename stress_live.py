@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Dict, Optional
+from stress_stats import StressStatsAggregator
+
+class LiveStressFeed:
+    """
+    壓力測試的即時快照（僅存於記憶體）
+    執行中的測試定期發布累計統計與最近一個時間窗的統計，
+    SSE 連線以 wait_for_update 等待新快照，不需查詢資料庫
+    """
+    
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.snapshots: Dict[str, Dict] = {}
+        self.previous: Dict[str, Dict] = {}  # 上一次發布時的 to_dict()，用於計算時間窗統計
+        self.info: Dict[str, Dict] = {}  # 每份快照都附帶的測試資訊（API 名稱、配置）
+        self.seq = 0
+    
+    def publish(self, api_id: str, aggregator: StressStatsAggregator, start_time: float,
+                status: str = 'running', extra: Dict = None):
+        """發布一份快照（status 為 running、completed、stopped 或 failed）"""
+        now = time.time()
+        previous = self.previous.get(api_id)
+        window_seconds = now - (previous['published_at'] if previous else start_time)
+        window = aggregator.get_window_statistics(previous and previous['state'], window_seconds)
+        
+        snapshot = dict(self.info.get(api_id, {}))
+        snapshot.update({
+            'api_id': api_id,
+            'status': status,
+            'elapsed': now - start_time,
+            'published_at': now,
+            'statistics': aggregator.get_statistics(now - start_time),
+            'window': window,
+            'recent_requests': aggregator.get_recent()
+        })
+        if extra:
+            snapshot.update(extra)
+        
+        with self.condition:
+            self.seq += 1
+            snapshot['seq'] = self.seq
+            self.snapshots[api_id] = snapshot
+            if status == 'running':
+                self.previous[api_id] = {'published_at': now, 'state': aggregator.to_dict()}
+            else:
+                self.previous.pop(api_id, None)
+            self.condition.notify_all()
+    
+    def get(self, api_id: str) -> Optional[Dict]:
+        """取得最新快照"""
+        with self.condition:
+            return self.snapshots.get(api_id)
+    
+    def wait_for_update(self, api_id: str, after_seq: int, timeout: float) -> Optional[Dict]:
+        """等待序號大於 after_seq 的快照，逾時返回 None"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                snapshot = self.snapshots.get(api_id)
+                if snapshot and snapshot['seq'] > after_seq:
+                    return snapshot
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+    
+    def start(self, api_id: str, **info):
+        """開始新測試：清除舊快照並記錄測試資訊"""
+        with self.condition:
+            self.snapshots.pop(api_id, None)
+            self.previous.pop(api_id, None)
+            self.info[api_id] = info
@@ -0,0 +1,290 @@
+import random
+from collections import deque
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from latency_histogram import LatencyHistogram
+import config as config_module
+
+class StressStatsAggregator:
+    """
+    壓力測試的串流統計（固定記憶體）
+    每個請求只更新計數器與對數分桶直方圖，不保留完整的請求清單；
+    另以蓄水池抽樣保留少量原始請求紀錄供頁面顯示
+    """
+    
+    PERCENTILES = (50, 90, 95, 99, 99.9)
+    LATE_THRESHOLD = 0.01  # 實際發送比預定時間晚超過此秒數即視為延遲發送
+    RECENT_SIZE = 5  # 即時監控顯示的最近請求筆數
+    
+    def __init__(self, sample_size: int = None):
+        self.sample_size = sample_size if sample_size is not None else getattr(config_module, 'STRESS_TEST_SAMPLE_SIZE', 200)
+        self.lock = threading.Lock()
+        self.total = 0
+        self.successful = 0
+        self.latency_sum = 0.0
+        self.latency_min: Optional[float] = None
+        self.latency_max: Optional[float] = None
+        self.bytes_received = 0
+        self.histogram = LatencyHistogram()  # 毫秒
+        self.status_codes: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.distribution = {'fast': 0, 'medium': 0, 'slow': 0}  # <1s, 1-3s, >=3s
+        self.samples: List[Dict] = []
+        # 開放模型：預定發送時間與實際發送時間的落差，以及修正後（由預定時間起算）的延遲
+        self.corrected_histogram = LatencyHistogram()  # 毫秒
+        self.send_lag_count = 0
+        self.send_lag_sum = 0.0
+        self.send_lag_max = 0.0
+        self.late_requests = 0
+        # 最近完成的請求（原始 tuple，讀取時才轉成紀錄）
+        self.recent = deque(maxlen=self.RECENT_SIZE)
+    
+    def record(self, response_time: float, success: bool, status_code: int = None,
+               error: str = None, response_size: int = 0, started_at: float = None,
+               send_lag: float = None):
+        """
+        記錄一個請求結果（response_time 單位為秒）
+        send_lag: 開放模型中實際發送時間晚於預定時間的秒數
+        """
+        with self.lock:
+            self.total += 1
+            if success:
+                self.successful += 1
+            self.latency_sum += response_time
+            self.latency_min = response_time if self.latency_min is None else min(self.latency_min, response_time)
+            self.latency_max = response_time if self.latency_max is None else max(self.latency_max, response_time)
+            self.bytes_received += response_size
+            self.histogram.record(response_time * 1000)
+            
+            if status_code:
+                key = str(status_code)
+                self.status_codes[key] = self.status_codes.get(key, 0) + 1
+            if not success:
+                key = error or 'Unknown Error'
+                self.errors[key] = self.errors.get(key, 0) + 1
+            
+            if send_lag is not None:
+                self.send_lag_count += 1
+                self.send_lag_sum += send_lag
+                self.send_lag_max = max(self.send_lag_max, send_lag)
+                if send_lag > self.LATE_THRESHOLD:
+                    self.late_requests += 1
+                self.corrected_histogram.record((response_time + send_lag) * 1000)
+            
+            if response_time < 1:
+                self.distribution['fast'] += 1
+            elif response_time < 3:
+                self.distribution['medium'] += 1
+            else:
+                self.distribution['slow'] += 1
+            
+            self.recent.append((response_time, success, status_code, error, response_size, started_at, send_lag))
+            
+            # 蓄水池抽樣（Algorithm R）
+            if self.sample_size > 0:
+                if len(self.samples) < self.sample_size:
+                    index = len(self.samples)
+                    self.samples.append(None)
+                else:
+                    index = random.randrange(self.total)
+                if index < self.sample_size:
+                    self.samples[index] = self._make_record(
+                        response_time, success, status_code, error, response_size, started_at, send_lag
+                    )
+    
+    @staticmethod
+    def _make_record(response_time, success, status_code, error, response_size, started_at,
+                     send_lag=None) -> Dict:
+        started_at = started_at or time.time()
+        record = {
+            'timestamp': datetime.fromtimestamp(started_at).isoformat(),
+            'start_time': started_at,
+            'response_time': response_time,
+            'success': success,
+            'status_code': status_code,
+            'response_size': response_size
+        }
+        if error:
+            record['error'] = error
+        if send_lag is not None:
+            record['send_lag'] = send_lag
+        return record
+    
+    def merge(self, other: 'StressStatsAggregator'):
+        """合併另一個統計（抽樣紀錄依請求數加權保留）"""
+        with self.lock:
+            total_before = self.total
+            self.total += other.total
+            self.successful += other.successful
+            self.latency_sum += other.latency_sum
+            if other.latency_min is not None:
+                self.latency_min = other.latency_min if self.latency_min is None else min(self.latency_min, other.latency_min)
+                self.latency_max = other.latency_max if self.latency_max is None else max(self.latency_max, other.latency_max)
+            self.bytes_received += other.bytes_received
+            self.histogram.merge(other.histogram)
+            for key, count in other.status_codes.items():
+                self.status_codes[key] = self.status_codes.get(key, 0) + count
+            for key, count in other.errors.items():
+                self.errors[key] = self.errors.get(key, 0) + count
+            for key, count in other.distribution.items():
+                self.distribution[key] = self.distribution.get(key, 0) + count
+            self.corrected_histogram.merge(other.corrected_histogram)
+            self.send_lag_count += other.send_lag_count
+            self.send_lag_sum += other.send_lag_sum
+            self.send_lag_max = max(self.send_lag_max, other.send_lag_max)
+            self.late_requests += other.late_requests
+            
+            recent = sorted(list(self.recent) + list(other.recent), key=lambda item: item[5] or 0)
+            self.recent = deque(recent, maxlen=self.RECENT_SIZE)
+            
+            combined = self.samples + other.samples
+            if len(combined) > self.sample_size:
+                weights = ([total_before / max(len(self.samples), 1)] * len(self.samples) +
+                           [other.total / max(len(other.samples), 1)] * len(other.samples))
+                combined = self._weighted_sample(combined, weights, self.sample_size)
+            self.samples = combined
+    
+    @staticmethod
+    def _weighted_sample(items: List, weights: List[float], k: int) -> List:
+        """不重複的加權抽樣（Efraimidis-Spirakis）"""
+        keyed = [(random.random() ** (1.0 / w) if w > 0 else 0.0, item) for item, w in zip(items, weights)]
+        keyed.sort(key=lambda pair: pair[0], reverse=True)
+        return [item for _, item in keyed[:k]]
+    
+    def get_statistics(self, total_duration: float) -> Dict:
+        """產生統計結果（欄位與舊版 _calculate_statistics 相容，時間單位為秒）"""
+        with self.lock:
+            if self.total == 0:
+                return {
+                    'total_requests': 0,
+                    'successful_requests': 0,
+                    'failed_requests': 0,
+                    'success_rate': 0.0,
+                    'avg_response_time': 0.0,
+                    'min_response_time': 0.0,
+                    'max_response_time': 0.0,
+                    'median_response_time': 0.0,
+                    'requests_per_second': 0.0
+                }
+            
+            # 桶代表值限制在實際的最小/最大值之間
+            percentiles = {
+                key: min(max(value / 1000, self.latency_min), self.latency_max)
+                for key, value in self.histogram.percentiles(self.PERCENTILES).items()
+            }
+            
+            stats = {
+                'total_requests': self.total,
+                'successful_requests': self.successful,
+                'failed_requests': self.total - self.successful,
+                'success_rate': (self.successful / self.total) * 100,
+                'avg_response_time': self.latency_sum / self.total,
+                'min_response_time': self.latency_min,
+                'max_response_time': self.latency_max,
+                'median_response_time': percentiles['p50'],
+                'percentiles': percentiles,
+                'requests_per_second': self.total / total_duration if total_duration > 0 else 0.0,
+                'bytes_received': self.bytes_received,
+                'status_codes': dict(self.status_codes),
+                'errors': dict(self.errors),
+                'response_time_distribution': dict(self.distribution)
+            }
+            
+            if self.send_lag_count:
+                # 由預定發送時間起算的延遲，避免協同遺漏（coordinated omission）低估尾端延遲
+                stats['corrected_percentiles'] = {
+                    key: max(value / 1000, self.latency_min)
+                    for key, value in self.corrected_histogram.percentiles(self.PERCENTILES).items()
+                }
+                stats['avg_send_lag'] = self.send_lag_sum / self.send_lag_count
+                stats['max_send_lag'] = self.send_lag_max
+                stats['late_requests'] = self.late_requests
+            
+            return stats
+    
+    def get_window_statistics(self, previous: Optional[Dict], window_seconds: float) -> Dict:
+        """
+        與較早的 to_dict() 快照比較，計算這段時間窗內的請求數、RPS、錯誤數與延遲百分位數
+        previous 為 None 時時間窗從測試開始起算
+        """
+        previous = previous or {}
+        with self.lock:
+            requests = self.total - previous.get('total', 0)
+            failed = requests - (self.successful - previous.get('successful', 0))
+            histogram = self.histogram.difference(LatencyHistogram.from_dict(previous.get('histogram')))
+            previous_errors = previous.get('errors', {})
+            errors = {
+                key: count - previous_errors.get(key, 0)
+                for key, count in self.errors.items()
+                if count > previous_errors.get(key, 0)
+            }
+        
+        return {
+            'seconds': window_seconds,
+            'requests': requests,
+            'failed_requests': failed,
+            'requests_per_second': requests / window_seconds if window_seconds > 0 else 0.0,
+            'errors': errors,
+            'percentiles': {
+                key: value / 1000 if value is not None else None
+                for key, value in histogram.percentiles(self.PERCENTILES).items()
+            }
+        }
+    
+    def get_recent(self) -> List[Dict]:
+        """最近完成的請求紀錄（依發送時間排序）"""
+        with self.lock:
+            recent = list(self.recent)
+        return [self._make_record(*item) for item in sorted(recent, key=lambda item: item[5] or 0)]
+    
+    def get_samples(self) -> List[Dict]:
+        """抽樣的原始請求紀錄（依發送時間排序）"""
+        with self.lock:
+            return sorted((s for s in self.samples if s), key=lambda s: s['start_time'])
+    
+    def to_dict(self) -> Dict:
+        """轉為可 JSON 序列化的完整狀態（可用 from_dict 還原後合併）"""
+        with self.lock:
+            return {
+                'total': self.total,
+                'successful': self.successful,
+                'latency_sum': self.latency_sum,
+                'latency_min': self.latency_min,
+                'latency_max': self.latency_max,
+                'bytes_received': self.bytes_received,
+                'histogram': self.histogram.to_dict(),
+                'status_codes': dict(self.status_codes),
+                'errors': dict(self.errors),
+                'distribution': dict(self.distribution),
+                'corrected_histogram': self.corrected_histogram.to_dict(),
+                'send_lag_count': self.send_lag_count,
+                'send_lag_sum': self.send_lag_sum,
+                'send_lag_max': self.send_lag_max,
+                'late_requests': self.late_requests,
+                'samples': [s for s in self.samples if s],
+                'recent': [list(item) for item in self.recent]
+            }
+    
+    @classmethod
+    def from_dict(cls, data: Dict, sample_size: int = None) -> 'StressStatsAggregator':
+        aggregator = cls(sample_size)
+        aggregator.total = data.get('total', 0)
+        aggregator.successful = data.get('successful', 0)
+        aggregator.latency_sum = data.get('latency_sum', 0.0)
+        aggregator.latency_min = data.get('latency_min')
+        aggregator.latency_max = data.get('latency_max')
+        aggregator.bytes_received = data.get('bytes_received', 0)
+        aggregator.histogram = LatencyHistogram.from_dict(data.get('histogram'))
+        aggregator.status_codes = dict(data.get('status_codes', {}))
+        aggregator.errors = dict(data.get('errors', {}))
+        aggregator.distribution.update(data.get('distribution', {}))
+        aggregator.corrected_histogram = LatencyHistogram.from_dict(data.get('corrected_histogram'))
+        aggregator.send_lag_count = data.get('send_lag_count', 0)
+        aggregator.send_lag_sum = data.get('send_lag_sum', 0.0)
+        aggregator.send_lag_max = data.get('send_lag_max', 0.0)
+        aggregator.late_requests = data.get('late_requests', 0)
+        aggregator.samples = list(data.get('samples', []))[:aggregator.sample_size]
+        aggregator.recent.extend(tuple(item) for item in data.get('recent', []))
+        return aggregator
@@ -2,9 +2,13 @@ import asyncio
 import time
 import threading
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 import json as json_module
 import statistics
+from stress_stats import StressStatsAggregator
+from load_profiles import target_rate
+from stress_live import LiveStressFeed
+import config as config_module
 
 try:
     import aiohttp
@@ -17,8 +21,9 @@ class StressTester:
     def __init__(self, data_manager=None):
         self.data_manager = data_manager
         self.active_tests = {}  # 記錄正在執行的測試
+        self.live_feed = LiveStressFeed()  # 執行中測試的即時快照
     
-    async def run_stress_test(self, api_id: str) -> Dict:
+    async def run_stress_test_async(self, api_id: str) -> Dict:
         """執行壓力測試"""
         if aiohttp is None:
             raise ImportError("aiohttp is required for stress testing")
@@ -31,9 +36,16 @@ class StressTester:
         concurrent_requests = config.get('concurrent_requests', 1)
         duration_seconds = config.get('duration_seconds', 10)
         interval_seconds = config.get('interval_seconds', 1.0)
+        # 設定 target_rps 時使用開放模型（固定到達率），否則沿用封閉模型
+        target_rps = config.get('target_rps')
+        load_profile = config.get('load_profile') or 'constant'
+        max_in_flight = getattr(config_module, 'STRESS_TEST_MAX_IN_FLIGHT', 500)
         
         print(f"🔥 開始壓力測試: {api['name']}")
-        print(f"   併發請求: {concurrent_requests}, 持續: {duration_seconds}秒, 間隔: {interval_seconds}秒")
+        if target_rps:
+            print(f"   開放模型: 目標 {target_rps} RPS ({load_profile}), 持續: {duration_seconds}秒, 最多 {max_in_flight} 個進行中請求")
+        else:
+            print(f"   併發請求: {concurrent_requests}, 持續: {duration_seconds}秒, 間隔: {interval_seconds}秒")
         
         # 標記測試開始
         self.active_tests[api_id] = {
@@ -49,73 +61,188 @@ class StressTester:
             'config': {
                 'concurrent_requests': concurrent_requests,
                 'duration_seconds': duration_seconds,
-                'interval_seconds': interval_seconds
+                'interval_seconds': interval_seconds,
+                'load_model': 'open' if target_rps else 'closed',
+                'target_rps': target_rps,
+                'load_profile': load_profile if target_rps else None,
+                'max_in_flight': max_in_flight if target_rps else None
             },
             'requests': [],
             'statistics': {}
         }
+        test_config = dict(results['config'])
+        aggregator = StressStatsAggregator()
+        workers = max(1, int(getattr(config_module, 'STRESS_TEST_WORKERS', 1)))
+        
+        self.live_feed.start(api_id, api_name=api['name'], config=results['config'])
+        start_time = time.time()
+        live_source = lambda: aggregator
+        publisher = asyncio.create_task(self._publish_live(api_id, lambda: live_source(), start_time))
         
         try:
             # 執行壓力測試
-            start_time = time.time()
-            end_time = start_time + duration_seconds
-            
-            connector = aiohttp.TCPConnector(limit=concurrent_requests * 2)
-            async with aiohttp.ClientSession(
-                connector=connector,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as session:
-                
-                while time.time() < end_time:
-                    # 創建並發請求任務
-                    tasks = []
-                    for i in range(concurrent_requests):
-                        task = asyncio.create_task(
-                            self._make_request(session, api, results)
-                        )
-                        tasks.append(task)
-                    
-                    # 等待所有請求完成
-                    await asyncio.gather(*tasks, return_exceptions=True)
-                    
-                    # 檢查是否還有時間進行下一輪
-                    if time.time() + interval_seconds < end_time:
-                        await asyncio.sleep(interval_seconds)
-                    else:
-                        break
+            if workers > 1:
+                # 分散到多個工作行程，各自執行事件迴圈，由協調者合併統計快照
+                from stress_workers import StressCoordinator
+                coordinator = StressCoordinator(workers)
+                live_source = coordinator.merged
+                results['config']['workers'] = workers
+                await asyncio.get_running_loop().run_in_executor(
+                    None, coordinator.run, api, test_config,
+                    lambda: self.get_test_status(api_id) == 'stopped'
+                )
+                aggregator = coordinator.merged()
+                if coordinator.errors:
+                    results['worker_errors'] = coordinator.errors
+            else:
+                await self.execute_test(
+                    api, test_config, aggregator,
+                    lambda: self.get_test_status(api_id) == 'stopped'
+                )
             
             # 計算統計資料
             results['end_time'] = datetime.now().isoformat()
-            results['total_duration'] = time.time() - start_time
-            self._calculate_statistics(results)
+            results['total_duration'] = (coordinator.duration() if workers > 1 else 0) or time.time() - start_time
+            results['statistics'] = aggregator.get_statistics(results['total_duration'])
+            results['requests'] = aggregator.get_samples()
             
             # 儲存測試結果
             self.data_manager.save_stress_test_result(api_id, results)
             
+            status = 'stopped' if self.get_test_status(api_id) == 'stopped' else 'completed'
+            self.live_feed.publish(api_id, aggregator, start_time, status)
+            
             print(f"✅ 壓力測試完成: {api['name']}")
-            print(f"   總請求數: {len(results['requests'])}")
+            print(f"   總請求數: {results['statistics']['total_requests']}")
             print(f"   成功率: {results['statistics']['success_rate']:.1f}%")
             print(f"   平均回應時間: {results['statistics']['avg_response_time']:.3f}s")
             
         except Exception as e:
             results['error'] = str(e)
             results['end_time'] = datetime.now().isoformat()
+            self.live_feed.publish(api_id, aggregator, start_time, 'failed', {'error': str(e)})
             print(f"❌ 壓力測試失敗: {api['name']} - {str(e)}")
         
         finally:
+            publisher.cancel()
             # 移除活動測試記錄
             if api_id in self.active_tests:
                 del self.active_tests[api_id]
         
         return results
     
-    async def _make_request(self, session, api: Dict, results: Dict):
-        """發送單個請求"""
+    async def _publish_live(self, api_id: str, source: Callable[[], StressStatsAggregator],
+                            start_time: float):
+        """定期發布即時快照（讀取記憶體中的統計，不寫入資料庫）"""
+        interval = getattr(config_module, 'STRESS_TEST_LIVE_INTERVAL', 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.live_feed.publish(api_id, source(), start_time)
+            except Exception as e:
+                print(f"⚠️ 發布即時快照失敗: {e}")
+    
+    async def execute_test(self, api: Dict, test_config: Dict, aggregator: StressStatsAggregator,
+                           should_stop: Callable[[], bool] = None):
+        """
+        在目前的事件迴圈中執行一次壓力測試，結果計入 aggregator
+        test_config 與 results['config'] 格式相同；工作行程也以此方法執行分到的負載
+        """
+        should_stop = should_stop or (lambda: False)
+        target_rps = test_config.get('target_rps')
+        concurrent_requests = test_config.get('concurrent_requests', 1)
+        duration_seconds = test_config.get('duration_seconds', 10)
+        max_in_flight = test_config.get('max_in_flight') or getattr(config_module, 'STRESS_TEST_MAX_IN_FLIGHT', 500)
+        
+        connector = aiohttp.TCPConnector(
+            limit=max_in_flight if target_rps else concurrent_requests * 2
+        )
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=30)
+        ) as session:
+            
+            if target_rps:
+                await self._run_open_model(
+                    session, api, aggregator, target_rps,
+                    test_config.get('load_profile') or 'constant',
+                    duration_seconds, max_in_flight, should_stop
+                )
+            else:
+                await self._run_closed_model(
+                    session, api, aggregator, concurrent_requests,
+                    test_config.get('interval_seconds', 1.0),
+                    time.time() + duration_seconds, should_stop
+                )
+    
+    async def _run_closed_model(self, session, api: Dict, aggregator: StressStatsAggregator,
+                                concurrent_requests: int, interval_seconds: float, end_time: float,
+                                should_stop: Callable[[], bool]):
+        """封閉模型：每輪同時發送 concurrent_requests 個請求，全部完成後間隔 interval_seconds 再發下一輪"""
+        while time.time() < end_time and not should_stop():
+            # 創建並發請求任務
+            tasks = []
+            for i in range(concurrent_requests):
+                task = asyncio.create_task(
+                    self._make_request(session, api, aggregator)
+                )
+                tasks.append(task)
+            
+            # 等待所有請求完成
+            await asyncio.gather(*tasks, return_exceptions=True)
+            
+            # 檢查是否還有時間進行下一輪
+            if time.time() + interval_seconds < end_time:
+                await asyncio.sleep(interval_seconds)
+            else:
+                break
+    
+    async def _run_open_model(self, session, api: Dict, aggregator: StressStatsAggregator,
+                              target_rps: float, load_profile: str, duration_seconds: float,
+                              max_in_flight: int, should_stop: Callable[[], bool]):
+        """
+        開放模型：依負載曲線在預定時間發送請求，不等待先前的請求完成
+        發送排程以絕對時間計算，落後時立即補發；進行中請求達上限時等待名額，
+        等待時間會反映在 send_lag 與修正後的延遲中
+        """
+        in_flight = asyncio.Semaphore(max_in_flight)
+        tasks = set()
+        
+        async def send(intended_at):
+            try:
+                await self._make_request(session, api, aggregator, intended_at)
+            finally:
+                in_flight.release()
+        
+        start = time.monotonic()
+        end = start + duration_seconds
+        next_send = start
+        while next_send < end and not should_stop():
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await in_flight.acquire()
+            
+            task = asyncio.create_task(send(next_send))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            
+            next_send += 1.0 / target_rate(load_profile, target_rps, next_send - start, duration_seconds)
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _make_request(self, session, api: Dict, aggregator: StressStatsAggregator,
+                            intended_at: float = None):
+        """
+        發送單個請求，結果直接計入串流統計
+        intended_at: 開放模型中預定的發送時間（time.monotonic），用於計算發送落差
+        """
+        send_lag = max(0.0, time.monotonic() - intended_at) if intended_at is not None else None
         request_start = time.time()
-        request_data = {
-            'timestamp': datetime.now().isoformat(),
-            'start_time': request_start
-        }
+        status_code = None
+        response_size = 0
+        error = None
         
         try:
             # 準備請求參數
@@ -155,79 +282,25 @@ class StressTester:
                 json=json_data
             ) as response:
                 response_time = time.time() - request_start
-                response_text = await response.text()
+                # 只需要回應大小，直接讀取位元組避免解碼
+                response_size = len(await response.read())
+                status_code = response.status
+                success = 200 <= status_code < 300
                 
-                request_data.update({
-                    'response_time': response_time,
-                    'status_code': response.status,
-                    'success': 200 <= response.status < 300,
-                    'response_size': len(response_text.encode('utf-8')),
-                    'end_time': time.time()
-                })
-                
-                if not request_data['success']:
-                    request_data['error'] = f"HTTP {response.status}"
+                if not success:
+                    error = f"HTTP {status_code}"
                 
         except asyncio.TimeoutError:
-            request_data.update({
-                'response_time': time.time() - request_start,
-                'success': False,
-                'error': 'Timeout',
-                'end_time': time.time()
-            })
+            response_time = time.time() - request_start
+            success = False
+            error = 'Timeout'
         except Exception as e:
-            request_data.update({
-                'response_time': time.time() - request_start,
-                'success': False,
-                'error': str(e),
-                'end_time': time.time()
-            })
+            response_time = time.time() - request_start
+            success = False
+            # 以例外類別計數，避免訊息中的細節讓錯誤種類無限增長
+            error = type(e).__name__
         
-        # 線程安全地添加結果
-        results['requests'].append(request_data)
-    
-    def _calculate_statistics(self, results: Dict):
-        """計算統計資料"""
-        requests = results['requests']
-        if not requests:
-            results['statistics'] = {
-                'total_requests': 0,
-                'successful_requests': 0,
-                'failed_requests': 0,
-                'success_rate': 0.0,
-                'avg_response_time': 0.0,
-                'min_response_time': 0.0,
-                'max_response_time': 0.0,
-                'median_response_time': 0.0,
-                'requests_per_second': 0.0
-            }
-            return
-        
-        successful_requests = [r for r in requests if r.get('success', False)]
-        failed_requests = [r for r in requests if not r.get('success', False)]
-        response_times = [r.get('response_time', 0) for r in requests]
-        
-        total_duration = results.get('total_duration', 1)
-        
-        stats = {
-            'total_requests': len(requests),
-            'successful_requests': len(successful_requests),
-            'failed_requests': len(failed_requests),
-            'success_rate': (len(successful_requests) / len(requests)) * 100,
-            'avg_response_time': statistics.mean(response_times) if response_times else 0,
-            'min_response_time': min(response_times) if response_times else 0,
-            'max_response_time': max(response_times) if response_times else 0,
-            'median_response_time': statistics.median(response_times) if response_times else 0,
-            'requests_per_second': len(requests) / total_duration,
-            'errors': {}
-        }
-        
-        # 統計錯誤類型
-        for request in failed_requests:
-            error = request.get('error', 'Unknown Error')
-            stats['errors'][error] = stats['errors'].get(error, 0) + 1
-        
-        results['statistics'] = stats
+        aggregator.record(response_time, success, status_code, error, response_size, request_start, send_lag)
     
     def run_stress_test_sync(self, api_id: str) -> Dict:
         """同步版本的壓力測試（在新線程中運行）"""
@@ -235,7 +308,7 @@ class StressTester:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
             try:
-                return loop.run_until_complete(self.run_stress_test(api_id))
+                return loop.run_until_complete(self.run_stress_test_async(api_id))
             finally:
                 loop.close()
         
@@ -315,8 +388,8 @@ class StressTester:
     
     def run_single_request(self, api: dict) -> dict:
         """為測試提供的同步單請求方法"""
-        import requests
         import time
+        from services.http_client import get_http_client
         
         start_time = time.time()
         try:
@@ -325,7 +398,7 @@ class StressTester:
             headers = api.get('headers', {})
             timeout = api.get('timeout', 10)
             
-            response = requests.request(
+            response = get_http_client().request(
                 method=method,
                 url=url,
                 headers=headers,
@@ -366,12 +439,20 @@ class StressTester:
             'summary': {},
             'config': config
         }
+        aggregator = StressStatsAggregator()
         
         def worker():
             """工作線程函數"""
             for _ in range(requests_per_user):
+                request_start = time.time()
                 request_result = self.run_single_request(api)
-                results['requests'].append(request_result)
+                aggregator.record(
+                    request_result['response_time'],
+                    request_result['success'],
+                    request_result.get('status_code') or None,
+                    request_result.get('error'),
+                    started_at=request_start
+                )
         
         # 創建並啟動線程
         threads = []
@@ -391,19 +472,16 @@ class StressTester:
             thread.join()
         
         # 計算統計信息
-        total_requests = len(results['requests'])
-        successful_requests = sum(1 for r in results['requests'] if r.get('success', False))
-        failed_requests = total_requests - successful_requests
-        
-        response_times = [r.get('response_time', 0) for r in results['requests']]
-        
+        stats = aggregator.get_statistics(time.time() - start_time)
+        results['requests'] = aggregator.get_samples()
         results['summary'] = {
-            'total_requests': total_requests,
-            'successful_requests': successful_requests,
-            'failed_requests': failed_requests,
-            'average_response_time': sum(response_times) / len(response_times) if response_times else 0,
-            'min_response_time': min(response_times) if response_times else 0,
-            'max_response_time': max(response_times) if response_times else 0
+            'total_requests': stats['total_requests'],
+            'successful_requests': stats['successful_requests'],
+            'failed_requests': stats['failed_requests'],
+            'average_response_time': stats['avg_response_time'],
+            'min_response_time': stats['min_response_time'],
+            'max_response_time': stats['max_response_time'],
+            'percentiles': stats.get('percentiles', {})
         }
         
         return results
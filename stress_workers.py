@@ -0,0 +1,197 @@
+"""
+分散式壓力測試：協調者將一次測試分片給多個工作行程
+每個工作者執行自己的事件迴圈與 aiohttp session，定期回傳累計的統計快照；
+訊息皆為 JSON 字串，之後可改由遠端節點透過其他傳輸方式送回相同格式的訊息
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import queue as queue_module
+import time
+from typing import Callable, Dict, List, Optional
+from stress_stats import StressStatsAggregator
+import config as config_module
+
+PROTOCOL_VERSION = 1
+
+# 訊息類型
+MSG_SNAPSHOT = 'snapshot'  # 執行中的累計統計
+MSG_DONE = 'done'          # 最終統計
+MSG_ERROR = 'error'        # 工作者執行失敗
+
+# 傳給工作者的 API 欄位（避免序列化整個 API 設定與歷史結果）
+API_FIELDS = ('id', 'name', 'url', 'method', 'request_body')
+
+def encode_message(msg_type: str, worker_id: str, seq: int, **payload) -> str:
+    """編碼工作者訊息"""
+    message = {
+        'version': PROTOCOL_VERSION,
+        'type': msg_type,
+        'worker_id': worker_id,
+        'seq': seq,
+        'sent_at': time.time()
+    }
+    message.update(payload)
+    return json.dumps(message, separators=(',', ':'))
+
+def decode_message(text: str) -> Dict:
+    """解碼工作者訊息，版本不符時拋出 ValueError"""
+    message = json.loads(text)
+    if message.get('version') != PROTOCOL_VERSION:
+        raise ValueError(f"不支援的協定版本: {message.get('version')}")
+    return message
+
+def shard_test_config(test_config: Dict, workers: int) -> List[Dict]:
+    """
+    將測試配置切分給各工作者
+    開放模型平分目標速率與進行中請求上限；封閉模型平分併發數（工作者數不超過併發數）
+    """
+    shards = []
+    if test_config.get('target_rps'):
+        max_in_flight = test_config.get('max_in_flight') or getattr(config_module, 'STRESS_TEST_MAX_IN_FLIGHT', 500)
+        for _ in range(workers):
+            shard = dict(test_config)
+            shard['target_rps'] = test_config['target_rps'] / workers
+            shard['max_in_flight'] = max(1, math.ceil(max_in_flight / workers))
+            shards.append(shard)
+    else:
+        concurrent_requests = test_config.get('concurrent_requests', 1)
+        workers = max(1, min(workers, concurrent_requests))
+        base, extra = divmod(concurrent_requests, workers)
+        for index in range(workers):
+            shard = dict(test_config)
+            shard['concurrent_requests'] = base + (1 if index < extra else 0)
+            shards.append(shard)
+    return shards
+
+def run_worker(worker_id: str, api: Dict, test_config: Dict, message_queue, stop_event,
+               snapshot_interval: float):
+    """工作行程進入點（需為模組層級函數，spawn 模式才能序列化）"""
+    from stress_tester import StressTester
+    
+    seq = 0
+    aggregator = StressStatsAggregator()
+    start_time = time.time()
+    
+    def send(msg_type, **payload):
+        nonlocal seq
+        seq += 1
+        message_queue.put(encode_message(msg_type, worker_id, seq, **payload))
+    
+    async def report_snapshots():
+        while True:
+            await asyncio.sleep(snapshot_interval)
+            send(MSG_SNAPSHOT, elapsed=time.time() - start_time, stats=aggregator.to_dict())
+    
+    async def main():
+        reporter = asyncio.create_task(report_snapshots())
+        try:
+            await StressTester().execute_test(api, test_config, aggregator, stop_event.is_set)
+        finally:
+            reporter.cancel()
+    
+    try:
+        asyncio.run(main())
+        send(MSG_DONE, elapsed=time.time() - start_time, stats=aggregator.to_dict())
+    except Exception as e:
+        send(MSG_ERROR, elapsed=time.time() - start_time, error=f"{type(e).__name__}: {e}",
+             stats=aggregator.to_dict())
+
+class StressCoordinator:
+    """
+    壓力測試協調者
+    收集各工作者的累計快照（同一工作者只保留序號最新的一份），
+    結束時合併為單一 StressStatsAggregator
+    """
+    
+    def __init__(self, workers: int, snapshot_interval: float = None):
+        self.workers = workers
+        self.snapshot_interval = snapshot_interval or getattr(config_module, 'STRESS_TEST_SNAPSHOT_INTERVAL', 1.0)
+        self.snapshots: Dict[str, Dict] = {}
+        self.finished: set = set()
+        self.errors: Dict[str, str] = {}
+    
+    def handle_message(self, text: str) -> Optional[Dict]:
+        """處理一則工作者訊息（本機佇列與遠端節點共用），返回解碼後的訊息"""
+        message = decode_message(text)
+        worker_id = message['worker_id']
+        if worker_id in self.finished:
+            return message
+        
+        current = self.snapshots.get(worker_id)
+        if 'stats' in message and (current is None or message['seq'] > current['seq']):
+            self.snapshots[worker_id] = message
+        
+        if message['type'] == MSG_ERROR:
+            self.errors[worker_id] = message.get('error', 'Unknown Error')
+        if message['type'] in (MSG_DONE, MSG_ERROR):
+            self.finished.add(worker_id)
+        return message
+    
+    def merged(self) -> StressStatsAggregator:
+        """合併目前所有工作者的最新快照"""
+        aggregator = StressStatsAggregator()
+        for message in list(self.snapshots.values()):
+            aggregator.merge(StressStatsAggregator.from_dict(message['stats']))
+        return aggregator
+    
+    def duration(self) -> float:
+        """各工作者實際執行測試的最長時間（不含行程啟動時間）"""
+        return max((message.get('elapsed', 0.0) for message in self.snapshots.values()), default=0.0)
+    
+    def run(self, api: Dict, test_config: Dict, should_stop: Callable[[], bool] = None,
+            on_snapshot: Callable[['StressCoordinator'], None] = None):
+        """在本機啟動工作行程並等待全部完成（阻塞）"""
+        context = multiprocessing.get_context('spawn')
+        message_queue = context.Queue()
+        stop_event = context.Event()
+        payload = {key: api.get(key) for key in API_FIELDS}
+        
+        processes = {}
+        for index, shard in enumerate(shard_test_config(test_config, self.workers)):
+            worker_id = f"local-{index}"
+            process = context.Process(
+                target=run_worker,
+                args=(worker_id, payload, shard, message_queue, stop_event, self.snapshot_interval),
+                daemon=True
+            )
+            process.start()
+            processes[worker_id] = process
+        print(f"   已啟動 {len(processes)} 個壓力測試工作行程")
+        
+        # 工作者開始前的匯入與建立 session 需要時間，預留寬限期
+        deadline = time.time() + test_config.get('duration_seconds', 10) + 60
+        try:
+            while len(self.finished) < len(processes):
+                if should_stop and should_stop():
+                    stop_event.set()
+                
+                try:
+                    text = message_queue.get(timeout=0.5)
+                except queue_module.Empty:
+                    self._reap(processes)
+                    if time.time() > deadline:
+                        stop_event.set()
+                        for worker_id in processes:
+                            if worker_id not in self.finished:
+                                self.errors[worker_id] = '工作行程逾時'
+                                self.finished.add(worker_id)
+                    continue
+                
+                self.handle_message(text)
+                if on_snapshot:
+                    on_snapshot(self)
+        finally:
+            stop_event.set()
+            for process in processes.values():
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+    
+    def _reap(self, processes: Dict):
+        """異常退出的工作者視為失敗，保留其最後一份快照（正常退出時結束訊息已寫入佇列）"""
+        for worker_id, process in processes.items():
+            if worker_id not in self.finished and process.exitcode not in (None, 0):
+                self.errors[worker_id] = f"工作行程異常結束 (exit code {process.exitcode})"
+                self.finished.add(worker_id)
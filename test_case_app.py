@@ -6,26 +6,16 @@ import csv
 import io
 import tempfile
 import logging
-import sys
 from models import TestCase, ProductTag, TestProject, TestResult, TestStatus, ProjectStatus, generate_id
 from test_case_manager import TestCaseManager
 from report_generator import ReportGenerator
 from pdf_exporter import PDFExporter
 from user_manager import UserManager
 from audit_logger import AuditLogger
+from search_index import search_index
 
-# 配置詳細的日誌輸出，確保 Railway 能看到錯誤
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-# 創建專門的 logger
+# 創建專門的 logger（日誌層級由應用程式入口設定）
 test_project_logger = logging.getLogger('test_projects')
-test_project_logger.setLevel(logging.DEBUG)
 
 def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
     """建立測試案例相關的路由"""
@@ -45,6 +35,33 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
         user = get_current_user()
         return user and user.get('role') == 'admin'
     
+    # 分頁查詢參數：提供任一個時列表 API 返回分頁結果，否則維持返回完整陣列
+    PAGE_ARGS = ('limit', 'cursor', 'include_total')
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+    
+    def _parse_page_args(filter_types):
+        """
+        解析分頁與篩選參數，沒有相關參數時返回 None
+        filter_types: {參數名稱: 型別}，型別轉換失敗時拋出 ValueError
+        """
+        if not any(key in request.args for key in PAGE_ARGS + tuple(filter_types)):
+            return None
+        
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        include_total = request.args.get('include_total')
+        filters = {
+            key: value_type(request.args[key])
+            for key, value_type in filter_types.items()
+            if request.args.get(key)
+        }
+        return {
+            'limit': limit,
+            'cursor': request.args.get('cursor') or None,
+            'filters': filters,
+            'include_total': include_total.lower() in ('1', 'true', 'yes') if include_total else None
+        }
+    
     # 輔助函數：將後端資料格式轉換為前端期望格式
     def _process_case_for_frontend(case_dict):
         """將後端測試案例資料轉換為前端期望格式"""
@@ -248,8 +265,28 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
     
     @app.route('/api/test-cases', methods=['GET'])
     def get_test_cases():
-        """取得所有測試案例"""
+        """
+        取得測試案例
+        提供 limit、cursor 或篩選參數（status、priority、tag_id、project_id、responsible_user_id）時
+        以 tc_id 游標分頁，返回 {'items', 'next_cursor', 'has_more', 'total'（僅第一頁）}
+        """
         try:
+            try:
+                page_args = _parse_page_args({
+                    'status': str, 'priority': str, 'tag_id': int,
+                    'project_id': int, 'responsible_user_id': str
+                })
+            except ValueError:
+                return jsonify({'error': '無效的分頁或篩選參數'}), 400
+            
+            if page_args is not None:
+                try:
+                    page = test_case_manager.get_test_cases_page(**page_args)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                page['items'] = [_process_case_for_frontend(case) for case in page['items']]
+                return jsonify(page)
+            
             cases = test_case_manager.get_test_cases()
             # 處理兩種情況：字典列表或物件列表
             if cases:
@@ -271,6 +308,30 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @app.route('/api/test-cases/search', methods=['GET'])
+    def search_test_cases():
+        """
+        全文檢索測試案例（標題、描述、驗收條件），依相關度排序
+        參數：q（空白分隔的關鍵字，全部需命中）、limit、offset、project_id、status
+        返回 {'query', 'engine', 'total', 'results': [{id, tc_id, title, ..., snippet, score}]}，snippet 已做 HTML 跳脫
+        """
+        query = request.args.get('q', '').strip()
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), MAX_PAGE_SIZE)
+            offset = max(int(request.args.get('offset', 0)), 0)
+            project_id = int(request.args['project_id']) if request.args.get('project_id') else None
+        except ValueError:
+            return jsonify({'error': '無效的搜尋參數'}), 400
+        
+        try:
+            result = search_index.search_test_cases(
+                query, limit=limit, offset=offset, project_id=project_id, status=request.args.get('status') or None
+            )
+            result['query'] = query
+            return jsonify(result)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
     @app.route('/api/test-cases/<case_id>', methods=['GET'])
     def get_test_case(case_id):
         """取得特定測試案例"""
@@ -542,23 +603,44 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
     
     @app.route('/api/test-projects', methods=['GET'])
     def get_test_projects():
-        """取得測試專案（根據用戶權限過濾）"""
-        test_project_logger.info("🚀 開始取得測試專案列表")
+        """
+        取得測試專案（根據用戶權限過濾）
+        提供 limit、cursor 或篩選參數（status、responsible_user_id）時以 created_at 游標分頁，
+        返回 {'items', 'next_cursor', 'has_more', 'total'（僅第一頁）}
+        """
+        test_project_logger.debug("🚀 開始取得測試專案列表")
         try:
-            test_project_logger.info("📊 呼叫 test_case_manager.get_test_projects()")
+            try:
+                page_args = _parse_page_args({'status': str, 'responsible_user_id': str})
+            except ValueError:
+                return jsonify({'error': '無效的分頁或篩選參數'}), 400
+            
+            if page_args is not None:
+                current_user = get_current_user()
+                if not current_user:
+                    return jsonify({'error': '未登入'}), 401
+                # 一般用戶只能看到自己負責的專案，權限條件直接加入查詢
+                if current_user.get('role') != 'admin':
+                    page_args['filters']['responsible_username'] = current_user.get('username')
+                try:
+                    return jsonify(test_case_manager.get_test_projects_page(**page_args))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+            
+            test_project_logger.debug("📊 呼叫 test_case_manager.get_test_projects()")
             projects = test_case_manager.get_test_projects()
-            test_project_logger.info(f"📊 取得 {len(projects) if projects else 0} 個專案")
+            test_project_logger.debug(f"📊 取得 {len(projects) if projects else 0} 個專案")
             
             # 獲取當前用戶
             current_user = get_current_user()
-            test_project_logger.info(f"👤 當前用戶: {current_user.get('username') if current_user else 'None'}")
+            test_project_logger.debug(f"👤 當前用戶: {current_user.get('username') if current_user else 'None'}")
             if not current_user:
                 test_project_logger.warning("❌ 用戶未登入")
                 return jsonify({'error': '未登入'}), 401
             
             # 權限過濾：管理員可以看到所有專案，一般用戶只能看到自己負責的專案
             if current_user.get('role') != 'admin':
-                test_project_logger.info(f"🔒 非管理員用戶，進行權限過濾")
+                test_project_logger.debug(f"🔒 非管理員用戶，進行權限過濾")
                 # 過濾出當前用戶負責的專案
                 filtered_projects = []
                 current_username = current_user.get('username')
@@ -577,22 +659,22 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
                         filtered_projects.append(project)
                 
                 projects = filtered_projects
-                test_project_logger.info(f"🔒 過濾後剩餘 {len(projects)} 個專案")
+                test_project_logger.debug(f"🔒 過濾後剩餘 {len(projects)} 個專案")
             else:
-                test_project_logger.info(f"👑 管理員用戶，不進行權限過濾")
+                test_project_logger.debug(f"👑 管理員用戶，不進行權限過濾")
             
             # 處理兩種情況：字典列表或物件列表
             if projects:
-                test_project_logger.info(f"📤 準備返回 {len(projects)} 個專案")
+                test_project_logger.debug(f"📤 準備返回 {len(projects)} 個專案")
                 # 檢查所有元素是否都有 to_dict 方法
                 if all(hasattr(project, 'to_dict') for project in projects):
-                    test_project_logger.info("🔄 使用 to_dict() 方法格式化專案")
+                    test_project_logger.debug("🔄 使用 to_dict() 方法格式化專案")
                     return jsonify([project.to_dict() for project in projects])
                 else:
-                    test_project_logger.info("🔄 直接返回字典格式專案")
+                    test_project_logger.debug("🔄 直接返回字典格式專案")
                     return jsonify(projects)
             else:
-                test_project_logger.info("📭 沒有專案可返回")
+                test_project_logger.debug("📭 沒有專案可返回")
                 return jsonify([])
         except Exception as e:
             test_project_logger.error(f"💥 取得測試專案失敗: {str(e)}")
@@ -604,45 +686,45 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
     @app.route('/api/test-projects/<project_id>', methods=['GET'])
     def get_test_project(project_id):
         """取得特定測試專案（檢查權限）"""
-        test_project_logger.info(f"🎯 開始取得測試專案: project_id={project_id}")
+        test_project_logger.debug(f"🎯 開始取得測試專案: project_id={project_id}")
         try:
-            test_project_logger.info(f"📊 呼叫 test_case_manager.get_test_project_by_id({project_id})")
+            test_project_logger.debug(f"📊 呼叫 test_case_manager.get_test_project_by_id({project_id})")
             project = test_case_manager.get_test_project_by_id(int(project_id))
             if not project:
                 test_project_logger.warning(f"❌ 專案不存在: project_id={project_id}")
                 return jsonify({'error': '專案不存在'}), 404
             
-            test_project_logger.info(f"✅ 成功取得專案: {project.get('name') if isinstance(project, dict) else getattr(project, 'name', 'Unknown')}")
+            test_project_logger.debug(f"✅ 成功取得專案: {project.get('name') if isinstance(project, dict) else getattr(project, 'name', 'Unknown')}")
             
             # 獲取當前用戶
             current_user = get_current_user()
-            test_project_logger.info(f"👤 當前用戶: {current_user.get('username') if current_user else 'None'}")
+            test_project_logger.debug(f"👤 當前用戶: {current_user.get('username') if current_user else 'None'}")
             if not current_user:
                 test_project_logger.warning("❌ 用戶未登入")
                 return jsonify({'error': '未登入'}), 401
             
             # 權限檢查：管理員可以訪問所有專案，一般用戶只能訪問自己負責的專案
             if current_user.get('role') != 'admin':
-                test_project_logger.info("🔒 非管理員用戶，檢查專案權限")
+                test_project_logger.debug("🔒 非管理員用戶，檢查專案權限")
                 responsible_user = ''
                 if hasattr(project, 'responsible_user'):
                     responsible_user = project.responsible_user
                 elif isinstance(project, dict):
                     responsible_user = project.get('responsible_user_name', '') or project.get('responsible_user', '')
                 
-                test_project_logger.info(f"🔍 專案負責人: {responsible_user}, 當前用戶: {current_user.get('username')}")
+                test_project_logger.debug(f"🔍 專案負責人: {responsible_user}, 當前用戶: {current_user.get('username')}")
                 if responsible_user != current_user.get('username'):
                     test_project_logger.warning(f"❌ 無權限訪問專案 {project_id}")
                     return jsonify({'error': '無權限訪問此專案'}), 403
             else:
-                test_project_logger.info("👑 管理員用戶，跳過權限檢查")
+                test_project_logger.debug("👑 管理員用戶，跳過權限檢查")
             
             # 安全檢查：確認物件有 to_dict 方法
             if hasattr(project, 'to_dict'):
-                test_project_logger.info("🔄 使用 to_dict() 方法返回專案資料")
+                test_project_logger.debug("🔄 使用 to_dict() 方法返回專案資料")
                 return jsonify(project.to_dict())
             else:
-                test_project_logger.info("🔄 直接返回字典格式專案資料")
+                test_project_logger.debug("🔄 直接返回字典格式專案資料")
                 return jsonify(project)
         except Exception as e:
             test_project_logger.error(f"💥 取得單個測試專案失敗: {str(e)}")
@@ -970,38 +1052,67 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
     def get_project_report(project_id):
         """取得專案報告（檢查權限）"""
         try:
-            # 首先檢查專案是否存在及權限
-            project = test_case_manager.get_test_project_by_id(int(project_id))
-            if not project:
-                return jsonify({'error': '專案不存在'}), 404
-            
             # 獲取當前用戶
             current_user = get_current_user()
             if not current_user:
                 return jsonify({'error': '未登入'}), 401
             
+            # 權限檢查以資料庫目前的負責人為準（不使用快取的報告）
+            info = test_case_manager.get_project_version_info(int(project_id))
+            if not info:
+                return jsonify({'error': '專案不存在'}), 404
+            
             # 權限檢查：管理員可以訪問所有專案，一般用戶只能訪問自己負責的專案
             if current_user.get('role') != 'admin':
-                responsible_user = ''
-                if hasattr(project, 'responsible_user'):
-                    responsible_user = project.responsible_user
-                elif isinstance(project, dict):
-                    responsible_user = project.get('responsible_user_name', '') or project.get('responsible_user', '')
-                
-                if responsible_user != current_user.get('username'):
+                if (info['responsible_user_name'] or '') != current_user.get('username'):
                     return jsonify({'error': '無權限訪問此專案'}), 403
             
+            # 報告依專案資料版本快取；專案在檢查後被刪除時返回 None
             report = report_generator.generate_project_report(project_id)
-            if report:
-                return jsonify(report_generator.export_to_dict(report))
-            else:
-                return jsonify({'error': '無法產生報告'}), 500
+            if not report:
+                return jsonify({'error': '專案不存在'}), 404
+            
+            return jsonify(report_generator.export_to_dict(report))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/test-projects/compare', methods=['GET'])
+    def compare_projects():
+        """
+        多專案比較報告（檢查權限）
+        參數：ids（逗號分隔的專案 ID）
+        """
+        try:
+            current_user = get_current_user()
+            if not current_user:
+                return jsonify({'error': '未登入'}), 401
+            
+            try:
+                project_ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+            except ValueError:
+                return jsonify({'error': '無效的專案 ID'}), 400
+            if not project_ids:
+                return jsonify({'error': '請提供要比較的專案 ID'}), 400
+            
+            # 權限檢查：一般用戶只能比較自己負責的專案（產生報告前以負責人查詢檢查）
+            if current_user.get('role') != 'admin':
+                owners = test_case_manager.get_project_owners(project_ids)
+                if not owners:
+                    return jsonify({'error': '專案不存在'}), 404
+                if any((owner or '') != current_user.get('username') for owner in owners.values()):
+                    return jsonify({'error': '無權限訪問此專案'}), 403
+            
+            comparison = report_generator.generate_comparison_report(project_ids)
+            if not comparison:
+                return jsonify({'error': '專案不存在'}), 404
+            
+            return jsonify(comparison)
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
     @app.route('/api/test-projects/<project_id>/export-pdf', methods=['POST'])
     def export_project_pdf(project_id):
-        """匯出專案PDF報告"""
+        """匯出專案PDF報告（與 /report 共用報告快取）"""
         try:
             report = report_generator.generate_project_report(project_id)
             if not report:
@@ -1030,8 +1141,8 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
         try:
             # 獲取所有專案
             projects = test_case_manager.get_test_projects()
-            # 獲取所有測試案例以便查找名稱
-            test_cases = test_case_manager.get_test_cases()
+            # 獲取所有測試案例以便查找名稱（只需識別欄位）
+            test_cases = test_case_manager.get_test_cases(projection='ids')
             
             # 建立測試案例ID到名稱的映射（修復：使用字典語法）
             test_case_map = {tc['id']: tc['title'] for tc in test_cases}
@@ -1074,15 +1185,15 @@ def create_test_case_routes(app: Flask, test_case_manager: TestCaseManager):
                     updated_at_str
                 ]
                 
-                # 獲取專案關聯的測試案例
-                project_cases = test_case_manager.get_test_cases(project_id=project['id'])
+                # 專案關聯的測試案例（已隨專案批次載入）
+                project_cases = project.get('selected_test_cases', [])
                 
                 if project_cases:
                     # 為每個測試案例寫一行
-                    for test_case in project_cases:
+                    for test_case_id in project_cases:
                         result_row = base_row + [
-                            test_case['id'],
-                            test_case['title']
+                            test_case_id,
+                            test_case_map.get(test_case_id, '')
                         ]
                         csv_writer.writerow(result_row)
                 else:
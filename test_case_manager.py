@@ -1,26 +1,32 @@
+import base64
 import json
 from typing import List, Dict, Optional, Any, Tuple
 from datetime import datetime
 import logging
-import sys
 from database.db_manager import db_manager
 
-# 配置詳細的日誌輸出
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-# 創建專門的 logger
+# 創建專門的 logger（日誌層級由應用程式入口設定）
 db_logger = logging.getLogger('test_case_db')
-db_logger.setLevel(logging.DEBUG)
+
+def encode_cursor(values: List[Any]) -> str:
+    """將排序鍵編碼為不透明的分頁游標"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """解碼分頁游標，格式不符時拋出 ValueError"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('無效的分頁游標')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('無效的分頁游標')
+    return values
 
 class TestCaseManager:
     """基於 SQLite 的測試案例管理器"""
     
+    IN_BATCH_SIZE = 500  # IN (...) 批次查詢的參數數量上限（低於 SQLite 的變數上限）
+    
     def __init__(self, data_dir: str = "data"):
         """
         初始化測試案例管理器
@@ -99,19 +105,24 @@ class TestCaseManager:
         query = f"UPDATE product_tags SET {', '.join(update_fields)} WHERE id = ?"
         
         rows_affected = db_manager.execute_update(query, tuple(params))
+        if rows_affected:
+            self._bump_data_versions(self._get_project_ids_for_tag(tag_id))
         return rows_affected > 0
     
     def delete_product_tag(self, tag_id: int) -> bool:
         """刪除產品標籤"""
+        project_ids = self._get_project_ids_for_tag(tag_id)
         query = "DELETE FROM product_tags WHERE id = ?"
         rows_affected = db_manager.execute_delete(query, (tag_id,))
+        if rows_affected:
+            self._bump_data_versions(project_ids)
         return rows_affected > 0
     
     # ========== Test Projects 管理 ==========
     
     def get_test_projects(self) -> List[Dict]:
         """取得所有測試專案"""
-        db_logger.info("🚀 開始取得所有測試專案")
+        db_logger.debug("🚀 開始取得所有測試專案")
         try:
             query = """
                 SELECT 
@@ -122,33 +133,18 @@ class TestCaseManager:
                 LEFT JOIN users u ON tp.responsible_user_id = u.id
                 ORDER BY tp.created_at DESC
             """
-            db_logger.info(f"📊 執行查詢: {query}")
+            db_logger.debug(f"📊 執行查詢: {query}")
             projects = db_manager.execute_query(query)
-            db_logger.info(f"📊 查詢結果: 取得 {len(projects) if projects else 0} 個專案")
+            db_logger.debug(f"📊 查詢結果: 取得 {len(projects) if projects else 0} 個專案")
             
             if not projects:
-                db_logger.info("📭 沒有找到任何測試專案")
+                db_logger.debug("📭 沒有找到任何測試專案")
                 return []
             
-            # 為每個專案添加測試案例和測試結果
-            for i, project in enumerate(projects):
-                db_logger.info(f"🔄 處理專案 {i+1}/{len(projects)}: {project.get('name', 'Unknown')}")
-                try:
-                    # 添加專案關聯的測試案例 ID 列表
-                    test_cases = self.get_test_cases(project_id=project['id'])
-                    project['selected_test_cases'] = [tc['id'] for tc in test_cases]
-                    db_logger.info(f"📋 專案 {project['id']} 有 {len(test_cases)} 個測試案例")
-                    
-                    # 添加測試結果
-                    project['test_results'] = self.get_test_results_for_project(project['id'])
-                    db_logger.info(f"📋 專案 {project['id']} 有 {len(project['test_results'])} 個測試結果")
-                except Exception as e:
-                    db_logger.error(f"💥 處理專案 {project['id']} 失敗: {str(e)}")
-                    # 設置默認值以防止整個流程中斷
-                    project['selected_test_cases'] = []
-                    project['test_results'] = []
+            # 以固定次數的批次查詢載入所有專案的測試案例與測試結果
+            self._hydrate_projects(projects)
             
-            db_logger.info(f"✅ 成功處理完所有 {len(projects)} 個專案")
+            db_logger.debug(f"✅ 成功處理完所有 {len(projects)} 個專案")
             return projects
             
         except Exception as e:
@@ -158,6 +154,94 @@ class TestCaseManager:
             db_logger.error(f"💥 完整錯誤堆疊:\n{traceback.format_exc()}")
             raise e
     
+    def get_test_projects_page(self, limit: int = 50, cursor: Optional[str] = None,
+                               filters: Optional[Dict] = None,
+                               include_total: Optional[bool] = None) -> Dict:
+        """
+        以 keyset（游標）分頁取得測試專案，依 created_at、id 由新到舊排序
+        filters: status、responsible_user_id、responsible_username
+        include_total: 是否計算總數；預設只在第一頁（沒有 cursor）計算
+        返回 {'items', 'next_cursor', 'has_more'[, 'total']}
+        """
+        filters = filters or {}
+        conditions = []
+        params = []
+        for key, column in (('status', 'tp.status'), ('responsible_user_id', 'tp.responsible_user_id'),
+                            ('responsible_username', 'u.username')):
+            if filters.get(key) is not None:
+                conditions.append(f"{column} = ?")
+                params.append(filters[key])
+        count_conditions, count_params = list(conditions), tuple(params)
+        
+        if cursor:
+            created_at, project_id = decode_cursor(cursor, 2)
+            conditions.append("(tp.created_at, tp.id) < (?, ?)")
+            params.extend([created_at, project_id])
+        
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        projects = db_manager.execute_query(f"""
+            SELECT 
+                tp.id, tp.name, tp.description, tp.status, tp.responsible_user_id,
+                tp.created_at, tp.updated_at, tp.start_time, tp.end_time,
+                u.username as responsible_user_name
+            FROM test_projects tp
+            LEFT JOIN users u ON tp.responsible_user_id = u.id
+            {where}
+            ORDER BY tp.created_at DESC, tp.id DESC
+            LIMIT ?
+        """, tuple(params) + (limit + 1,))
+        
+        has_more = len(projects) > limit
+        items = self._hydrate_projects(projects[:limit])
+        
+        page = {
+            'items': items,
+            'next_cursor': encode_cursor([items[-1]['created_at'], items[-1]['id']]) if has_more else None,
+            'has_more': has_more
+        }
+        if include_total if include_total is not None else not cursor:
+            count_where = " WHERE " + " AND ".join(count_conditions) if count_conditions else ""
+            page['total'] = db_manager.execute_query(f"""
+                SELECT COUNT(*) AS count FROM test_projects tp
+                LEFT JOIN users u ON tp.responsible_user_id = u.id
+                {count_where}
+            """, count_params)[0]['count']
+        return page
+    
+    def _hydrate_projects(self, projects: List[Dict]) -> List[Dict]:
+        """
+        批次添加 selected_test_cases 與 test_results
+        專案 ID 以 IN 批次查詢，查詢次數與專案數量無關（每 IN_BATCH_SIZE 個專案兩次查詢）
+        """
+        case_ids: Dict[int, List[int]] = {project['id']: [] for project in projects}
+        test_results: Dict[int, Dict[str, Dict]] = {project['id']: {} for project in projects}
+        project_ids = list(case_ids)
+        
+        for start in range(0, len(project_ids), self.IN_BATCH_SIZE):
+            batch = project_ids[start:start + self.IN_BATCH_SIZE]
+            placeholders = ','.join(['?'] * len(batch))
+            
+            rows = db_manager.execute_query(f"""
+                SELECT id, test_project_id FROM test_cases
+                WHERE test_project_id IN ({placeholders})
+                ORDER BY tc_id
+            """, tuple(batch))
+            for row in rows:
+                case_ids[row['test_project_id']].append(row['id'])
+            
+            rows = db_manager.execute_query(f"""
+                SELECT project_id, test_case_id, status, notes, known_issues, blocked_reason, tested_at
+                FROM test_results
+                WHERE project_id IN ({placeholders})
+            """, tuple(batch))
+            for row in rows:
+                test_results[row['project_id']][str(row['test_case_id'])] = self._format_test_result(row)
+        
+        for project in projects:
+            project['selected_test_cases'] = case_ids[project['id']]
+            project['test_results'] = test_results[project['id']]
+        return projects
+    
     def create_test_project(self, name: str, description: Optional[str] = None,
                            responsible_user_id: Optional[str] = None,
                            start_time: Optional[str] = None,
@@ -186,16 +270,8 @@ class TestCaseManager:
         results = db_manager.execute_query(query, (project_id,))
         
         if results:
-            project = results[0]
-            
-            # 添加專案關聯的測試案例 ID 列表
-            test_cases = self.get_test_cases(project_id=project_id)
-            project['selected_test_cases'] = [tc['id'] for tc in test_cases]
-            
-            # 添加實際的測試結果
-            project['test_results'] = self.get_test_results_for_project(project_id)
-            
-            return project
+            # 添加專案關聯的測試案例 ID 列表與實際的測試結果
+            return self._hydrate_projects(results)[0]
         
         return None
     
@@ -213,16 +289,8 @@ class TestCaseManager:
         results = db_manager.execute_query(query, (name,))
         
         if results:
-            project = results[0]
-            
-            # 添加專案關聯的測試案例 ID 列表
-            test_cases = self.get_test_cases(project_id=project['id'])
-            project['selected_test_cases'] = [tc['id'] for tc in test_cases]
-            
-            # 添加實際的測試結果
-            project['test_results'] = self.get_test_results_for_project(project['id'])
-            
-            return project
+            # 添加專案關聯的測試案例 ID 列表與實際的測試結果
+            return self._hydrate_projects(results)[0]
         
         return None
     
@@ -265,6 +333,8 @@ class TestCaseManager:
         query = f"UPDATE test_projects SET {', '.join(update_fields)} WHERE id = ?"
         
         rows_affected = db_manager.execute_update(query, tuple(params))
+        if rows_affected:
+            self._bump_data_versions([project_id])
         return rows_affected > 0
     
     def delete_test_project(self, project_id: int) -> bool:
@@ -277,48 +347,160 @@ class TestCaseManager:
         """清除專案的所有測試案例關聯"""
         query = "UPDATE test_cases SET test_project_id = NULL WHERE test_project_id = ?"
         rows_affected = db_manager.execute_update(query, (project_id,))
+        if rows_affected:
+            self._bump_data_versions([project_id])
         return True  # 即使沒有關聯的案例也返回成功
     
     # ========== Test Cases 管理 ==========
     
+    # get_test_cases 的欄位投影：full 為完整欄位與標籤；brief 省略長文字欄位；
+    # ids 只含識別欄位，不 JOIN 其他表也不載入標籤
+    TEST_CASE_PROJECTIONS = {
+        'full': """
+            tc.id, tc.tc_id, tc.title, tc.description, tc.acceptance_criteria,
+            tc.priority, tc.status, tc.test_project_id, tc.responsible_user_id,
+            tc.estimated_hours, tc.actual_hours, tc.created_at, tc.updated_at,
+            tp.name as project_name,
+            u.username as responsible_user_name
+        """,
+        'brief': """
+            tc.id, tc.tc_id, tc.title,
+            tc.priority, tc.status, tc.test_project_id, tc.responsible_user_id,
+            tc.estimated_hours, tc.actual_hours, tc.created_at, tc.updated_at,
+            tp.name as project_name,
+            u.username as responsible_user_name
+        """,
+        'ids': "tc.id, tc.tc_id, tc.title, tc.test_project_id"
+    }
+    
     def get_test_cases(self, project_id: Optional[int] = None, 
-                      status: Optional[str] = None) -> List[Dict]:
-        """取得測試案例"""
-        query = """
-            SELECT 
-                tc.id, tc.tc_id, tc.title, tc.description, tc.acceptance_criteria,
-                tc.priority, tc.status, tc.test_project_id, tc.responsible_user_id,
-                tc.estimated_hours, tc.actual_hours, tc.created_at, tc.updated_at,
-                tp.name as project_name,
-                u.username as responsible_user_name
-            FROM test_cases tc
-            LEFT JOIN test_projects tp ON tc.test_project_id = tp.id
-            LEFT JOIN users u ON tc.responsible_user_id = u.id
+                      status: Optional[str] = None, projection: str = 'full') -> List[Dict]:
         """
+        取得測試案例
+        projection: 'full'、'brief' 或 'ids'（見 TEST_CASE_PROJECTIONS）
+        """
+        where, params = self._test_case_filters({'project_id': project_id, 'status': status})
+        test_cases = self._query_test_cases(projection, where, params)
+        
+        # 以單一查詢取得所有符合條件之測試案例的標籤
+        if projection != 'ids' and test_cases:
+            tags = self._get_tags_for_cases(where, params)
+            for tc in test_cases:
+                tc['product_tags'] = tags.get(tc['id'], [])
         
+        return test_cases
+    
+    def get_test_cases_page(self, limit: int = 50, cursor: Optional[str] = None,
+                            filters: Optional[Dict] = None, projection: str = 'full',
+                            include_total: Optional[bool] = None) -> Dict:
+        """
+        以 keyset（游標）分頁取得測試案例，依 tc_id 排序
+        filters: status、priority、tag_id、project_id、responsible_user_id
+        include_total: 是否計算總數；預設只在第一頁（沒有 cursor）計算，翻頁時不重複掃描
+        返回 {'items', 'next_cursor', 'has_more'[, 'total']}
+        """
+        where, params = self._test_case_filters(filters or {})
+        count_where, count_params = where, params
+        
+        if cursor:
+            (last_tc_id,) = decode_cursor(cursor, 1)
+            where = (where + " AND " if where else " WHERE ") + "tc.tc_id > ?"
+            params = params + (last_tc_id,)
+        
+        rows = self._query_test_cases(projection, where, params, limit + 1)
+        has_more = len(rows) > limit
+        items = rows[:limit]
+        
+        if projection != 'ids' and items:
+            tags = self._get_tags_for_case_ids([tc['id'] for tc in items])
+            for tc in items:
+                tc['product_tags'] = tags.get(tc['id'], [])
+        
+        page = {
+            'items': items,
+            'next_cursor': encode_cursor([items[-1]['tc_id']]) if has_more else None,
+            'has_more': has_more
+        }
+        if include_total if include_total is not None else not cursor:
+            page['total'] = db_manager.execute_query(
+                f"SELECT COUNT(*) AS count FROM test_cases tc{count_where}", count_params
+            )[0]['count']
+        return page
+    
+    def _test_case_filters(self, filters: Dict) -> Tuple[str, Tuple]:
+        """將篩選條件轉為 WHERE 子句（以 tc 為測試案例表別名），值為 None 的條件忽略"""
         conditions = []
         params = []
         
-        if project_id is not None:
-            conditions.append("tc.test_project_id = ?")
-            params.append(project_id)
-        
-        if status is not None:
-            conditions.append("tc.status = ?")
-            params.append(status)
-        
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY tc.tc_id"
-        
-        test_cases = db_manager.execute_query(query, tuple(params))
-        
-        # 為每個測試案例添加標籤信息
-        for tc in test_cases:
-            tc['product_tags'] = self.get_test_case_tags(tc['id'])
+        for key, column in (('project_id', 'tc.test_project_id'), ('status', 'tc.status'),
+                            ('priority', 'tc.priority'), ('responsible_user_id', 'tc.responsible_user_id')):
+            if filters.get(key) is not None:
+                conditions.append(f"{column} = ?")
+                params.append(filters[key])
+        
+        if filters.get('tag_id') is not None:
+            conditions.append("""EXISTS (
+                SELECT 1 FROM test_case_tags tct
+                WHERE tct.test_case_id = tc.id AND tct.product_tag_id = ?
+            )""")
+            params.append(filters['tag_id'])
+        
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, tuple(params)
+    
+    def _query_test_cases(self, projection: str, where: str, params: Tuple,
+                          limit: Optional[int] = None) -> List[Dict]:
+        if projection not in self.TEST_CASE_PROJECTIONS:
+            raise ValueError(f"不支援的欄位投影: {projection}")
         
-        return test_cases
+        joins = "" if projection == 'ids' else """
+            LEFT JOIN test_projects tp ON tc.test_project_id = tp.id
+            LEFT JOIN users u ON tc.responsible_user_id = u.id
+        """
+        query = f"""
+            SELECT {self.TEST_CASE_PROJECTIONS[projection]}
+            FROM test_cases tc
+            {joins}
+            {where}
+            ORDER BY tc.tc_id
+        """
+        if limit is not None:
+            query += " LIMIT ?"
+            params = params + (limit,)
+        return db_manager.execute_query(query, params)
+    
+    def _get_tags_for_cases(self, where: str, params: Tuple) -> Dict[int, List[Dict]]:
+        """依 get_test_cases 的篩選條件一次取得標籤，返回 {test_case_id: [tag, ...]}"""
+        case_filter = f"WHERE tct.test_case_id IN (SELECT tc.id FROM test_cases tc{where})" if where else ""
+        query = f"""
+            SELECT tct.test_case_id, pt.id, pt.name, pt.description, pt.color
+            FROM test_case_tags tct
+            INNER JOIN product_tags pt ON pt.id = tct.product_tag_id
+            {case_filter}
+            ORDER BY tct.test_case_id, pt.name
+        """
+        return self._group_tags(db_manager.execute_query(query, params))
+    
+    def _get_tags_for_case_ids(self, test_case_ids: List[int]) -> Dict[int, List[Dict]]:
+        """以 IN 批次取得指定測試案例的標籤，返回 {test_case_id: [tag, ...]}"""
+        rows = []
+        for start in range(0, len(test_case_ids), self.IN_BATCH_SIZE):
+            batch = test_case_ids[start:start + self.IN_BATCH_SIZE]
+            rows.extend(db_manager.execute_query(f"""
+                SELECT tct.test_case_id, pt.id, pt.name, pt.description, pt.color
+                FROM test_case_tags tct
+                INNER JOIN product_tags pt ON pt.id = tct.product_tag_id
+                WHERE tct.test_case_id IN ({','.join(['?'] * len(batch))})
+                ORDER BY tct.test_case_id, pt.name
+            """, tuple(batch)))
+        return self._group_tags(rows)
+    
+    @staticmethod
+    def _group_tags(rows: List[Dict]) -> Dict[int, List[Dict]]:
+        tags: Dict[int, List[Dict]] = {}
+        for row in rows:
+            tags.setdefault(row.pop('test_case_id'), []).append(row)
+        return tags
     
     def create_test_case(self, title: str, description: Optional[str] = None,
                         acceptance_criteria: Optional[str] = None,
@@ -346,6 +528,7 @@ class TestCaseManager:
         # 添加產品標籤關聯
         if product_tag_ids:
             self._add_test_case_tags(int(test_case_id), product_tag_ids)
+        self._bump_data_versions([test_project_id])
         
         # 返回新創建的測試案例
         return self.get_test_case_by_id(int(test_case_id))
@@ -406,6 +589,9 @@ class TestCaseManager:
         # 處理產品標籤更新
         product_tag_ids = kwargs.pop('product_tag_ids', None)
         
+        # 案例可能移到其他專案，原專案與新專案的報告都要失效
+        previous_project_id = self._get_case_project_id(test_case_id)
+        
         update_fields = []
         params = []
         
@@ -424,12 +610,18 @@ class TestCaseManager:
         if product_tag_ids is not None:
             self.update_test_case_tags(test_case_id, product_tag_ids)
         
+        if update_fields or product_tag_ids is not None:
+            self._bump_data_versions([previous_project_id, self._get_case_project_id(test_case_id)])
+        
         return True
     
     def delete_test_case(self, test_case_id: int) -> bool:
         """刪除測試案例"""
+        project_id = self._get_case_project_id(test_case_id)
         query = "DELETE FROM test_cases WHERE id = ?"
         rows_affected = db_manager.execute_delete(query, (test_case_id,))
+        if rows_affected:
+            self._bump_data_versions([project_id])
         return rows_affected > 0
     
     def get_test_case_tags(self, test_case_id: int) -> List[Dict]:
@@ -469,6 +661,7 @@ class TestCaseManager:
         # 添加新標籤
         if tag_ids:
             self._add_test_case_tags(test_case_id, tag_ids)
+        self._bump_data_versions([self._get_case_project_id(test_case_id)])
     
     def _generate_tc_id(self) -> str:
         """生成 TC ID"""
@@ -492,6 +685,66 @@ class TestCaseManager:
             
         return f"TC{next_number:05d}"  # TC00001, TC00002, ...
     
+    # ========== 專案資料版本 ==========
+    
+    def get_project_version_info(self, project_id: int) -> Optional[Dict]:
+        """
+        專案的資料版本與目前負責人的用戶名（報告快取的鍵，各 worker 一致）；專案不存在時返回 None
+        負責人用戶名每次直接 JOIN users 取得，用戶改名、刪除不會遞增資料版本，權限檢查不能依賴快取
+        """
+        results = db_manager.execute_query("""
+            SELECT COALESCE(v.data_version, 0) AS data_version,
+                   u.username AS responsible_user_name
+            FROM test_projects tp
+            LEFT JOIN test_project_versions v ON v.project_id = tp.id
+            LEFT JOIN users u ON tp.responsible_user_id = u.id
+            WHERE tp.id = ?
+        """, (project_id,))
+        return results[0] if results else None
+    
+    def get_project_owners(self, project_ids: List[int]) -> Dict[int, Optional[str]]:
+        """多個專案目前負責人的用戶名（權限檢查用）：{project_id: username}，不存在的專案不列入"""
+        if not project_ids:
+            return {}
+        placeholders = ', '.join('?' * len(project_ids))
+        results = db_manager.execute_query(f"""
+            SELECT tp.id, u.username
+            FROM test_projects tp
+            LEFT JOIN users u ON tp.responsible_user_id = u.id
+            WHERE tp.id IN ({placeholders})
+        """, tuple(project_ids))
+        return {row['id']: row['username'] for row in results}
+    
+    def _bump_data_versions(self, project_ids: List[Optional[int]]):
+        """
+        遞增專案的資料版本
+        必須在資料寫入之後呼叫：報告在讀取資料前先取版本，寫入與遞增之間產生的報告會被下一次遞增淘汰
+        """
+        project_ids = sorted({int(project_id) for project_id in project_ids if project_id is not None})
+        if not project_ids:
+            return
+        db_manager.execute_many("""
+            INSERT INTO test_project_versions (project_id, data_version)
+            SELECT id, 1 FROM test_projects WHERE id = ?
+            ON CONFLICT(project_id) DO UPDATE SET data_version = data_version + 1
+        """, [(project_id,) for project_id in project_ids])
+    
+    def _get_case_project_id(self, test_case_id: int) -> Optional[int]:
+        results = db_manager.execute_query(
+            "SELECT test_project_id FROM test_cases WHERE id = ?", (test_case_id,)
+        )
+        return results[0]['test_project_id'] if results else None
+    
+    def _get_project_ids_for_tag(self, tag_id: int) -> List[int]:
+        """含有指定標籤之測試案例所屬的專案"""
+        rows = db_manager.execute_query("""
+            SELECT DISTINCT tc.test_project_id
+            FROM test_case_tags tct
+            INNER JOIN test_cases tc ON tc.id = tct.test_case_id
+            WHERE tct.product_tag_id = ? AND tc.test_project_id IS NOT NULL
+        """, (tag_id,))
+        return [row['test_project_id'] for row in rows]
+    
     # ========== 統計相關 ==========
     
     def get_test_case_statistics(self) -> Dict:
@@ -527,6 +780,64 @@ class TestCaseManager:
         results = db_manager.execute_query(query, (project_id,))
         return results[0] if results else {}
     
+    def get_comparison_counts(self, project_ids: List[int]) -> Dict[str, List[Dict]]:
+        """
+        多專案比較用的分組計數，每 IN_BATCH_SIZE 個專案四次 GROUP BY 查詢：
+        projects（專案資料）、statuses（專案 × 狀態）、tags（專案 × 標籤 × 狀態）、
+        daily（專案 × 測試日期 × 狀態；每個案例只有最新一筆結果，日期為最後測試日）
+        只掃描這些專案的案例與結果，成本與結果筆數成正比，與資料庫中的案例總數無關
+        """
+        counts = {'projects': [], 'statuses': [], 'tags': [], 'daily': []}
+        project_ids = list(dict.fromkeys(int(project_id) for project_id in project_ids))
+        
+        for start in range(0, len(project_ids), self.IN_BATCH_SIZE):
+            batch = tuple(project_ids[start:start + self.IN_BATCH_SIZE])
+            placeholders = ','.join(['?'] * len(batch))
+            
+            counts['projects'].extend(db_manager.execute_query(f"""
+                SELECT tp.id, tp.name, tp.status, tp.start_time, tp.end_time, tp.created_at,
+                       u.username AS responsible_user_name
+                FROM test_projects tp
+                LEFT JOIN users u ON tp.responsible_user_id = u.id
+                WHERE tp.id IN ({placeholders})
+            """, batch))
+            
+            # 沒有測試結果的案例計為 not_tested
+            counts['statuses'].extend(db_manager.execute_query(f"""
+                SELECT tc.test_project_id AS project_id,
+                       COALESCE(tr.status, 'not_tested') AS status, COUNT(*) AS count
+                FROM test_cases tc
+                LEFT JOIN test_results tr
+                    ON tr.project_id = tc.test_project_id AND tr.test_case_id = tc.id
+                WHERE tc.test_project_id IN ({placeholders})
+                GROUP BY tc.test_project_id, COALESCE(tr.status, 'not_tested')
+            """, batch))
+            
+            counts['tags'].extend(db_manager.execute_query(f"""
+                SELECT tc.test_project_id AS project_id, pt.id AS tag_id, pt.name AS tag_name,
+                       COALESCE(tr.status, 'not_tested') AS status, COUNT(*) AS count
+                FROM test_cases tc
+                INNER JOIN test_case_tags tct ON tct.test_case_id = tc.id
+                INNER JOIN product_tags pt ON pt.id = tct.product_tag_id
+                LEFT JOIN test_results tr
+                    ON tr.project_id = tc.test_project_id AND tr.test_case_id = tc.id
+                WHERE tc.test_project_id IN ({placeholders})
+                GROUP BY tc.test_project_id, pt.id, COALESCE(tr.status, 'not_tested')
+            """, batch))
+            
+            # 只計入仍屬於該專案之案例的結果（與 statuses 的範圍一致）
+            counts['daily'].extend(db_manager.execute_query(f"""
+                SELECT tr.project_id, DATE(tr.tested_at) AS day, tr.status, COUNT(*) AS count
+                FROM test_results tr
+                INNER JOIN test_cases tc
+                    ON tc.id = tr.test_case_id AND tc.test_project_id = tr.project_id
+                WHERE tr.project_id IN ({placeholders}) AND tr.status != 'not_tested'
+                GROUP BY tr.project_id, DATE(tr.tested_at), tr.status
+                ORDER BY day
+            """, batch))
+        
+        return counts
+    
     def update_test_result(self, project_id: str, test_case_id: str, status, 
                           notes: str = None, known_issues: str = None, 
                           blocked_reason: str = None) -> Optional[Dict]:
@@ -567,6 +878,7 @@ class TestCaseManager:
                 project_id, test_case_id, status_str, 
                 notes or '', known_issues or '', blocked_reason or ''
             ))
+            self._bump_data_versions([project_id])
             
             # 重新獲取專案以包含更新的測試結果
             return self.get_test_project_by_id(project_id)
@@ -584,18 +896,18 @@ class TestCaseManager:
         """
         results = db_manager.execute_query(query, (project_id,))
         
-        test_results = {}
-        for result in results:
-            test_results[str(result['test_case_id'])] = {
-                'test_case_id': result['test_case_id'],
-                'status': result['status'],
-                'notes': result['notes'] or '',
-                'known_issues': result['known_issues'] or '',
-                'blocked_reason': result['blocked_reason'] or '',
-                'tested_at': result['tested_at']
-            }
-        
-        return test_results
+        return {str(result['test_case_id']): self._format_test_result(result) for result in results}
+    
+    @staticmethod
+    def _format_test_result(result: Dict) -> Dict:
+        return {
+            'test_case_id': result['test_case_id'],
+            'status': result['status'],
+            'notes': result['notes'] or '',
+            'known_issues': result['known_issues'] or '',
+            'blocked_reason': result['blocked_reason'] or '',
+            'tested_at': result['tested_at']
+        }
     
     def check_test_case_project_associations(self, test_case_id: int) -> List[Dict]:
         """檢查測試案例是否與任何專案有關聯
@@ -0,0 +1,142 @@
+"""
+用戶資料快取
+兩層：請求內的身分備忘（flask.g，同一請求中的重複查詢不再經過快取鎖與資料庫），
+以及行程層級的 TTL + LRU 快取。UserManager 更新或刪除用戶時明確失效；
+快取的角色用於權限檢查，因此命中時還會比對共用的用戶變更版本（每個請求讀取一次），
+其他 worker 的修改（例如降級、刪除）在下一個請求就生效，而不是等到 TTL 到期
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from flask import g, has_request_context
+import config as config_module
+
+class UserCache:
+    """以用戶 ID 為鍵的 TTL/LRU 快取（只快取存在的用戶）"""
+    
+    def __init__(self, ttl: float = None, max_size: int = None):
+        self.ttl = ttl if ttl is not None else getattr(config_module, 'USER_CACHE_TTL', 60)
+        self.max_size = max_size or getattr(config_module, 'USER_CACHE_SIZE', 1024)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # user_id -> (過期時間, 用戶, 變更版本)
+        self._generation = 0  # 每次失效遞增，讀取期間發生失效時不寫入可能過期的資料
+        
+        # 計數器
+        self.memo_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.stale = 0  # 變更版本不符（其他 worker 修改過用戶）而重新載入
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get_or_load(self, user_id: str, loader: Callable[[str], Optional[Dict]],
+                    version_loader: Callable[[], int] = None) -> Optional[Dict]:
+        """
+        依序查請求備忘、行程快取，都沒有才以 loader 讀取資料庫；返回副本，呼叫端可自由修改
+        version_loader 返回共用的用戶變更版本：快取項目的版本不符時視為未命中
+        """
+        if not user_id:
+            return None
+        memo = self._request_memo()
+        if memo is not None and user_id in memo:
+            with self._lock:
+                self.memo_hits += 1
+            return dict(memo[user_id]) if memo[user_id] else None
+        
+        # 先取版本再讀資料：讀取期間若有修改，存入的版本較舊，下次命中時會重新載入
+        version = self._current_version(version_loader) if version_loader else None
+        user, generation = self._get(user_id, version)
+        if user is None:
+            user = loader(user_id)
+            if user is not None:
+                self._put(user_id, user, generation, version)
+        if memo is not None:
+            memo[user_id] = user
+        return dict(user) if user else None
+    
+    def invalidate(self, user_id: str):
+        """用戶被修改或刪除時移除快取與目前請求的備忘"""
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+        memo = self._request_memo()
+        if memo is not None:
+            memo.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict:
+        """快取計數器（命中率不含請求內備忘）"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'memo_hits': self.memo_hits,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'expirations': self.expirations,
+                'stale': self.stale,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+    
+    def _get(self, user_id: str, version: Optional[int]):
+        """返回 (用戶或 None, 目前的失效世代)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, user, entry_version = entry
+                if expires_at > now and entry_version == version:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return user, self._generation
+                del self._entries[user_id]
+                if expires_at > now:
+                    self.stale += 1
+                else:
+                    self.expirations += 1
+            self.misses += 1
+            return None, self._generation
+    
+    def _put(self, user_id: str, user: Dict, generation: int, version: Optional[int]):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(user), version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    @staticmethod
+    def _current_version(version_loader: Callable[[], int]) -> int:
+        """共用的用戶變更版本（同一請求只讀取一次）"""
+        if not has_request_context():
+            return version_loader()
+        version = getattr(g, '_user_version', None)
+        if version is None:
+            version = g._user_version = version_loader()
+        return version
+    
+    @staticmethod
+    def _request_memo() -> Optional[Dict]:
+        """目前請求的身分備忘（不在請求內時返回 None）"""
+        if not has_request_context():
+            return None
+        memo = getattr(g, '_user_memo', None)
+        if memo is None:
+            memo = g._user_memo = {}
+        return memo
+
+user_cache = UserCache()
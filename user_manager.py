@@ -3,6 +3,7 @@ import uuid
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 from database.db_manager import db_manager
+from user_cache import user_cache
 
 class UserManager:
     """基於 SQLite 的用戶管理器"""
@@ -50,7 +51,17 @@ class UserManager:
         return None
     
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
-        """根據 ID 獲取用戶"""
+        """根據 ID 獲取用戶（經由請求內備忘與用戶快取，快取命中時比對共用的用戶變更版本）"""
+        return user_cache.get_or_load(user_id, self._load_user_by_id, self._get_change_version)
+    
+    @staticmethod
+    def _get_change_version() -> int:
+        """用戶變更版本（users 的 UPDATE／DELETE 觸發器遞增，各 worker 共用）"""
+        results = db_manager.execute_query("SELECT version FROM user_change_counter WHERE id = 1")
+        return results[0]['version'] if results else 0
+    
+    def _load_user_by_id(self, user_id: str) -> Optional[Dict]:
+        """自資料庫讀取用戶"""
         query = """
             SELECT id, username, password_hash, email, role, created_at, updated_at
             FROM users 
@@ -144,6 +155,7 @@ class UserManager:
             query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
             
             rows_affected = db_manager.execute_update(query, tuple(params))
+            user_cache.invalidate(user_id)
             
             if rows_affected > 0:
                 return True, "用戶信息更新成功"
@@ -167,6 +179,7 @@ class UserManager:
         try:
             query = "DELETE FROM users WHERE id = ?"
             rows_affected = db_manager.execute_delete(query, (user_id,))
+            user_cache.invalidate(user_id)
             
             if rows_affected > 0:
                 return True, f"用戶 '{user['username']}' 已成功刪除"
@@ -229,6 +242,7 @@ class UserManager:
             query = "UPDATE users SET password_hash = ? WHERE id = ?"
             
             rows_affected = db_manager.execute_update(query, (new_password_hash, user_id))
+            user_cache.invalidate(user_id)
             
             if rows_affected > 0:
                 return True, "密碼修改成功"
@@ -325,6 +339,7 @@ class UserManager:
                 params.append(user_id)
                 query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
                 db_manager.execute_update(query, tuple(params))
+                user_cache.invalidate(user_id)
             
             # 返回更新後的用戶信息
             return self.get_user_by_id(user_id)
@@ -343,6 +358,7 @@ class UserManager:
             query = "UPDATE users SET password_hash = ? WHERE id = ?"
             
             rows_affected = db_manager.execute_update(query, (new_password_hash, user_id))
+            user_cache.invalidate(user_id)
             
             if rows_affected > 0:
                 return self.get_user_by_id(user_id)
@@ -362,6 +378,7 @@ class UserManager:
         try:
             query = "DELETE FROM users WHERE id = ?"
             rows_affected = db_manager.execute_delete(query, (user_id,))
+            user_cache.invalidate(user_id)
             return rows_affected > 0
                 
         except Exception as e: